@@ -0,0 +1,107 @@
+"""Whisper con peticiones concurrentes: una a una (run_in_executor) vs micro-batching.
+
+Simula `--requests` frases de varias sesiones que terminan con llegadas
+aleatorias (Poisson, `--rate` frases/s en total) y mide la latencia de cada
+transcripción desde que se pide, el throughput y, en el modo por lotes, la
+espera en cola y la distribución de tamaños de lote.
+
+    python benchmarks/bench_batched_stt.py corpus/ --model tiny --requests 32 --rate 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from faster_whisper import WhisperModel
+
+from common.batched_stt import BatchedWhisper
+from wav_io import corpus_files, load_wav
+
+
+def transcribe_one(model, audio):
+    """Ruta actual de LocalWhisperService.run_stt."""
+    segments, _ = model.transcribe(audio, "es", vad_filter=True)
+    return " ".join(s.text for s in segments).strip()
+
+
+async def drive(submit, clips, requests, rate, seed):
+    rng = random.Random(seed)
+    latencies = []
+
+    async def one(audio, delay):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        await submit(audio)
+        latencies.append(time.perf_counter() - start)
+
+    delays, t = [], 0.0
+    for _ in range(requests):
+        t += rng.expovariate(rate)
+        delays.append(t)
+    start = time.perf_counter()
+    await asyncio.gather(*(one(rng.choice(clips), d) for d in delays))
+    return latencies, time.perf_counter() - start
+
+
+def summarize(name, latencies, wall, requests):
+    return {
+        "mode": name,
+        "latency_p50_s": round(float(np.percentile(latencies, 50)), 3),
+        "latency_p95_s": round(float(np.percentile(latencies, 95)), 3),
+        "wall_s": round(wall, 2),
+        "throughput_utt_s": round(requests / wall, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="+", help="Directorios o ficheros WAV")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=4.0, help="Frases por segundo (todas las sesiones)")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait", type=float, default=0.03)
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    args = parser.parse_args()
+
+    clips = [load_wav(path) for path in corpus_files(args.corpus)]
+    if not clips:
+        parser.error("No hay ficheros WAV en el corpus")
+    model = WhisperModel(args.model, device="cpu", compute_type="int8")
+    # Calentamiento: que la primera petición no pague la inicialización
+    transcribe_one(model, clips[0])
+
+    async def sequential(audio):
+        return await asyncio.get_running_loop().run_in_executor(None, transcribe_one, model, audio)
+
+    engine = BatchedWhisper(model, max_batch_size=args.max_batch, max_wait=args.max_wait)
+
+    rows = []
+    latencies, wall = asyncio.run(drive(sequential, clips, args.requests, args.rate, seed=0))
+    rows.append(summarize("una a una", latencies, wall, args.requests))
+    latencies, wall = asyncio.run(drive(engine.transcribe, clips, args.requests, args.rate, seed=0))
+    rows.append(summarize("por lotes", latencies, wall, args.requests))
+    batch_stats = engine.stats()
+    engine.close()
+
+    if args.json:
+        print(json.dumps({"results": rows, "batching": batch_stats}, indent=2))
+        return
+    print(f"{'MODO':<12} {'p50 (s)':>9} {'p95 (s)':>9} {'TOTAL (s)':>10} {'FRASES/s':>9}")
+    for row in rows:
+        print(f"{row['mode']:<12} {row['latency_p50_s']:>9.3f} {row['latency_p95_s']:>9.3f} "
+              f"{row['wall_s']:>10.2f} {row['throughput_utt_s']:>9.2f}")
+    print(f"\nLotes: {batch_stats['batch_sizes']} (media {batch_stats['mean_batch_size']}), "
+          f"espera en cola p50 {batch_stats['queue_wait_p50_ms']} ms / p95 {batch_stats['queue_wait_p95_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Benchmark de extremo a extremo sin micrófono: WAV -> Listener -> Brain -> Speaker.
+
+Cada WAV del corpus se reproduce por un micrófono simulado (FileInputStream)
+en tiempo real; Listener detecta el fin de frase y transcribe con un Whisper
+pequeño en CPU, Brain responde contra un Ollama falso a ritmo configurable y
+Speaker sintetiza con Kokoro hacia un altavoz simulado (FileOutputStream).
+Las latencias salen del mismo TurnRecorder que usa el agente.
+
+Con `--pipeline pipecat` se mide el agente de pipecat-local-agent
+(LocalWhisperService -> LocalGemmaService -> LocalKokoroService, con el
+Silero de pipecat) sobre un transporte de ficheros
+(pipecat_file_transport.py) contra el mismo Ollama falso.
+
+El resultado es un JSON con percentiles, RTF y picos de memoria que sirve de
+línea base para comparar entre commits:
+
+    python benchmarks/bench_e2e.py corpus/ --model tiny --out baseline.json
+    python benchmarks/bench_e2e.py corpus/ --model tiny --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "stt-llm-tts"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.listener import Listener
+from core.brain import Brain
+from core.speaker import Speaker
+from core.metrics import TurnRecorder
+from common.turn_metrics import TurnMetrics
+from common.vad import create_vad
+from fake_ollama import FakeOllama
+from file_audio import FileInputStream, FileOutputStream
+from wav_io import corpus_files, load_wav, save_wav
+
+SAMPLE_RATE = 16000
+COMPARED = ("response_s", "stt_s", "llm_ttft_s", "tts_first_audio_s", "turn_s", "stt_rtf", "tts_rtf")
+
+
+def current_rss_mb():
+    """RSS actual (Linux); fuera de Linux se usa el pico de getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss va en KB en Linux y en bytes en macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class RssSampler:
+    """Pico de RSS dentro de una fase (getrusage solo da el del proceso entero)."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._running = False
+
+    def __enter__(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._running = False
+        self._thread.join()
+
+    def _run(self):
+        while self._running:
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            time.sleep(self.interval)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_corpus(args, files, server_url):
+    streams = {}
+
+    def input_stream(**kwargs):
+        streams["input"] = FileInputStream(speed=args.speed, noise_level=args.noise, **kwargs)
+        return streams["input"]
+
+    def output_stream(**kwargs):
+        streams["output"] = FileOutputStream(speed=args.speed, record=bool(args.save_audio), **kwargs)
+        return streams["output"]
+
+    with RssSampler() as load_rss:
+        load_start = time.perf_counter()
+        listener = Listener(model_size=args.model, device="cpu", compute_type="int8",
+                            incremental=args.incremental, input_stream=input_stream,
+                            vad=create_vad(args.vad))
+        brain = Brain(model="fake", host=server_url)
+        speaker = Speaker(output_sr=args.output_sr, output_stream=output_stream)
+        load_s = time.perf_counter() - load_start
+
+    metrics = TurnMetrics(jsonl_path=args.jsonl)
+    recorder = TurnRecorder(listener, brain, speaker, metrics)
+    listener.playback_active = lambda: speaker.is_playing
+    listener.start()
+
+    turns = []
+    try:
+        with RssSampler() as run_rss:
+            for path in files:
+                clip = load_wav(path, SAMPLE_RATE)
+                listening = asyncio.create_task(listener.listen())
+                streams["input"].play(clip)
+                # Margen: duración del clip + corte por silencio + holgura
+                timeout = len(clip) / SAMPLE_RATE / args.speed + listener.endpointer.long_silence + 10.0
+                try:
+                    audio = await asyncio.wait_for(listening, timeout)
+                except asyncio.TimeoutError:
+                    print(f"[!] {os.path.basename(path)}: no se detectó voz")
+                    continue
+
+                recorder.begin()
+                text = await recorder.transcribe(audio)
+                if not text:
+                    print(f"[!] {os.path.basename(path)}: transcripción vacía")
+                    continue
+                completed = await speaker.speak_stream(brain.think_stream(text))
+                entry = recorder.finish(completed)
+                entry.update(file=os.path.basename(path), text=text)
+                turns.append(entry)
+                print(f"{entry['file']:<28} respuesta {entry.get('response_s', float('nan')):.3f}s  "
+                      f"stt {entry.get('stt_s', float('nan')):.3f}s  {text[:40]}")
+    finally:
+        listener.close()
+        speaker.close()
+
+    if args.save_audio:
+        save_wav(args.save_audio, streams["output"].recording(), args.output_sr)
+
+    return {
+        "turns": turns,
+        "summary": metrics.summary(),
+        "llm": brain.llm.stats(),
+        "tts": speaker.stats(),
+        "load_s": round(load_s, 3),
+        "memory_mb": {
+            "load_peak": round(load_rss.peak_mb, 1),
+            "run_peak": round(run_rss.peak_mb, 1),
+            "process_peak": round(peak_rss_mb(), 1),
+        },
+    }
+
+
+async def run_pipecat_corpus(args, files, server_url):
+    # Import diferido: pipecat solo hace falta en este modo
+    sys.path.append(os.path.join(ROOT, "pipecat-local-agent"))
+    from pipecat.audio.vad.silero import SileroVADAnalyzer
+    from pipecat.frames.frames import StartFrame
+    from pipecat.pipeline.pipeline import Pipeline
+    from pipecat.pipeline.runner import PipelineRunner
+    from pipecat.pipeline.task import PipelineParams, PipelineTask
+    from pipecat.processors.aggregators.llm_response import (
+        LLMAssistantContextAggregator,
+        LLMUserContextAggregator,
+    )
+    from pipecat.processors.aggregators.sentence import SentenceAggregator
+    from services.gemma_llm import LocalGemmaService
+    from services.kokoro_tts import LocalKokoroService
+    from services.whisper_stt import LocalWhisperService
+    from common.context import ConversationContext
+    from common.startup import load_whisper
+    from pipecat_file_transport import FileTransport, PipecatTurns, TurnProbe
+
+    turns = PipecatTurns()
+    with RssSampler() as load_rss:
+        load_start = time.perf_counter()
+        transport = FileTransport(turns, sample_rate=SAMPLE_RATE, output_sr=args.output_sr,
+                                  speed=args.speed, noise_level=args.noise,
+                                  record=bool(args.save_audio))
+        stt = LocalWhisperService(vad_analyzer=SileroVADAnalyzer(), incremental=args.incremental,
+                                  model=load_whisper(args.model, device="cpu", compute_type="int8"))
+        context = ConversationContext([{"role": "system", "content": "Eres un asistente de voz."}])
+        llm = LocalGemmaService(model="fake", context=context, host=server_url)
+        tts = LocalKokoroService(output_sr=args.output_sr)
+        load_s = time.perf_counter() - load_start
+
+    pipeline = Pipeline([
+        transport.input(),
+        stt,
+        TurnProbe(turns, "stt"),
+        LLMUserContextAggregator(context),
+        llm,
+        TurnProbe(turns, "llm"),
+        SentenceAggregator(),
+        tts,
+        transport.output(),
+        LLMAssistantContextAggregator(context),
+    ])
+    task = PipelineTask(pipeline, params=PipelineParams(allow_interruptions=True))
+    runner = asyncio.create_task(PipelineRunner().run(task))
+    await task.queue_frame(StartFrame())
+
+    metrics = TurnMetrics(jsonl_path=args.jsonl)
+    results = []
+    try:
+        with RssSampler() as run_rss:
+            for path in files:
+                clip = load_wav(path, SAMPLE_RATE)
+                turns.begin()
+                transport.input().stream.play(clip)
+                # Margen: duración del clip + corte por silencio + respuesta + holgura
+                timeout = len(clip) / SAMPLE_RATE / args.speed + 30.0
+                try:
+                    turn = await asyncio.wait_for(turns.finish(), timeout)
+                except asyncio.TimeoutError:
+                    print(f"[!] {os.path.basename(path)}: sin respuesta")
+                    continue
+                entry = metrics.record(turn)
+                entry.update(file=os.path.basename(path), text=turns.text)
+                results.append(entry)
+                print(f"{entry['file']:<28} respuesta {entry.get('response_s', float('nan')):.3f}s  "
+                      f"stt {entry.get('stt_s', float('nan')):.3f}s  {turns.text[:40]}")
+    finally:
+        await task.cancel()
+        await runner
+
+    if args.save_audio:
+        save_wav(args.save_audio, transport.output().recording(), args.output_sr)
+
+    return {
+        "turns": results,
+        "summary": metrics.summary(),
+        "llm": llm.llm.stats(),
+        "load_s": round(load_s, 3),
+        "memory_mb": {
+            "load_peak": round(load_rss.peak_mb, 1),
+            "run_peak": round(run_rss.peak_mb, 1),
+            "process_peak": round(peak_rss_mb(), 1),
+        },
+    }
+
+
+def compare(result, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nComparación con {baseline_path} (commit {baseline.get('commit')})")
+    print(f"{'MÉTRICA':<20} {'BASE p50':>10} {'AHORA p50':>10} {'BASE p95':>10} {'AHORA p95':>10} {'Δ p50':>8}")
+    for name in COMPARED:
+        old = baseline["summary"].get(name)
+        new = result["summary"].get(name)
+        if not old or not new:
+            continue
+        delta = (new["p50"] - old["p50"]) / old["p50"] * 100 if old["p50"] else 0.0
+        print(f"{name:<20} {old['p50']:>10.3f} {new['p50']:>10.3f} {old['p95']:>10.3f} "
+              f"{new['p95']:>10.3f} {delta:>+7.1f}%")
+    for name, value in result["memory_mb"].items():
+        old = baseline.get("memory_mb", {}).get(name)
+        if old:
+            print(f"{'mem ' + name + ' (MB)':<20} {old:>10.1f} {value:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="+", help="Directorios o ficheros WAV")
+    parser.add_argument("--pipeline", choices=["listener", "pipecat"], default="listener",
+                        help="Agente medido: stt-llm-tts (Listener) o pipecat-local-agent")
+    parser.add_argument("--model", default="tiny", help="Modelo de Whisper (CPU, int8)")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--tokens-per-sec", type=float, default=15.0)
+    parser.add_argument("--prefill-delay", type=float, default=0.2)
+    parser.add_argument("--output-sr", type=int, default=44100)
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Ritmo de los streams simulados; las latencias solo son realistas con 1.0")
+    parser.add_argument("--vad", choices=["energy", "silero"], default="energy",
+                        help="Detector de Listener; pipecat usa siempre su SileroVADAnalyzer")
+    parser.add_argument("--noise", type=float, default=0.0, help="Ruido de fondo del micrófono simulado")
+    parser.add_argument("--jsonl", help="Guardar también cada turno en JSONL")
+    parser.add_argument("--save-audio", help="WAV con todo lo que sonó por el altavoz simulado")
+    parser.add_argument("--out", help="Fichero JSON de resultados (línea base)")
+    parser.add_argument("--compare", help="Línea base JSON con la que comparar")
+    args = parser.parse_args()
+
+    files = corpus_files(args.corpus)
+    if not files:
+        parser.error("No hay ficheros WAV en el corpus")
+
+    with FakeOllama(tokens_per_sec=args.tokens_per_sec, prefill_delay=args.prefill_delay) as server:
+        run = run_pipecat_corpus if args.pipeline == "pipecat" else run_corpus
+        result = asyncio.run(run(args, files, server.url))
+
+    result.update(
+        commit=git_commit(),
+        created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        machine={"platform": platform.platform(), "python": platform.python_version(),
+                 "cpus": os.cpu_count()},
+        config={k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+    )
+
+    print(f"\n{'MÉTRICA':<20} {'p50':>8} {'p95':>8} {'p99':>8} {'N':>4}")
+    for name, stats in sorted(result["summary"].items()):
+        print(f"{name:<20} {stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f} {stats['count']:>4}")
+    print(f"Memoria (MB): {result['memory_mb']}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Resultados en {args.out}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
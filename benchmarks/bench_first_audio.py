@@ -0,0 +1,58 @@
+"""Tiempo hasta el primer audio: Brain.think vs Brain.think_stream.
+
+Con `think` el TTS no puede empezar hasta tener la respuesta completa; con
+`think_stream` arranca con la primera frase. Se mide contra un Ollama falso
+que emite tokens a ritmo de un modelo 12B.
+
+    python benchmarks/bench_first_audio.py --tokens-per-sec 15 --runs 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "stt-llm-tts"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.brain import Brain
+from fake_ollama import FakeOllama
+
+
+async def first_audio_blocking(brain, text):
+    start = time.perf_counter()
+    await brain.think(text)
+    return time.perf_counter() - start
+
+
+async def first_audio_streaming(brain, text):
+    start = time.perf_counter()
+    first = None
+    async for _ in brain.think_stream(text):
+        if first is None:
+            first = time.perf_counter() - start
+    return first
+
+
+async def run(args):
+    with FakeOllama(tokens_per_sec=args.tokens_per_sec, prefill_delay=args.prefill_delay) as server:
+        brain = Brain(model="fake", host=server.url)
+        results = {"think": [], "think_stream": []}
+        for _ in range(args.runs):
+            results["think"].append(await first_audio_blocking(brain, "Explícame el sistema"))
+            results["think_stream"].append(await first_audio_streaming(brain, "Explícame el sistema"))
+
+    print(f"{'MODO':<14} {'MEDIANA (s)':>12} {'MIN (s)':>10} {'MAX (s)':>10}")
+    for mode, values in results.items():
+        print(f"{mode:<14} {statistics.median(values):>12.3f} {min(values):>10.3f} {max(values):>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens-per-sec", type=float, default=15.0)
+    parser.add_argument("--prefill-delay", type=float, default=0.2)
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,83 @@
+"""Latencia de STT tras el fin de la frase: transcripción completa vs incremental.
+
+Simula la llegada del audio en tiempo real: el modo incremental decodifica
+cada `--step` segundos mientras "se habla" y al final solo la cola. Lo que
+se compara es el tiempo que queda en el camino crítico tras el fin de voz.
+
+    python benchmarks/bench_incremental_stt.py grabaciones/*.wav --model small
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from faster_whisper import WhisperModel
+
+from common.incremental_stt import IncrementalTranscriber
+from wav_io import load_wav
+
+SAMPLE_RATE = 16000
+
+
+def full_transcription(model, audio):
+    start = time.perf_counter()
+    segments, _ = model.transcribe(audio, language="es")
+    text = " ".join(s.text for s in segments).strip()
+    return text, time.perf_counter() - start
+
+
+def incremental_transcription(transcriber, audio, step):
+    transcriber.reset()
+    step_samples = int(step * SAMPLE_RATE)
+    for n in range(step_samples, len(audio), step_samples):
+        transcriber.update(audio[:n])
+    start = time.perf_counter()
+    text, _ = transcriber.finalize(audio)
+    return text, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("wavs", nargs="+")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--step", type=float, default=1.0)
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    args = parser.parse_args()
+
+    model = WhisperModel(args.model, device="cpu", compute_type="int8")
+    transcriber = IncrementalTranscriber(model, sample_rate=SAMPLE_RATE, step=args.step)
+
+    rows = []
+    for path in args.wavs:
+        audio = load_wav(path, SAMPLE_RATE)
+        full_text, full_s = full_transcription(model, audio)
+        inc_text, tail_s = incremental_transcription(transcriber, audio, args.step)
+        rows.append({
+            "file": os.path.basename(path),
+            "duration_s": round(len(audio) / SAMPLE_RATE, 2),
+            "full_s": round(full_s, 3),
+            "incremental_tail_s": round(tail_s, 3),
+            "decodes": transcriber.decodes,
+            "same_text": full_text.lower() == inc_text.lower(),
+        })
+
+    if args.json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+        return
+
+    print(f"{'ARCHIVO':<28} {'DUR (s)':>8} {'COMPLETA (s)':>13} {'COLA (s)':>9} {'DECOD':>6} {'IGUAL':>6}")
+    for r in rows:
+        print(f"{r['file'][:28]:<28} {r['duration_s']:>8.2f} {r['full_s']:>13.3f} "
+              f"{r['incremental_tail_s']:>9.3f} {r['decodes']:>6} {str(r['same_text']):>6}")
+    print(f"\nMediana tras fin de voz: completa {statistics.median(r['full_s'] for r in rows):.3f} s, "
+          f"incremental {statistics.median(r['incremental_tail_s'] for r in rows):.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Primer turno en frío vs con precarga, contra un Ollama falso con carga simulada.
+
+Sin precarga el primer turno paga la carga del modelo; con `OllamaLLM.preload`
+y `keep_alive` ese coste sale del camino crítico. También comprueba que
+`num_predict` del perfil acota la respuesta y muestra TTFT y tokens/s.
+
+    python benchmarks/bench_llm_client.py --load-delay 3 --turns 3
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from common.llm_client import OllamaLLM
+from fake_ollama import FakeOllama
+
+MESSAGES = [{"role": "user", "content": "Explícame el sistema"}]
+
+
+async def session(url, preload, turns, num_predict):
+    llm = OllamaLLM("fake", host=url, options={"num_predict": num_predict})
+    startup = await llm.preload() if preload else 0.0
+    for _ in range(turns):
+        async for _ in llm.chat_stream(MESSAGES):
+            pass
+    return startup, llm
+
+
+def run(args):
+    print(f"{'MODO':<12} {'ARRANQUE (s)':>13} {'TTFT 1º (s)':>12} {'TTFT p50 (s)':>13} "
+          f"{'TOKENS':>7} {'TOK/S':>7} {'CARGAS':>7}")
+    for preload in (False, True):
+        with FakeOllama(tokens_per_sec=args.tokens_per_sec, prefill_delay=args.prefill_delay,
+                        load_delay=args.load_delay) as server:
+            startup, llm = asyncio.run(session(server.url, preload, args.turns, args.num_predict))
+            stats = llm.stats()
+            first = llm.metrics[0]
+            mode = "precarga" if preload else "en frío"
+            print(f"{mode:<12} {startup:>13.3f} {first['ttft_s']:>12.3f} {stats['ttft_p50_s']:>13.3f} "
+                  f"{first['tokens']:>7} {stats['tokens_per_s']:>7} {server.loads:>7}")
+            options = server.requests[-1][1].get("options", {})
+            assert options.get("num_predict") == args.num_predict, options
+            assert server.loads == 1, "keep_alive no respetado: el modelo se recargó"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--load-delay", type=float, default=3.0)
+    parser.add_argument("--prefill-delay", type=float, default=0.15)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--num-predict", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3)
+    run(parser.parse_args())
@@ -0,0 +1,130 @@
+"""Memoria reservada por las conversiones PCM de los servicios de pipecat.
+
+Dos escenarios, con el código de antes y con common/pcm.py, medidos con
+tracemalloc (numpy registra ahí sus arrays):
+
+- frase de 30 s que llega en frames de 20 ms a LocalWhisperService con
+  transcripción incremental (el audio acumulado se pide cada segundo) y la
+  conversión final de run_stt;
+- respuesta de 30 s de LocalKokoroService: trozos float32 de Kokoro
+  convertidos a PCM16 para cada AudioRawFrame.
+
+"Reservado" suma, conversión a conversión, lo que sube el pico de
+tracemalloc (temporales incluidos); "pico" es el máximo del escenario.
+
+    python benchmarks/bench_pcm_alloc.py --seconds 30
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.pcm import PcmAccumulator, float_to_pcm16
+
+SAMPLE_RATE = 16000
+FRAME_BYTES = 640   # 20 ms de PCM16 a 16 kHz
+CHUNK_S = 2.5       # Un trozo de Kokoro (una frase corta)
+
+
+class Meter:
+    def __init__(self):
+        self.allocated = 0
+        self.peak = 0
+        self.seconds = 0.0
+
+    def __call__(self, fn, *args):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        result = fn(*args)
+        self.seconds += time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        self.allocated += peak - base
+        self.peak = max(self.peak, peak)
+        return result
+
+
+def stt_legacy(frames, meter):
+    speech = bytearray()
+    for i, frame in enumerate(frames):
+        meter(speech.extend, frame)
+        if (i + 1) % 50 == 0:
+            # _speech_array() de antes: bytes(), frombuffer, astype y división
+            meter(lambda: np.frombuffer(bytes(speech), dtype=np.int16).astype(np.float32) / 32768.0)
+    return meter(lambda: np.frombuffer(bytes(speech), dtype=np.int16).astype(np.float32) / 32768.0)
+
+
+def stt_pooled(frames, meter):
+    speech = PcmAccumulator()
+    for i, frame in enumerate(frames):
+        meter(speech.extend_pcm16, frame)
+        if (i + 1) % 50 == 0:
+            meter(speech.view)
+    return meter(speech.view)
+
+
+def tts_legacy(chunks, meter):
+    return [meter(lambda c=c: (c * 32767).astype(np.int16).tobytes()) for c in chunks]
+
+
+def tts_pooled(chunks, meter):
+    return [meter(float_to_pcm16, c) for c in chunks]
+
+
+def run(fn, data):
+    tracemalloc.start()
+    meter = Meter()
+    result = fn(data, meter)
+    tracemalloc.stop()
+    return meter, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n = int(args.seconds * SAMPLE_RATE)
+    voice = np.clip(0.3 * rng.standard_normal(n), -1, 1).astype(np.float32)
+    pcm = bytes(float_to_pcm16(voice))
+    frames = [pcm[i:i + FRAME_BYTES] for i in range(0, len(pcm), FRAME_BYTES)]
+    step = int(CHUNK_S * SAMPLE_RATE)
+    chunks = [voice[i:i + step] for i in range(0, n, step)]
+
+    rows = []
+    results = {}
+    for scenario, legacy, pooled, data in (("stt", stt_legacy, stt_pooled, frames),
+                                           ("tts", tts_legacy, tts_pooled, chunks)):
+        for variant, fn in (("antes", legacy), ("pcm.py", pooled)):
+            meter, result = run(fn, data)
+            results[(scenario, variant)] = result
+            rows.append({"scenario": scenario, "variant": variant,
+                         "allocated_mb": round(meter.allocated / 2**20, 2),
+                         "peak_mb": round(meter.peak / 2**20, 2),
+                         "ms": round(meter.seconds * 1000, 1)})
+
+    # Mismo resultado bit a bit
+    same_stt = np.array_equal(results[("stt", "antes")], results[("stt", "pcm.py")])
+    same_tts = b"".join(results[("tts", "antes")]) == b"".join(bytes(b) for b in results[("tts", "pcm.py")])
+    if args.json:
+        print(json.dumps({"rows": rows, "identical": same_stt and same_tts}, indent=2))
+        return
+    print(f"{args.seconds:.0f} s de audio a {SAMPLE_RATE} Hz")
+    print(f"{'ESCENARIO':<10} {'VARIANTE':<8} {'RESERVADO (MB)':>15} {'PICO (MB)':>10} {'TIEMPO (ms)':>12}")
+    for row in rows:
+        print(f"{row['scenario']:<10} {row['variant']:<8} {row['allocated_mb']:>15.2f} "
+              f"{row['peak_mb']:>10.2f} {row['ms']:>12.1f}")
+    print(f"Resultados idénticos: {'sí' if same_stt and same_tts else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
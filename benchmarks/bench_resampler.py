@@ -0,0 +1,67 @@
+"""Micro-benchmark del re-muestreo: np.interp lineal (ruta anterior) vs polifásico.
+
+Mide 24 kHz -> 44.1 kHz (Speaker) y 24 kHz -> 16 kHz (LocalKokoroService),
+tanto de una vez como en streaming por trozos del tamaño que entrega Kokoro.
+
+    python benchmarks/bench_resampler.py --seconds 5 --repeat 200
+"""
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+
+from common.resampler import StreamingResampler, resample
+
+
+def interp_resample(audio, source_sr, target_sr):
+    """Copia de la implementación anterior (utils/audio_tools.py)."""
+    num_samples = int(len(audio) * target_sr / source_sr)
+    return np.interp(
+        np.linspace(0, len(audio), num_samples),
+        np.arange(len(audio)),
+        audio
+    ).astype(np.float32)
+
+
+def interp_chunks(chunks, source_sr, target_sr):
+    return [interp_resample(c, source_sr, target_sr) for c in chunks]
+
+
+def streaming_chunks(resampler, chunks):
+    out = [resampler.process(c) for c in chunks]
+    out.append(resampler.flush())
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--chunk-seconds", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    src = 24000
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(int(args.seconds * src)) * 0.1).astype(np.float32)
+    chunks = np.array_split(audio, max(1, int(args.seconds / args.chunk_seconds)))
+
+    print(f"{'CONVERSIÓN':<18} {'MODO':<10} {'INTERP (ms)':>12} {'POLIFÁSICO (ms)':>16} {'x':>6}")
+    for dst in (44100, 16000):
+        resampler = StreamingResampler(src, dst)
+        cases = {
+            "completo": (lambda: interp_resample(audio, src, dst), lambda: resample(audio, src, dst)),
+            "trozos": (lambda: interp_chunks(chunks, src, dst), lambda: streaming_chunks(resampler, chunks)),
+        }
+        for mode, (old, new) in cases.items():
+            old_ms = min(timeit.repeat(old, number=1, repeat=args.repeat)) * 1000
+            new_ms = min(timeit.repeat(new, number=1, repeat=args.repeat)) * 1000
+            print(f"{f'{src} -> {dst}':<18} {mode:<10} {old_ms:>12.3f} {new_ms:>16.3f} {old_ms / new_ms:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Coste en el hilo del pipeline de registrar cada frase.
+
+Compara lo de antes (abrir, añadir una línea y cerrar el fichero en cada
+TextFrame, como TextToFileWriter) con `SessionRecorder.record`, que solo
+encola. Mide p50/p99/máximo por registro en el hilo que llama (el que en el
+agente es el event loop) y el tiempo que tarda el hilo de escritura en
+vaciar la cola. Con `--audio`, cada registro lleva además 3 s de PCM.
+
+    python benchmarks/bench_session_log.py --records 5000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.session_log import SessionRecorder
+
+TEXT = "Pon una alarma a las siete y media, por favor."
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 4),
+            "p99_ms": round(float(np.percentile(ms, 99)), 4),
+            "max_ms": round(float(ms.max()), 3)}
+
+
+def legacy(directory, records, audio):
+    path = os.path.join(directory, "transcription_output.txt")
+    times = []
+    for i in range(records):
+        start = time.perf_counter()
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"{TEXT}\n")
+        if audio is not None:
+            with open(path + ".pcm", "ab") as f:
+                f.write((audio * 32767).astype(np.int16).tobytes())
+        times.append(time.perf_counter() - start)
+    return times, 0.0
+
+
+def recorder(directory, records, audio, compress):
+    session = SessionRecorder(directory, compress=compress, max_bytes=2**20)
+    times = []
+    for i in range(records):
+        start = time.perf_counter()
+        session.new_turn()
+        session.record("user", text=TEXT, stt_s=0.21)
+        if audio is not None:
+            session.record_audio(audio, 16000)
+        times.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    session.close(timeout=60)
+    return times, time.perf_counter() - start, session.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--audio", action="store_true", help="3 s de audio por registro")
+    parser.add_argument("--compress", action="store_true", help="Comprimir los JSONL rotados")
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    args = parser.parse_args()
+
+    audio = None
+    if args.audio:
+        audio = (0.1 * np.random.default_rng(0).standard_normal(3 * 16000)).astype(np.float32)
+    rows = {}
+    with tempfile.TemporaryDirectory() as directory:
+        times, _ = legacy(directory, args.records, audio)
+        rows["antes"] = {**percentiles(times), "drain_s": 0.0}
+    with tempfile.TemporaryDirectory() as directory:
+        times, drain, stats = recorder(directory, args.records, audio, args.compress)
+        rows["session_log"] = {**percentiles(times), "drain_s": round(drain, 3), "stats": stats}
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{args.records} registros{' con audio' if args.audio else ''}, tiempo en el hilo que llama")
+    print(f"{'VARIANTE':<12} {'p50 (ms)':>10} {'p99 (ms)':>10} {'máx (ms)':>10} {'vaciado (s)':>12}")
+    for name, row in rows.items():
+        print(f"{name:<12} {row['p50_ms']:>10.4f} {row['p99_ms']:>10.4f} {row['max_ms']:>10.3f} {row['drain_s']:>12.3f}")
+    print(f"Hilo de escritura: {rows['session_log']['stats']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Coste y efecto del filtro previo a Whisper (common/stt_gate.py).
+
+Genera frases sintéticas de cuatro tipos (voz, silencio, golpe, ruido de
+fondo), mide lo que tarda `SpeechGate.check` por frase y cuántas
+decodificaciones se habrían evitado. Si se pasa `--model`, decodifica con
+faster-whisper las que pasan el filtro y las que no, para ver cuánto
+tiempo de Whisper se ahorra. También compara la lista negra compilada con
+la búsqueda lineal de antes sobre textos normales.
+
+    python benchmarks/bench_stt_gate.py --segments 200
+    python benchmarks/bench_stt_gate.py --model tiny
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.stt_gate import HALLUCINATIONS, SpeechGate, compile_blacklist, normalize
+
+SAMPLE_RATE = 16000
+KINDS = ("voz", "silencio", "golpe", "ruido")
+
+
+def segment(kind, rng):
+    n = int(rng.uniform(0.6, 3.0) * SAMPLE_RATE)
+    room = (0.0005 * rng.standard_normal(n)).astype(np.float32)
+    if kind == "voz":
+        t = np.arange(n) / SAMPLE_RATE
+        f0 = rng.uniform(110, 220)
+        voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 12))
+        envelope = np.abs(np.sin(np.pi * t * rng.uniform(3, 5))) ** 0.5
+        return room + (0.08 * voice * envelope).astype(np.float32)
+    if kind == "golpe":
+        at = rng.integers(0, n - 320)
+        room[at:at + 320] += rng.uniform(-0.5, 0.5, 320).astype(np.float32) * np.linspace(1, 0, 320, dtype=np.float32)
+        return room
+    if kind == "ruido":
+        return room + (0.002 * rng.standard_normal(n)).astype(np.float32)
+    return room
+
+
+def bench_blacklist(phrases, repeat):
+    """µs por texto: una expresión compilada (normalizando) vs `any(h in text)` sobre la lista."""
+    texts = ["¿Qué tiempo hace mañana en Madrid?", "Pon una alarma a las siete y media.",
+             "Gracias por ver el vídeo", "Explícame cómo reiniciar el router de casa paso a paso."] * 25
+    pattern = compile_blacklist(phrases)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            pattern.search(normalize(text))
+    compiled = (time.perf_counter() - start) / (repeat * len(texts))
+
+    legacy = [h.lower() for h in phrases]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            lowered = text.lower()
+            any(h in lowered for h in legacy)
+    linear = (time.perf_counter() - start) / (repeat * len(texts))
+    return round(compiled * 1e6, 2), round(linear * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, default=200)
+    parser.add_argument("--model", help="Modelo de faster-whisper para medir el tiempo ahorrado (CPU, int8)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    gate = SpeechGate()
+    rows = {kind: {"segments": 0, "skipped": 0, "check_ms": []} for kind in KINDS}
+    decoded = {"skipped": [], "passed": []}
+    model = None
+    if args.model:
+        from faster_whisper import WhisperModel
+
+        model = WhisperModel(args.model, device="cpu", compute_type="int8")
+
+    for i in range(args.segments):
+        kind = KINDS[i % len(KINDS)]
+        audio = segment(kind, rng)
+        start = time.perf_counter()
+        reason = gate.check(audio)
+        rows[kind]["check_ms"].append((time.perf_counter() - start) * 1000)
+        rows[kind]["segments"] += 1
+        rows[kind]["skipped"] += reason is not None
+        if model is not None:
+            start = time.perf_counter()
+            segments, _ = model.transcribe(audio, language="es", vad_filter=True)
+            list(segments)
+            decoded["skipped" if reason else "passed"].append(time.perf_counter() - start)
+
+    # Lista de siempre y una larga (frases propias del despliegue añadidas a la configuración)
+    extra = [f"{a} {b}" for a in ("gracias por", "subtítulos de", "música de", "visita")
+             for b in (f"canal {i}" for i in range(50))]
+    blacklist = {"default": bench_blacklist(HALLUCINATIONS, 200),
+                 "long": bench_blacklist(list(HALLUCINATIONS) + extra, 20)}
+    result = {
+        "kinds": {kind: {"segments": r["segments"], "skipped": r["skipped"],
+                         "check_ms_p50": round(float(np.median(r["check_ms"])), 3)}
+                  for kind, r in rows.items()},
+        "gate": gate.stats(),
+        "blacklist_us": {name: {"phrases": n, "compiled": c, "linear": l}
+                         for (name, (c, l)), n in zip(blacklist.items(), (len(HALLUCINATIONS), len(HALLUCINATIONS) + len(extra)))},
+    }
+    if model is not None:
+        result["whisper_s_saved"] = round(sum(decoded["skipped"]), 2)
+        result["whisper_s_spent"] = round(sum(decoded["passed"]), 2)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+    print(f"{'TIPO':<9} {'FRASES':>7} {'OMITIDAS':>9} {'check p50 (ms)':>15}")
+    for kind, row in result["kinds"].items():
+        print(f"{kind:<9} {row['segments']:>7} {row['skipped']:>9} {row['check_ms_p50']:>15.3f}")
+    print(f"Decodificaciones evitadas: {result['gate']['decodes_avoided']} de {result['gate']['checked']}")
+    for row in result["blacklist_us"].values():
+        print(f"Lista negra de {row['phrases']} frases: {row['compiled']} µs/texto compilada "
+              f"(normalizando), {row['linear']} µs lineal")
+    if model is not None:
+        print(f"Whisper: {result['whisper_s_saved']} s ahorrados, {result['whisper_s_spent']} s en frases con voz")
+
+
+if __name__ == "__main__":
+    main()
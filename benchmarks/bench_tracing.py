@@ -0,0 +1,138 @@
+"""Coste de la traza de frames y del monitor del event loop.
+
+Cadena de procesadores falsos con la misma forma que los de pipecat (cola
+de entrada, process_frame, push_frame al siguiente) recorrida por N
+frames, con y sin FrameTracer + LoopLagMonitor. Con `--block-ms`, una
+etapa bloquea el loop de vez en cuando para ver que el monitor lo detecta
+y señala dónde. `--export` guarda la traza en formato Chrome.
+
+    python benchmarks/bench_tracing.py --frames 20000
+    python benchmarks/bench_tracing.py --block-ms 120 --export /tmp/trace.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "pipecat-local-agent"))
+
+from common.tracing import LoopLagMonitor, TraceBuffer
+from services.frame_tracer import FrameTracer
+
+STAGES = ("transport.input", "stt", "llm", "tts", "transport.output")
+
+
+class Frame:
+    _next_id = 0
+
+    def __init__(self):
+        Frame._next_id += 1
+        self.id = Frame._next_id
+
+
+class AudioFrame(Frame):
+    pass
+
+
+class FakeProcessor:
+    def __init__(self, name, block_every=0, block_s=0.0):
+        self.name = name
+        self.next = None
+        self.queue = asyncio.Queue()
+        self.block_every = block_every
+        self.block_s = block_s
+        self.seen = 0
+
+    async def run(self):
+        while True:
+            frame, direction = await self.queue.get()
+            await self.process_frame(frame, direction)
+
+    async def process_frame(self, frame, direction):
+        self.seen += 1
+        if self.block_every and self.seen % self.block_every == 0:
+            time.sleep(self.block_s)  # Trabajo síncrono en el loop: lo que el monitor debe ver
+        await self.push_frame(frame, direction)
+
+    async def push_frame(self, frame, direction=1):
+        if self.next is not None:
+            await self.next.queue.put((frame, direction))
+
+
+async def run_chain(frames, traced, block_ms):
+    processors = [FakeProcessor(name) for name in STAGES]
+    if block_ms:
+        processors[3].block_every, processors[3].block_s = max(1, frames // 5), block_ms / 1000
+    for a, b in zip(processors, processors[1:]):
+        a.next = b
+    tracer = monitor = None
+    if traced:
+        trace = TraceBuffer()
+        tracer = FrameTracer(trace)
+        tracer.instrument(processors)
+        monitor = LoopLagMonitor(trace).start()
+    tasks = [asyncio.create_task(p.run()) for p in processors]
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        await processors[0].queue.put((AudioFrame(), 1))
+        # Como el transporte real: los frames llegan de uno en uno, no de golpe
+        await asyncio.sleep(0)
+    while processors[-1].seen < frames:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    # Un latido más: el último bloqueo se registra al volver el loop
+    await asyncio.sleep(0.05)
+    for task in tasks:
+        task.cancel()
+    if monitor is not None:
+        monitor.stop()
+    return elapsed, tracer, monitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--block-ms", type=float, default=0.0, help="Bloqueo síncrono en la etapa tts")
+    parser.add_argument("--export", help="Fichero de traza Chrome (JSON)")
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    args = parser.parse_args()
+
+    plain, _, _ = asyncio.run(run_chain(args.frames, False, args.block_ms))
+    traced, tracer, monitor = asyncio.run(run_chain(args.frames, True, args.block_ms))
+    hops = args.frames * len(STAGES)
+    result = {
+        "frames": args.frames,
+        "plain_us_per_hop": round(plain / hops * 1e6, 2),
+        "traced_us_per_hop": round(traced / hops * 1e6, 2),
+        "overhead_us_per_hop": round((traced - plain) / hops * 1e6, 2),
+        "events": len(tracer.trace),
+        "loop": monitor.summary(),
+        "stalls": [{"ms": ms, "at": stack[-1]} for ms, stack in monitor.stalls],
+        "top": tracer.summary(top=5),
+    }
+    if args.export:
+        result["export"] = tracer.trace.export(args.export)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{args.frames} frames x {len(STAGES)} etapas")
+    print(f"Sin traza: {result['plain_us_per_hop']} µs por etapa; con traza: {result['traced_us_per_hop']} µs "
+          f"(+{result['overhead_us_per_hop']} µs), {result['events']} eventos")
+    print(f"Event loop: {result['loop']}")
+    for stall in result["stalls"]:
+        print(f"  bloqueo de {stall['ms']} ms en {stall['at']}")
+    for row in result["top"]:
+        print(f"  {row['processor']:<17} {row['frame']:<11} n={row['count']:<6} media {row['mean_ms']} ms, "
+              f"cola media {row['queue_mean_ms']} ms")
+    if args.export:
+        print(f"Traza: {result['export']}")
+
+
+if __name__ == "__main__":
+    main()
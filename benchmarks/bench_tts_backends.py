@@ -0,0 +1,116 @@
+"""Kokoro en CPU: KPipeline (PyTorch) vs ONNX Runtime (fp32 e int8).
+
+Cada backend se mide en un proceso nuevo para que la memoria de uno (torch
+importado, pesos) no cuente en el otro: tiempo de carga (imports incluidos),
+RSS tras cargar, pico de RSS, primer trozo de audio y RTF sobre unas frases
+de respuesta típicas.
+
+    python setup_ia.py   # kokoro-v1.0.onnx y voices.bin en el almacén de modelos
+    python benchmarks/bench_tts_backends.py --backends torch onnx onnx-int8 --threads 4
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+SENTENCES = [
+    "Hola, ¿en qué puedo ayudarte?",
+    "Mañana en Madrid habrá cielos despejados y una máxima de veinticuatro grados.",
+    "Para reiniciar el router, desconéctalo de la corriente, espera diez segundos y vuelve a enchufarlo.",
+    "Claro, te lo explico paso a paso. Primero abre la configuración. Después busca la sección de red.",
+]
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss va en KB en Linux y en bytes en macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def measure(backend_name, voice, speed, threads, repeat):
+    """Se ejecuta en el proceso hijo; devuelve el resultado como dict."""
+    start = time.perf_counter()
+    from common.tts_backends import create_backend
+
+    if backend_name == "torch":
+        backend = create_backend("torch")
+    else:
+        backend = create_backend("onnx", quantized=backend_name == "onnx-int8", threads=threads)
+    load_s = time.perf_counter() - start
+    loaded_rss = rss_mb()
+
+    # Calentamiento: la primera inferencia paga la inicialización de kernels
+    for _ in backend.stream(SENTENCES[0], voice, speed):
+        pass
+
+    first_chunk, compute, audio = [], 0.0, 0.0
+    for _ in range(repeat):
+        for text in SENTENCES:
+            t0 = time.perf_counter()
+            first = True
+            for chunk in backend.stream(text, voice, speed):
+                if first:
+                    first_chunk.append(time.perf_counter() - t0)
+                    first = False
+                audio += len(chunk) / backend.sample_rate
+            compute += time.perf_counter() - t0
+    return {
+        "backend": backend_name,
+        "load_s": round(load_s, 2),
+        "rss_loaded_mb": round(loaded_rss, 1),
+        "rss_peak_mb": round(peak_rss_mb(), 1),
+        "first_chunk_ms": round(1000 * sorted(first_chunk)[len(first_chunk) // 2], 1),
+        "rtf": round(compute / audio, 3) if audio else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=["torch", "onnx", "onnx-int8"],
+                        default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--voice", default="em_alex")
+    parser.add_argument("--speed", type=float, default=1.1)
+    parser.add_argument("--threads", type=int, default=None, help="Hilos intra-op de ONNX Runtime")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.voice, args.speed, args.threads, args.repeat)))
+        return
+
+    rows = []
+    for name in args.backends:
+        cmd = [sys.executable, __file__, "--child", name, "--voice", args.voice,
+               "--speed", str(args.speed), "--repeat", str(args.repeat)]
+        if args.threads:
+            cmd += ["--threads", str(args.threads)]
+        out = subprocess.run(cmd, capture_output=True, text=True)
+        if out.returncode != 0:
+            print(f"[!] {name} falló:\n{out.stderr.strip()}", file=sys.stderr)
+            continue
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'BACKEND':<10} {'CARGA (s)':>10} {'RSS (MB)':>9} {'PICO (MB)':>10} {'1er TROZO (ms)':>15} {'RTF':>7}")
+    for row in rows:
+        print(f"{row['backend']:<10} {row['load_s']:>10.2f} {row['rss_loaded_mb']:>9.1f} "
+              f"{row['rss_peak_mb']:>10.1f} {row['first_chunk_ms']:>15.1f} {row['rtf']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
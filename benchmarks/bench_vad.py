@@ -0,0 +1,220 @@
+"""Detección de voz y fin de frase sobre WAVs etiquetados.
+
+Cada WAV lleva al lado un fichero de etiquetas de Audacity con el mismo
+nombre (`clip.wav` -> `clip.txt`, líneas "inicio<TAB>fin<TAB>texto" en
+segundos) que marca dónde hay voz. El audio se pasa en bloques de 512
+muestras, igual que el callback del micrófono, por:
+
+- legacy: la regla anterior de Listener (norma del bloque * 10 > 0.5 y
+  0.7 s de silencio para cortar)
+- energy: EnergyVAD + Endpointer (common/vad.py)
+- silero: SileroVAD + Endpointer (necesita onnxruntime y silero_vad.onnx)
+
+Métricas: retardo de fin de frase (desde el final real de la voz hasta que
+se da la frase por terminada) p50/p95, frases perdidas, frases cortadas a
+mitad y disparos falsos por minuto de audio sin voz.
+
+    python benchmarks/bench_vad.py corpus/vad/ --noise 0.01 --hum 0.02
+    python benchmarks/bench_vad.py --synthetic 20 --detectors legacy energy
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.vad import Endpointer, create_vad
+from wav_io import corpus_files, load_wav
+
+SAMPLE_RATE = 16000
+BLOCK = 512
+
+
+class LegacyEndpointer:
+    """El detector de Listener antes de common/vad.py, con la interfaz de Endpointer."""
+
+    def __init__(self, threshold=0.5, silence_limit=0.7):
+        self.threshold = threshold
+        self.silence_limit = silence_limit
+        self.position = 0
+        self.in_speech = False
+        self._silence = 0.0
+
+    def process(self, block, strict=False):
+        start = self.position
+        self.position += len(block)
+        voiced = np.linalg.norm(block) * 10 > self.threshold
+        if not self.in_speech:
+            if voiced:
+                self.in_speech = True
+                self._silence = 0.0
+                return [("start", start)]
+            return []
+        if voiced:
+            self._silence = 0.0
+        else:
+            self._silence += len(block) / SAMPLE_RATE
+            if self._silence >= self.silence_limit:
+                self.in_speech = False
+                return [("end", self.position)]
+        return []
+
+
+def load_labels(path):
+    labels = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.strip().split("\t")
+            if len(fields) >= 2 and not line.startswith("\\"):
+                labels.append((float(fields[0]), float(fields[1])))
+    return sorted(labels)
+
+
+def synthetic_clip(rng, utterances=3):
+    """Clip con frases de voz sintética (armónicos con sílabas), pausas y un chasquido."""
+    parts, labels, t = [], [], 0.0
+
+    def silence(seconds):
+        parts.append(np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32))
+
+    silence(rng.uniform(0.8, 1.5))
+    t = sum(len(p) for p in parts) / SAMPLE_RATE
+    for _ in range(utterances):
+        start = t
+        for word in range(rng.integers(1, 8)):
+            duration = rng.uniform(0.2, 0.6)
+            n = int(duration * SAMPLE_RATE)
+            time_axis = np.arange(n) / SAMPLE_RATE
+            f0 = rng.uniform(110, 220)
+            voice = sum(np.sin(2 * np.pi * f0 * k * time_axis) / k for k in range(1, 12))
+            envelope = np.abs(np.sin(np.pi * time_axis * rng.uniform(3, 5))) ** 0.5
+            parts.append((0.08 * voice * envelope).astype(np.float32))
+            # Pausas cortas entre palabras: no deben cortar la frase
+            gap = rng.uniform(0.05, 0.25)
+            silence(gap)
+            t += duration + gap
+        labels.append((start, t - gap))
+        pause = rng.uniform(1.2, 2.5)
+        silence(pause)
+        t += pause
+        if rng.random() < 0.5:
+            # Golpe en la mesa en mitad del silencio: no debe disparar
+            click = np.zeros(int(0.5 * SAMPLE_RATE), dtype=np.float32)
+            click[:160] = rng.uniform(-0.5, 0.5, 160) * np.linspace(1, 0, 160)
+            parts.append(click)
+            silence(1.0)
+            t += 1.5
+    return np.concatenate(parts), labels
+
+
+def add_noise(audio, rng, noise=0.0, hum=0.0):
+    out = audio.copy()
+    if noise:
+        out += noise * rng.standard_normal(len(out)).astype(np.float32)
+    if hum:
+        t = np.arange(len(out)) / SAMPLE_RATE
+        out += (hum * (np.sin(2 * np.pi * 50 * t) + 0.5 * np.sin(2 * np.pi * 100 * t))).astype(np.float32)
+    return out
+
+
+def run_detector(detector, audio):
+    """Segmentos (inicio, fin) en segundos; el fin es el instante en que se decide."""
+    segments, start = [], None
+    for i in range(0, len(audio) - BLOCK + 1, BLOCK):
+        for event, position in detector.process(audio[i:i + BLOCK]):
+            if event == "start":
+                start = position / SAMPLE_RATE
+            elif event == "end" and start is not None:
+                segments.append((start, position / SAMPLE_RATE))
+                start = None
+    if start is not None:
+        segments.append((start, len(audio) / SAMPLE_RATE))
+    return segments
+
+
+def score(segments, labels, duration):
+    delays, missed, split = [], 0, 0
+    matched = set()
+    for label_start, label_end in labels:
+        hits = [i for i, (s, e) in enumerate(segments) if s < label_end and e > label_start]
+        if not hits:
+            missed += 1
+            continue
+        matched.update(hits)
+        if len(hits) > 1:
+            split += 1
+        delays.append(segments[hits[-1]][1] - label_end)
+    false = len(segments) - len(matched)
+    speech = sum(e - s for s, e in labels)
+    return {"delays": delays, "missed": missed, "split": split, "false": false,
+            "utterances": len(labels), "nonspeech_s": max(duration - speech, 0.0)}
+
+
+def make_detector(name):
+    if name == "legacy":
+        return LegacyEndpointer()
+    return Endpointer(create_vad(name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="*", help="Directorios o ficheros WAV con su .txt de etiquetas")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generar N clips etiquetados")
+    parser.add_argument("--detectors", nargs="+", choices=["legacy", "energy", "silero"],
+                        default=["legacy", "energy"])
+    parser.add_argument("--noise", type=float, default=0.0, help="Ruido blanco añadido (amplitud)")
+    parser.add_argument("--hum", type=float, default=0.0, help="Zumbido de red de 50/100 Hz añadido")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    clips = []
+    for path in corpus_files(args.corpus):
+        labels_path = os.path.splitext(path)[0] + ".txt"
+        if not os.path.exists(labels_path):
+            print(f"[!] {os.path.basename(path)}: sin etiquetas, se omite", file=sys.stderr)
+            continue
+        clips.append((load_wav(path, SAMPLE_RATE), load_labels(labels_path)))
+    clips += [synthetic_clip(rng) for _ in range(args.synthetic)]
+    if not clips:
+        parser.error("no hay clips: pasa WAVs etiquetados o --synthetic N")
+    clips = [(add_noise(audio, rng, args.noise, args.hum), labels) for audio, labels in clips]
+
+    rows = []
+    for name in args.detectors:
+        total = {"delays": [], "missed": 0, "split": 0, "false": 0, "utterances": 0, "nonspeech_s": 0.0}
+        for audio, labels in clips:
+            # Detector nuevo por clip: cada uno es una sesión con su propio ruido de fondo
+            result = score(run_detector(make_detector(name), audio), labels, len(audio) / SAMPLE_RATE)
+            for key in total:
+                total[key] += result[key]
+        delays = np.array(total["delays"]) * 1000
+        rows.append({
+            "detector": name,
+            "utterances": total["utterances"],
+            "missed": total["missed"],
+            "split": total["split"],
+            "false_per_min": round(total["false"] / max(total["nonspeech_s"] / 60, 1e-9), 2),
+            "endpoint_p50_ms": round(float(np.percentile(delays, 50)), 1) if len(delays) else None,
+            "endpoint_p95_ms": round(float(np.percentile(delays, 95)), 1) if len(delays) else None,
+        })
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{len(clips)} clips, {rows[0]['utterances']} frases (ruido={args.noise}, zumbido={args.hum})")
+    print(f"{'DETECTOR':<9} {'PERDIDAS':>9} {'CORTADAS':>9} {'FALSOS/min':>11} {'FIN p50 (ms)':>13} {'FIN p95 (ms)':>13}")
+    for row in rows:
+        p50 = f"{row['endpoint_p50_ms']:.0f}" if row["endpoint_p50_ms"] is not None else "-"
+        p95 = f"{row['endpoint_p95_ms']:.0f}" if row["endpoint_p95_ms"] is not None else "-"
+        print(f"{row['detector']:<9} {row['missed']:>9} {row['split']:>9} {row['false_per_min']:>11.2f} "
+              f"{p50:>13} {p95:>13}")
+
+
+if __name__ == "__main__":
+    main()
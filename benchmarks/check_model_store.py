@@ -0,0 +1,140 @@
+"""Comprueba common/model_store.py contra un servidor local (sin red).
+
+Escenarios: descarga en paralelo por trozos, corte a mitad y reanudación
+(solo se piden los trozos que faltan), hash incorrecto en el manifiesto,
+servidor sin Range, confianza en el primer uso, rama mutable sin hash y
+verificación rápida/profunda
+de un blob dañado. Imprime el tiempo de cada descarga y de la verificación.
+
+    python benchmarks/check_model_store.py --size-mb 64
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from common.model_store import ChecksumError, ModelStore, UnpinnedError
+from fake_model_server import FakeModelServer
+
+
+def manifest_for(server, files, hashed=True):
+    return {"model": {"files": {
+        name: {"url": f"{server.url}/{name}",
+               "size": len(data) if hashed else None,
+               "sha256": hashlib.sha256(data).hexdigest() if hashed else None}
+        for name, data in files.items()
+    }}}
+
+
+def check(condition, message):
+    print(f"  {'OK ' if condition else 'FALLO'} {message}")
+    if not condition:
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=32)
+    parser.add_argument("--chunk-mb", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    files = {"model.bin": os.urandom(args.size_mb * 2**20), "config.json": b'{"layers": 24}'}
+    served = {f"/{name}": data for name, data in files.items()}
+    chunk = args.chunk_mb * 2**20
+
+    with tempfile.TemporaryDirectory() as tmp, FakeModelServer(served) as server:
+        print("Descarga en paralelo por trozos")
+        store = ModelStore(os.path.join(tmp, "a"), manifest_for(server, files),
+                           workers=args.workers, chunk_size=chunk)
+        start = time.perf_counter()
+        path = store.ensure("model")
+        elapsed = time.perf_counter() - start
+        with open(os.path.join(path, "model.bin"), "rb") as f:
+            check(f.read() == files["model.bin"], f"contenido correcto ({elapsed:.2f} s)")
+        check(store.verify("model", deep=True) == [], "verificación profunda limpia")
+        start = time.perf_counter()
+        store.ensure("model")
+        check(time.perf_counter() - start < 0.5, "segundo ensure solo verifica (sin descargar)")
+
+        print("Corte a mitad y reanudación")
+        # Tres trozos enteros y uno de un cuarto: con el corte a media respuesta
+        # solo el último llega completo en el primer intento
+        files["tail.bin"] = os.urandom(chunk * 3 + chunk // 4)
+        served["/tail.bin"] = files["tail.bin"]
+        server.fail_after = chunk // 2
+        store = ModelStore(os.path.join(tmp, "b"), manifest_for(server, {"tail.bin": files["tail.bin"]}),
+                           workers=args.workers, chunk_size=chunk, retries=0)
+        try:
+            store.ensure("model")
+            check(False, "la descarga cortada debería fallar")
+        except OSError:
+            check(True, "la descarga cortada falla sin dejar el fichero final")
+        check(not os.path.exists(os.path.join(store.artifact_dir("model"), "tail.bin")),
+              "no hay enlace a un fichero a medias")
+        server.fail_after = None
+        sent_before = server.bytes_sent
+        store.ensure("model")
+        resumed = server.bytes_sent - sent_before
+        check(store.verify("model", deep=True) == [], "reanudada y verificada")
+        check(resumed < len(files["tail.bin"]),
+              f"solo se pidieron los trozos que faltaban ({resumed} de {len(files['tail.bin'])} bytes)")
+
+        print("Hash incorrecto en el manifiesto")
+        bad = manifest_for(server, {"config.json": files["config.json"]})
+        bad["model"]["files"]["config.json"]["sha256"] = "0" * 64
+        store = ModelStore(os.path.join(tmp, "c"), bad)
+        try:
+            store.ensure("model")
+            check(False, "debería rechazar el contenido")
+        except ChecksumError:
+            check(True, "ChecksumError y nada en blobs/")
+        check(os.listdir(os.path.join(tmp, "c", "blobs", "sha256")) == [], "blobs/ vacío")
+
+        print("Servidor sin Range y confianza en el primer uso")
+        server.ranges = False
+        try:
+            ModelStore(os.path.join(tmp, "d"), manifest_for(server, files, hashed=False)).ensure("model")
+            check(False, "sin hash solo se descarga al fijar (--pin)")
+        except UnpinnedError:
+            check(True, "sin hash y sin --pin: UnpinnedError")
+        store = ModelStore(os.path.join(tmp, "d"), manifest_for(server, files, hashed=False),
+                           trust_on_first_use=True)
+        store.ensure("model")
+        check(store.verify("model", deep=True) == [], "descarga de una sola petición verificada")
+        pinned = store.pin()["model"]["files"]["model.bin"]
+        check(pinned["sha256"] == hashlib.sha256(files["model.bin"]).hexdigest(), "hash fijado en el manifiesto")
+        server.ranges = True
+
+        print("Rama mutable sin hash")
+        mutable = {"model": {"files": {"model.bin": {
+            "url": "https://huggingface.co/org/modelo/resolve/main/model.bin", "size": None, "sha256": None}}}}
+        try:
+            ModelStore(os.path.join(tmp, "e"), mutable).ensure("model")
+            check(False, "debería negarse a descargar de una rama sin hash")
+        except UnpinnedError:
+            check(True, "UnpinnedError antes de tocar la red")
+
+        print("Blob dañado")
+        blob = os.path.realpath(os.path.join(store.artifact_dir("model"), "model.bin"))
+        with open(blob, "r+b") as f:
+            f.seek(100)
+            f.write(b"\x00" * 16)
+        start = time.perf_counter()
+        fast = store.verify("model")
+        fast_s = time.perf_counter() - start
+        start = time.perf_counter()
+        deep = store.verify("model", deep=True)
+        deep_s = time.perf_counter() - start
+        check(fast == [], f"la pasada rápida no lee el contenido ({fast_s * 1000:.1f} ms)")
+        check([name for name, _ in deep] == ["model.bin"], f"la profunda detecta el daño ({deep_s * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Comprueba la negociación de frecuencias (common/audio_rates.py).
+
+Para varios dispositivos simulados (todas las frecuencias, solo 44.1/48 kHz,
+solo 48 kHz, sin información: se usa la por defecto) arma las cadenas de los dos agentes, pasa
+una frase de Kokoro por un StreamingResampler en cada salto del plan y
+verifica que hay como mucho un re-muestreo por sentido, ninguno si el
+altavoz abre a 24 kHz, y que la duración del audio se conserva. Compara
+con la cadena fija de antes (24k -> 16k en el TTS, 16k -> 44.1k en el
+transporte de pipecat).
+
+    python benchmarks/check_rate_plan.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.audio_rates import CANDIDATE_RATES, Stage, negotiate
+from common.resampler import StreamingResampler
+from common.tts_backends import KOKORO_SR
+
+STT_SR = 16000
+DEVICES = {
+    "todas": (list(CANDIDATE_RATES), 48000),
+    "44.1/48 kHz": ([44100, 48000], 44100),
+    "solo 48 kHz": ([48000], 48000),
+    "sin información": ([], 44100),
+}
+
+
+def check(condition, message):
+    print(f"  {'OK ' if condition else 'FALLO'} {message}")
+    if not condition:
+        raise SystemExit(1)
+
+
+def pipecat_output(rates, default):
+    return negotiate("salida", [
+        Stage("kokoro", [KOKORO_SR]),
+        Stage("tts", [KOKORO_SR], resamples=True),
+        Stage("transporte", resamples=True),
+        Stage("altavoz", rates or [default], native=default),
+    ])
+
+
+def speaker_output(rates, default):
+    return negotiate("salida", [
+        Stage("kokoro", [KOKORO_SR]),
+        Stage("speaker", [KOKORO_SR], resamples=True),
+        Stage("altavoz", rates or [default], native=default),
+    ])
+
+
+def pipecat_input(rates, default):
+    return negotiate("entrada", [
+        Stage("micrófono", rates or [default], native=default),
+        Stage("transporte"),
+        Stage("stt", [STT_SR]),
+    ])
+
+
+def run_chain(plan, audio):
+    """Pasa `audio` por un resampler en cada enlace; devuelve (audio, resamplers activos, s)."""
+    active = 0
+    start = time.perf_counter()
+    for src, dst in zip(plan.rates, plan.rates[1:]):
+        resampler = StreamingResampler(src, dst)
+        active += not resampler.passthrough
+        head = resampler.process(audio)
+        tail = resampler.flush()
+        audio = np.concatenate((head, tail)) if len(tail) else head
+    return audio, active, time.perf_counter() - start
+
+
+def main():
+    rng = np.random.default_rng(0)
+    phrase = (0.1 * rng.standard_normal(3 * KOKORO_SR)).astype(np.float32)
+
+    legacy = negotiate("salida", [Stage("kokoro", [KOKORO_SR]), Stage("tts", [KOKORO_SR], resamples=True),
+                                  Stage("transporte", [16000], resamples=True), Stage("altavoz", [44100])])
+    _, _, seconds = run_chain(legacy, phrase)
+    print(f"Antes (pipecat): {legacy.conversions} re-muestreos, {seconds * 1000:.1f} ms por frase de 3 s")
+
+    for name, (rates, default) in DEVICES.items():
+        print(f"\nDispositivo: {name}")
+        for label, plan in (("pipecat", pipecat_output(rates, default)),
+                            ("stt-llm-tts", speaker_output(rates, default))):
+            print("  " + plan.describe().replace("\n", "\n  "))
+            out, active, seconds = run_chain(plan, phrase)
+            device_sr = plan.rate("altavoz")
+            check(plan.conversions <= 1, f"{label}: como mucho un re-muestreo de salida")
+            check(active == plan.conversions, f"{label}: {active} resampler(s) activos, los del plan")
+            if KOKORO_SR in rates:
+                check(plan.conversions == 0 and device_sr == KOKORO_SR,
+                      f"{label}: el altavoz abre a {KOKORO_SR} Hz sin convertir")
+            check(abs(len(out) / device_sr - len(phrase) / KOKORO_SR) < 0.01,
+                  f"{label}: duración conservada ({seconds * 1000:.1f} ms)")
+        if STT_SR in rates:
+            mic = pipecat_input(rates, default)
+            check(mic.conversions == 0 and mic.rate("micrófono") == STT_SR, "entrada a 16 kHz sin convertir")
+
+    try:
+        pipecat_input([48000], 48000)
+    except ValueError:
+        print("\nMicrófono solo a 48 kHz: sin plan en el transporte (lo convierte el host)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Servidor HTTP de ficheros con Range para probar common/model_store.py sin red.
+
+Sirve un diccionario {ruta: bytes} con soporte de `Range` (o sin él, para
+probar la ruta de una sola petición), a un ritmo limitado opcional, y puede
+cortar conexiones tras N bytes para simular descargas interrumpidas.
+"""
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeModelServer:
+    def __init__(self, files, ranges=True, bytes_per_sec=None, fail_after=None,
+                 host="127.0.0.1", port=0):
+        self.files = files
+        self.ranges = ranges
+        self.bytes_per_sec = bytes_per_sec
+        # Cada respuesta se corta tras este número de bytes (None: nunca)
+        self.fail_after = fail_after
+        self.bytes_sent = 0
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                data = server.files.get(self.path)
+                range_header = self.headers.get("Range")
+                with server._lock:
+                    server.requests.append((self.path, range_header))
+                if data is None:
+                    self.send_error(404)
+                    return
+
+                match = re.fullmatch(r"bytes=(\d+)-(\d*)", range_header or "")
+                if server.ranges and match:
+                    start = int(match.group(1))
+                    end = int(match.group(2)) if match.group(2) else len(data) - 1
+                    end = min(end, len(data) - 1)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                    self.send_header("Accept-Ranges", "bytes")
+                    body = data[start:end + 1]
+                else:
+                    self.send_response(200)
+                    body = data
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self._send(body)
+
+            def _send(self, body):
+                limit = len(body) if server.fail_after is None else min(len(body), server.fail_after)
+                step = 64 * 1024
+                for offset in range(0, limit, step):
+                    block = body[offset:min(offset + step, limit)]
+                    try:
+                        self.wfile.write(block)
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                    with server._lock:
+                        server.bytes_sent += len(block)
+                    if server.bytes_per_sec:
+                        time.sleep(len(block) / server.bytes_per_sec)
+                if limit < len(body):
+                    # Corte a mitad de respuesta: el cliente ve menos bytes de los anunciados
+                    self.close_connection = True
+
+        return Handler
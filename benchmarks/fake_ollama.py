@@ -0,0 +1,191 @@
+"""Servidor HTTP que imita la API de chat de Ollama para medir latencias sin GPU.
+
+Emite la respuesta token a token a un ritmo configurable, con un retardo de
+prefill antes del primer token, igual que haría un modelo real. Con
+`load_delay` simula además la carga del modelo en GPU cuando no está
+residente, respetando `keep_alive` como el servidor real.
+"""
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "Claro, te lo explico en pocas palabras. "
+    "El sistema escucha tu voz, la convierte en texto y genera una respuesta. "
+    "Después sintetiza esa respuesta para que puedas oírla sin esperar demasiado."
+)
+
+
+class FakeOllama:
+    """Servidor local compatible con /api/chat y /api/generate de Ollama."""
+
+    def __init__(self, reply=DEFAULT_REPLY, tokens_per_sec=20.0, prefill_delay=0.15,
+                 load_delay=0.0, host="127.0.0.1", port=0):
+        self.reply = reply
+        self.tokens_per_sec = tokens_per_sec
+        self.prefill_delay = prefill_delay
+        self.load_delay = load_delay
+        self.loads = 0
+        self._resident_until = 0.0
+        self._load_lock = threading.Lock()
+        self.requests = []
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @staticmethod
+    def _keep_alive_seconds(value):
+        """Mismo formato que Ollama: segundos, '30s', '5m', '1h'; negativo = siempre."""
+        if value is None:
+            return 300.0
+        if isinstance(value, (int, float)):
+            seconds = float(value)
+        else:
+            units = {"s": 1, "m": 60, "h": 3600}
+            match = re.fullmatch(r"(-?\d+(?:\.\d+)?)([smh]?)", str(value).strip())
+            if not match:
+                return 300.0
+            seconds = float(match.group(1)) * units.get(match.group(2) or "s")
+        return float("inf") if seconds < 0 else seconds
+
+    def _ensure_loaded(self, body):
+        with self._load_lock:
+            now = time.monotonic()
+            if now >= self._resident_until:
+                time.sleep(self.load_delay)
+                self.loads += 1
+            self._resident_until = time.monotonic() + self._keep_alive_seconds(body.get("keep_alive"))
+
+    def tokens(self):
+        return re.findall(r"\S+\s*", self.reply)
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                fake.requests.append((self.path, body))
+                if self.path == "/api/chat":
+                    fake._handle_generation(self, body, chat=True)
+                elif self.path == "/api/generate":
+                    fake._handle_generation(self, body, chat=False)
+                else:
+                    self.send_error(404)
+
+        return Handler
+
+    def _chunk(self, model, content, chat, done=False, **extra):
+        chunk = {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": done,
+        }
+        if chat:
+            chunk["message"] = {"role": "assistant", "content": content}
+        else:
+            chunk["response"] = content
+        chunk.update(extra)
+        return chunk
+
+    def _handle_generation(self, handler, body, chat):
+        model = body.get("model", "fake")
+        stream = body.get("stream", True)
+        start = time.perf_counter()
+        self._ensure_loaded(body)
+        load = time.perf_counter() - start
+        time.sleep(self.prefill_delay)
+
+        # /api/generate sin prompt es la precarga del modelo: respuesta vacía
+        tokens = self.tokens() if chat or body.get("prompt") else []
+        num_predict = body.get("options", {}).get("num_predict")
+        if num_predict is not None and num_predict >= 0:
+            tokens = tokens[:num_predict]
+        prompt_eval = time.perf_counter() - start - load
+        stats = {
+            "load_duration": int(load * 1e9),
+            "done_reason": "stop",
+            "prompt_eval_count": sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", [])),
+            "prompt_eval_duration": int(prompt_eval * 1e9),
+            "eval_count": len(tokens),
+        }
+
+        if not stream:
+            time.sleep(len(tokens) / self.tokens_per_sec)
+            stats["eval_duration"] = int((time.perf_counter() - start - load - prompt_eval) * 1e9)
+            stats["total_duration"] = int((time.perf_counter() - start) * 1e9)
+            payload = json.dumps(self._chunk(model, "".join(tokens), chat, done=True, **stats)).encode()
+            handler.send_response(200)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(payload)))
+            handler.end_headers()
+            handler.wfile.write(payload)
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def send(obj):
+            data = (json.dumps(obj) + "\n").encode()
+            handler.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            handler.wfile.flush()
+
+        try:
+            for token in tokens:
+                send(self._chunk(model, token, chat))
+                time.sleep(1.0 / self.tokens_per_sec)
+            stats["eval_duration"] = int((time.perf_counter() - start - load - prompt_eval) * 1e9)
+            stats["total_duration"] = int((time.perf_counter() - start) * 1e9)
+            send(self._chunk(model, "", chat, done=True, **stats))
+            handler.wfile.write(b"0\r\n\r\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente canceló el stream (p. ej. barge-in)
+            pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor Ollama falso para benchmarks")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens-per-sec", type=float, default=20.0)
+    parser.add_argument("--prefill-delay", type=float, default=0.15)
+    parser.add_argument("--load-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeOllama(tokens_per_sec=args.tokens_per_sec, prefill_delay=args.prefill_delay,
+                        load_delay=args.load_delay, port=args.port)
+    print(f"Fake Ollama escuchando en {server.url}")
+    server._server.serve_forever()
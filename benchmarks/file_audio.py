@@ -0,0 +1,114 @@
+"""Streams de audio respaldados por ficheros con la interfaz de sounddevice.
+
+`FileInputStream` y `FileOutputStream` se construyen con los mismos
+argumentos que `sd.InputStream` / `sd.OutputStream` y llaman al callback
+desde su propio hilo, bloque a bloque y al ritmo del reloj (multiplicado
+por `speed`). Así Listener y Speaker funcionan sin micrófono ni altavoz.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class _PacedStream:
+    def __init__(self, samplerate, channels=1, dtype="float32", blocksize=512,
+                 callback=None, speed=1.0, **_):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.callback = callback
+        self.speed = speed
+        self.frames_processed = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+
+    def _run(self):
+        block = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        period = self.blocksize / self.samplerate / self.speed
+        deadline = time.perf_counter()
+        while self._running:
+            self._process(block)
+            self.frames_processed += self.blocksize
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _process(self, block):
+        raise NotImplementedError
+
+
+class FileInputStream(_PacedStream):
+    """Micrófono simulado: reproduce los clips encolados con `play` y, entre
+    clip y clip, silencio (o ruido de fondo con `noise_level`)."""
+
+    def __init__(self, *args, noise_level=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.noise_level = noise_level
+        self._clips = deque()
+        self._current = None
+        self._pos = 0
+        self._rng = np.random.default_rng(0)
+        self.clip_finished = threading.Event()
+
+    def play(self, audio):
+        self.clip_finished.clear()
+        self._clips.append(np.asarray(audio, dtype=np.float32))
+
+    def _process(self, block):
+        out = block[:, 0]
+        if self.noise_level:
+            out[:] = self._rng.standard_normal(len(out)) * self.noise_level
+        else:
+            out[:] = 0.0
+        filled = 0
+        while filled < len(out):
+            if self._current is None:
+                if not self._clips:
+                    break
+                self._current, self._pos = self._clips.popleft(), 0
+            n = min(len(out) - filled, len(self._current) - self._pos)
+            out[filled:filled + n] += self._current[self._pos:self._pos + n]
+            filled += n
+            self._pos += n
+            if self._pos >= len(self._current):
+                self._current = None
+                if not self._clips:
+                    self.clip_finished.set()
+        self.callback(block, self.blocksize, None, None)
+
+
+class FileOutputStream(_PacedStream):
+    """Altavoz simulado: consume el audio al ritmo del dispositivo y, si
+    `record`, lo guarda para escribirlo después a WAV."""
+
+    def __init__(self, *args, record=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.record = record
+        self._chunks = []
+
+    def _process(self, block):
+        self.callback(block, self.blocksize, None, None)
+        if self.record:
+            self._chunks.append(block[:, 0].copy())
+
+    def recording(self):
+        if not self._chunks:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(self._chunks)
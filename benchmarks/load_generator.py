@@ -0,0 +1,140 @@
+"""Generador de carga para el servidor de voz (stt-llm-tts/server.py).
+
+Lanza N clientes WebSocket simultáneos; cada uno envía WAVs en tiempo real
+(frames de 20 ms), sigue mandando silencio como haría un micrófono y mide,
+desde el último frame de voz enviado, cuánto tarda en llegar el primer
+audio de la respuesta. Repite con cada nivel de `--sessions` para ver cómo
+se degrada la latencia al añadir sesiones.
+
+    python benchmarks/fake_ollama.py --port 11435 &
+    python stt-llm-tts/server.py --device cpu --model tiny --ollama-host http://127.0.0.1:11435 &
+    python benchmarks/load_generator.py corpus/ --sessions 1 2 4 8 --turns 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import websockets
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from common.pcm import float_to_pcm16, frames
+from wav_io import corpus_files, load_wav
+
+SAMPLE_RATE = 16000
+FRAME = 320  # 20 ms
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+async def client(url, clips, turns, timeout, results):
+    """Una sesión simulada: `turns` frases, esperando la respuesta de cada una."""
+    try:
+        async with websockets.connect(url, max_size=2**22) as ws:
+            ready = json.loads(await ws.recv())
+            if ready.get("type") != "ready":
+                results["errors"] += 1
+                return
+            silence = np.zeros(FRAME, dtype=np.int16).tobytes()
+            for _ in range(turns):
+                pcm = float_to_pcm16(random.choice(clips))
+                start = time.perf_counter()
+                for i, frame in enumerate(frames(pcm, 2 * FRAME)):
+                    await ws.send(frame)
+                    # Ritmo de tiempo real respecto al inicio del clip
+                    delay = start + (i + 1) * FRAME / SAMPLE_RATE - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                speech_end = time.perf_counter()
+
+                first_audio = None
+                deadline = speech_end + timeout
+                # El "micrófono" sigue enviando silencio mientras llega la respuesta
+                sender = asyncio.create_task(_send_silence(ws, silence))
+                try:
+                    while time.perf_counter() < deadline:
+                        try:
+                            message = await asyncio.wait_for(ws.recv(), deadline - time.perf_counter())
+                        except asyncio.TimeoutError:
+                            break
+                        if isinstance(message, bytes):
+                            if first_audio is None:
+                                first_audio = time.perf_counter() - speech_end
+                        elif json.loads(message).get("type") == "response_end":
+                            results["turn"].append(time.perf_counter() - speech_end)
+                            break
+                finally:
+                    sender.cancel()
+                if first_audio is None:
+                    results["timeouts"] += 1
+                else:
+                    results["first_audio"].append(first_audio)
+            await ws.send(json.dumps({"type": "end"}))
+    except websockets.ConnectionClosed as e:
+        if e.rcvd is not None and e.rcvd.code == 1013:
+            results["rejected"] += 1
+        else:
+            results["errors"] += 1
+    except OSError:
+        results["errors"] += 1
+
+
+async def _send_silence(ws, silence):
+    while True:
+        await ws.send(silence)
+        await asyncio.sleep(FRAME / SAMPLE_RATE)
+
+
+async def run_level(url, clips, sessions, turns, timeout):
+    results = {"first_audio": [], "turn": [], "rejected": 0, "timeouts": 0, "errors": 0}
+    await asyncio.gather(*(client(url, clips, turns, timeout, results) for _ in range(sessions)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="+", help="Directorios o ficheros WAV")
+    parser.add_argument("--url", default="ws://127.0.0.1:8765")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    args = parser.parse_args()
+
+    clips = [load_wav(path, SAMPLE_RATE) for path in corpus_files(args.corpus)]
+    if not clips:
+        parser.error("No hay ficheros WAV en el corpus")
+
+    rows = []
+    for sessions in args.sessions:
+        r = asyncio.run(run_level(args.url, clips, sessions, args.turns, args.timeout))
+        rows.append({
+            "sessions": sessions,
+            "first_audio_p50": round(percentile(r["first_audio"], 50), 3),
+            "first_audio_p95": round(percentile(r["first_audio"], 95), 3),
+            "turn_p50": round(percentile(r["turn"], 50), 3),
+            "completed": len(r["first_audio"]),
+            "rejected": r["rejected"],
+            "timeouts": r["timeouts"],
+            "errors": r["errors"],
+        })
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'SESIONES':>8} {'1er AUDIO p50':>14} {'p95':>8} {'TURNO p50':>10} {'OK':>5} {'RECHAZ.':>8} {'TIMEOUT':>8}")
+    for row in rows:
+        print(f"{row['sessions']:>8} {row['first_audio_p50']:>14.3f} {row['first_audio_p95']:>8.3f} "
+              f"{row['turn_p50']:>10.3f} {row['completed']:>5} {row['rejected']:>8} {row['timeouts']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Transporte de pipecat respaldado por ficheros, para bench_e2e.py --pipeline pipecat.
+
+`FileTransport.input()` reproduce los clips con el mismo micrófono simulado
+que usa Listener (FileInputStream) y empuja InputAudioRawFrame en PCM16;
+`FileTransport.output()` consume el audio de salida al ritmo del reloj.
+`TurnProbe` va entre etapas del pipeline y anota los hitos del turno en un
+`PipecatTurns` con los mismos nombres que TurnTimer (common/turn_metrics.py).
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from pipecat.frames.frames import (
+    InputAudioRawFrame,
+    LLMFullResponseEndFrame,
+    TextFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameProcessor
+from pipecat.transports.base_input import BaseInputTransport
+from pipecat.transports.base_output import BaseOutputTransport
+from pipecat.transports.base_transport import BaseTransport, TransportParams
+
+from common.pcm import float_to_pcm16, pcm16_to_float
+from common.turn_metrics import TurnTimer
+from file_audio import FileInputStream
+
+
+class PipecatTurns:
+    """Hitos del turno en curso; el bench lo abre con `begin` y lo cierra con `finish`."""
+
+    def __init__(self):
+        self.turn = None
+        self.text = ""
+        self._done = asyncio.Event()
+        self._playing_until = 0.0
+
+    def begin(self):
+        self.turn = TurnTimer()
+        self.text = ""
+        self._done.clear()
+
+    def mark(self, name, at=None):
+        if self.turn is not None:
+            self.turn.mark(name, at)
+
+    def response_done(self):
+        self._done.set()
+
+    def audio_written(self, duration):
+        self.mark("first_audio")
+        self._playing_until = max(self._playing_until, time.perf_counter()) + duration
+
+    async def finish(self):
+        """Espera al final de la respuesta y a que termine de sonar; devuelve el TurnTimer."""
+        await self._done.wait()
+        while time.perf_counter() < self._playing_until:
+            await asyncio.sleep(self._playing_until - time.perf_counter())
+        turn, self.turn = self.turn, None
+        turn.mark("end")
+        return turn
+
+
+class TurnProbe(FrameProcessor):
+    """Deja pasar todos los frames y anota los hitos de `stage` ("stt" o "llm")."""
+
+    def __init__(self, turns, stage):
+        super().__init__()
+        self.turns = turns
+        self.stage = stage
+
+    async def process_frame(self, frame, direction):
+        await super().process_frame(frame, direction)
+        if self.stage == "stt":
+            if isinstance(frame, UserStartedSpeakingFrame):
+                self.turns.mark("speech_start")
+            elif isinstance(frame, UserStoppedSpeakingFrame):
+                self.turns.mark("speech_end")
+            elif isinstance(frame, TextFrame):
+                # LocalWhisperService entrega la transcripción como TextFrame
+                self.turns.mark("transcript")
+                self.turns.text = frame.text
+        elif isinstance(frame, TextFrame):
+            self.turns.mark("first_token")
+        elif isinstance(frame, LLMFullResponseEndFrame):
+            self.turns.response_done()
+        await self.push_frame(frame, direction)
+
+
+class FileInputTransport(BaseInputTransport):
+    def __init__(self, params, speed=1.0, noise_level=0.0, blocksize=512):
+        super().__init__(params)
+        self._sample_rate_in = params.audio_in_sample_rate
+        self.stream = FileInputStream(samplerate=self._sample_rate_in, blocksize=blocksize,
+                                      callback=self._callback, speed=speed, noise_level=noise_level)
+        self._loop = None
+
+    async def start(self, frame):
+        await super().start(frame)
+        self._loop = asyncio.get_running_loop()
+        self.stream.start()
+        if hasattr(self, "set_transport_ready"):
+            await self.set_transport_ready(frame)
+
+    async def stop(self, frame):
+        self.stream.stop()
+        await super().stop(frame)
+
+    async def cancel(self, frame):
+        self.stream.stop()
+        await super().cancel(frame)
+
+    def _callback(self, indata, frames, time_info, status):
+        # Como el transporte local: el hilo del stream entrega el bloque al loop
+        frame = InputAudioRawFrame(audio=bytes(float_to_pcm16(indata[:, 0])),
+                                   sample_rate=self._sample_rate_in, num_channels=1)
+        asyncio.run_coroutine_threadsafe(self.push_audio_frame(frame), self._loop)
+
+
+class FileOutputTransport(BaseOutputTransport):
+    def __init__(self, params, turns, speed=1.0, record=False):
+        super().__init__(params)
+        self.turns = turns
+        self.speed = speed
+        self.record = record
+        self._sample_rate_out = params.audio_out_sample_rate
+        self._chunks = []
+
+    async def start(self, frame):
+        await super().start(frame)
+        if hasattr(self, "set_transport_ready"):
+            await self.set_transport_ready(frame)
+
+    async def write_audio_frame(self, frame):
+        await self._write(frame.audio)
+        return True
+
+    async def write_raw_audio_frames(self, frames):
+        # Nombre del método en versiones de pipecat anteriores a write_audio_frame
+        await self._write(frames)
+
+    async def _write(self, audio):
+        samples = pcm16_to_float(audio)
+        duration = len(samples) / self._sample_rate_out
+        # El relleno de silencio del transporte no cuenta como primer audio
+        if samples.any():
+            self.turns.audio_written(duration / self.speed)
+            if self.record:
+                self._chunks.append(samples)
+        await asyncio.sleep(duration / self.speed)
+
+    def recording(self):
+        if not self._chunks:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(self._chunks)
+
+
+class FileTransport(BaseTransport):
+    def __init__(self, turns, sample_rate=16000, output_sr=44100, speed=1.0, noise_level=0.0,
+                 record=False):
+        super().__init__()
+        self._params = TransportParams(audio_in_enabled=True, audio_in_sample_rate=sample_rate,
+                                       audio_out_enabled=True, audio_out_sample_rate=output_sr)
+        self._input = FileInputTransport(self._params, speed=speed, noise_level=noise_level)
+        self._output = FileOutputTransport(self._params, turns, speed=speed, record=record)
+
+    def input(self):
+        return self._input
+
+    def output(self):
+        return self._output
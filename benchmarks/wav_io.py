@@ -0,0 +1,42 @@
+"""Lectura y escritura de WAV PCM16 con la librería estándar y numpy."""
+import glob
+import os
+import wave
+
+import numpy as np
+
+from common.resampler import resample
+
+
+def load_wav(path, target_sr=16000):
+    """Devuelve el audio mono float32 en [-1, 1] al sample rate pedido."""
+    with wave.open(str(path), "rb") as wf:
+        sr = wf.getframerate()
+        channels = wf.getnchannels()
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: solo se admite PCM de 16 bits")
+        pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    audio = pcm.reshape(-1, channels).mean(axis=1).astype(np.float32) / 32768.0
+    if sr != target_sr:
+        audio = resample(audio, sr, target_sr)
+    return audio
+
+
+def save_wav(path, audio, sample_rate):
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm.tobytes())
+
+
+def corpus_files(paths):
+    """Expande directorios a sus *.wav (ordenados); los ficheros pasan tal cual."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.wav"))))
+        else:
+            files.append(path)
+    return files
@@ -0,0 +1,309 @@
+"""Dispositivos de audio: enumeración en caché, selección por nombre y calibración.
+
+Los índices de PortAudio cambian al enchufar un USB o reiniciar PipeWire,
+así que la configuración guarda nombre y host API y los resuelve al
+arrancar. La primera vez se eligen los dispositivos por terminal, se mide
+cada tamaño de bloque candidato con un stream dúplex (`latency='low'`) y se
+guarda el más pequeño sin xruns; las siguientes ejecuciones no preguntan.
+
+La medida de ida y vuelta emite clics por el altavoz y los busca en el
+micrófono: solo sale si el micrófono oye el altavoz (o hay un loopback).
+
+    python -m common.audio_devices --list
+    python -m common.audio_devices --calibrate      # vuelve a elegir y medir
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.path.expanduser("~/.cache/stt-ollama-tts/audio.json")
+# Bloques candidatos a 16 kHz (8, 16, 32, 64, 128 ms); otras frecuencias escalan
+BLOCK_SIZES = (128, 256, 512, 1024, 2048)
+CALIBRATION_SR = 16000
+DEFAULT_BLOCK_MS = 32.0
+
+_devices = {}
+
+
+class AudioDevice:
+    def __init__(self, index, name, hostapi, max_input_channels, max_output_channels,
+                 default_samplerate, low_input_latency=None, low_output_latency=None):
+        self.index = index
+        self.name = name
+        self.hostapi = hostapi
+        self.max_input_channels = max_input_channels
+        self.max_output_channels = max_output_channels
+        self.default_samplerate = default_samplerate
+        self.low_input_latency = low_input_latency
+        self.low_output_latency = low_output_latency
+
+    def supports(self, is_input):
+        return (self.max_input_channels if is_input else self.max_output_channels) > 0
+
+    def key(self):
+        """Lo que se guarda en la configuración (estable entre arranques)."""
+        return {"name": self.name, "hostapi": self.hostapi}
+
+    def __repr__(self):
+        return f"AudioDevice({self.index}, {self.name!r}, {self.hostapi!r})"
+
+
+def _sounddevice_devices():
+    import sounddevice as sd
+
+    hostapis = [api["name"] for api in sd.query_hostapis()]
+    return [AudioDevice(i, d["name"], hostapis[d["hostapi"]], d["max_input_channels"],
+                        d["max_output_channels"], d["default_samplerate"],
+                        d["default_low_input_latency"], d["default_low_output_latency"])
+            for i, d in enumerate(sd.query_devices())]
+
+
+def _pyaudio_devices(p):
+    devices = []
+    for i in range(p.get_device_count()):
+        d = p.get_device_info_by_index(i)
+        devices.append(AudioDevice(i, d["name"], p.get_host_api_info_by_index(d["hostApi"])["name"],
+                                   d["maxInputChannels"], d["maxOutputChannels"], d["defaultSampleRate"],
+                                   d["defaultLowInputLatency"], d["defaultLowOutputLatency"]))
+    return devices
+
+
+def list_devices(p=None, refresh=False):
+    """Dispositivos de PortAudio (sounddevice, o PyAudio si se pasa `p`).
+
+    Enumerar abre cada tarjeta (cientos de ms con ALSA): se hace una vez por
+    proceso salvo `refresh=True`.
+    """
+    backend = "pyaudio" if p is not None else "sounddevice"
+    if refresh or backend not in _devices:
+        _devices[backend] = _pyaudio_devices(p) if p is not None else _sounddevice_devices()
+    return _devices[backend]
+
+
+def find_device(name, hostapi=None, is_input=True, devices=None):
+    """Dispositivo por nombre (exacto o contenido, sin mayúsculas), del host API
+    pedido si lo hay. LookupError si no aparece."""
+    devices = [d for d in (devices if devices is not None else list_devices()) if d.supports(is_input)]
+    wanted = name.lower()
+    for match in (lambda d: d.name.lower() == wanted, lambda d: wanted in d.name.lower()):
+        found = [d for d in devices if match(d)]
+        if hostapi is not None:
+            found = [d for d in found if d.hostapi == hostapi] or found
+        if found:
+            return found[0]
+    kind = "entrada" if is_input else "salida"
+    raise LookupError(f"No hay dispositivo de {kind} {name!r} ({hostapi})")
+
+
+def choose_device(devices, is_input):
+    """Permite al usuario seleccionar un dispositivo de audio desde la terminal."""
+    type_str = "entrada (Micrófono)" if is_input else "salida (Altavoces)"
+    options = [d for d in devices if d.supports(is_input)]
+    if not options:
+        print(f"Error: No se encontraron dispositivos de {type_str}.")
+        sys.exit(1)
+
+    print(f"\n--- DISPOSITIVOS DE {type_str.upper()} DISPONIBLES ---")
+    for n, device in enumerate(options, 1):
+        print(f"{n}. {device.name} [{device.hostapi}]")
+    while True:
+        try:
+            idx = int(input(f"\nSelecciona el número del dispositivo de {type_str}: ")) - 1
+            if 0 <= idx < len(options):
+                print(f"-> Seleccionado: {options[idx].name} (ID: {options[idx].index})")
+                return options[idx]
+            print("Número inválido, intenta nuevamente.")
+        except ValueError:
+            print("Por favor ingresa un número válido.")
+
+
+class AudioConfig:
+    """Dispositivos por nombre, bloque calibrado y latencia de los streams."""
+
+    def __init__(self, input=None, output=None, block_ms=DEFAULT_BLOCK_MS, latency="low",
+                 measurements=None):
+        self.input = input    # {"name", "hostapi"}; None: el dispositivo por defecto
+        self.output = output
+        self.block_ms = block_ms
+        self.latency = latency
+        self.measurements = measurements or []
+        self.input_index = None
+        self.output_index = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("input"), data.get("output"), data.get("block_ms", DEFAULT_BLOCK_MS),
+                   data.get("latency", "low"), data.get("measurements"))
+
+    def to_dict(self):
+        return {"input": self.input, "output": self.output, "block_ms": self.block_ms,
+                "latency": self.latency, "measurements": self.measurements}
+
+    def resolve(self, devices=None):
+        """Índices actuales de los dispositivos guardados (LookupError si falta alguno)."""
+        if self.input is not None:
+            self.input_index = find_device(self.input["name"], self.input.get("hostapi"),
+                                           is_input=True, devices=devices).index
+        if self.output is not None:
+            self.output_index = find_device(self.output["name"], self.output.get("hostapi"),
+                                            is_input=False, devices=devices).index
+        return self
+
+    def blocksize(self, samplerate):
+        """Bloque de al menos `block_ms` a `samplerate`, en potencia de dos."""
+        return 1 << max(6, int(np.ceil(np.log2(self.block_ms / 1000 * samplerate) - 1e-9)))
+
+
+def load_config(path=CONFIG_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return AudioConfig.from_dict(json.load(f))
+    except FileNotFoundError:
+        return None
+    except (ValueError, AttributeError) as e:
+        logger.warning(f"Configuración de audio ilegible ({path}): {e}")
+        return None
+
+
+def save_config(config, path=CONFIG_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(config.to_dict(), f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def measure_block(blocksize, input_device=None, output_device=None, samplerate=CALIBRATION_SR,
+                  seconds=2.0, loopback=True):
+    """Abre un stream dúplex con `latency='low'` y cuenta xruns durante `seconds`.
+
+    Con `loopback`, emite un clic cada medio segundo y mide cuándo vuelve por
+    el micrófono (ida y vuelta real, no la que declara el driver).
+    """
+    import sounddevice as sd
+
+    total = int(seconds * samplerate)
+    period = samplerate // 2
+    recorded = np.zeros(total, dtype=np.float32)
+    click = np.hanning(32).astype(np.float32) * 0.5
+    state = {"pos": 0, "xruns": 0}
+
+    def callback(indata, outdata, frames, time_info, status):
+        if status.input_overflow or status.output_underflow:
+            state["xruns"] += 1
+        pos = state["pos"]
+        n = min(frames, total - pos)
+        if n > 0:
+            recorded[pos:pos + n] = indata[:n, 0]
+        outdata.fill(0)
+        if loopback:
+            # Clics que caen en este bloque
+            for start in range(((pos + period - 1) // period) * period, pos + frames, period):
+                k = min(len(click), pos + frames - start)
+                outdata[start - pos:start - pos + k, 0] = click[:k]
+        state["pos"] = pos + frames
+
+    with sd.Stream(device=(input_device, output_device), samplerate=samplerate, blocksize=blocksize,
+                   channels=1, dtype="float32", latency="low", callback=callback) as stream:
+        reported = stream.latency
+        time.sleep(seconds)
+
+    roundtrip = None
+    if loopback:
+        noise = float(np.median(np.abs(recorded))) + 1e-6
+        delays = []
+        for start in range(period, total - period, period):
+            window = np.abs(recorded[start:start + period])
+            if window.max() > 10 * noise:
+                delays.append(int(np.argmax(window)))
+        if delays:
+            roundtrip = round(float(np.median(delays)) / samplerate * 1000, 1)
+    return {
+        "blocksize": blocksize,
+        "block_ms": round(blocksize / samplerate * 1000, 1),
+        "xruns": state["xruns"],
+        "input_latency_ms": round(reported[0] * 1000, 1),
+        "output_latency_ms": round(reported[1] * 1000, 1),
+        "roundtrip_ms": roundtrip,
+    }
+
+
+def calibrate(config, block_sizes=BLOCK_SIZES, seconds=2.0, loopback=True):
+    """Mide cada bloque y deja en `config` el más pequeño sin xruns."""
+    config.measurements = []
+    for blocksize in block_sizes:
+        try:
+            result = measure_block(blocksize, config.input_index, config.output_index,
+                                   seconds=seconds, loopback=loopback)
+        except ImportError:
+            raise
+        except Exception as e:
+            logger.warning(f"Bloque de {blocksize} muestras no disponible: {e}")
+            continue
+        logger.info(f"Calibración: {result}")
+        config.measurements.append(result)
+    stable = [m for m in config.measurements if m["xruns"] == 0]
+    if stable:
+        config.block_ms = min(stable, key=lambda m: m["blocksize"])["block_ms"]
+    else:
+        logger.warning(f"Ningún bloque sin xruns: se mantiene {config.block_ms} ms")
+    return config
+
+
+def configure(path=CONFIG_PATH, p=None, select=choose_device, calibrate_blocks=True, force=False,
+              seconds=2.0):
+    """Configuración guardada y resuelta; si no la hay o falta un dispositivo,
+    se eligen por terminal (una vez), se calibra y se guarda."""
+    devices = list_devices(p)
+    config = None if force else load_config(path)
+    if config is not None:
+        try:
+            return config.resolve(devices)
+        except LookupError as e:
+            logger.warning(f"{e}: hay que elegir de nuevo")
+
+    mic = select(devices, is_input=True)
+    spk = select(devices, is_input=False)
+    config = AudioConfig(mic.key(), spk.key())
+    config.input_index, config.output_index = mic.index, spk.index
+    if calibrate_blocks:
+        try:
+            # Los índices de PyAudio y sounddevice pueden no coincidir: se
+            # calibra con los de sounddevice resueltos por nombre
+            measured = calibrate(AudioConfig(mic.key(), spk.key()).resolve(), seconds=seconds)
+            config.block_ms, config.measurements = measured.block_ms, measured.measurements
+        except (ImportError, LookupError) as e:
+            logger.info(f"No se calibra el tamaño de bloque: {e}")
+    save_config(config, path)
+    logger.info(f"Configuración de audio guardada en {path}")
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--list", action="store_true", help="Lista los dispositivos y sale")
+    parser.add_argument("--calibrate", action="store_true", help="Vuelve a elegir y calibrar")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Duración de cada medida")
+    parser.add_argument("--config", default=CONFIG_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.list:
+        for d in list_devices():
+            print(f"{d.index:>3} {d.name} [{d.hostapi}] in={d.max_input_channels} "
+                  f"out={d.max_output_channels} {d.default_samplerate:.0f} Hz")
+        return
+    config = configure(args.config, force=args.calibrate, seconds=args.seconds)
+    print(json.dumps(config.to_dict(), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Negociación de frecuencias de muestreo de punta a punta.
+
+Cada etapa de una dirección (entrada o salida) declara a qué frecuencias
+trabaja sin convertir y si sabe re-muestrear lo que entrega. `negotiate`
+elige la frecuencia de cada enlace con el menor número de conversiones:
+si el altavoz abre a 24 kHz, el audio de Kokoro llega tal cual; si no, se
+re-muestrea una sola vez en la primera etapa que sepa hacerlo.
+
+    plan = negotiate("salida", [
+        Stage("kokoro", [24000]),
+        Stage("tts", [24000], resamples=True),
+        Stage("altavoz", sounddevice_rates(), native=44100),
+    ])
+    plan.rate("altavoz")  # 24000 si el dispositivo lo admite
+"""
+import itertools
+
+# Frecuencias que se prueban en el dispositivo (y candidatas para etapas sin restricción)
+CANDIDATE_RATES = (16000, 22050, 24000, 32000, 44100, 48000)
+
+
+class Stage:
+    def __init__(self, name, rates=None, resamples=False, native=None):
+        self.name = name
+        # Frecuencias de entrada admitidas sin convertir (None: cualquiera)
+        self.rates = None if rates is None else tuple(int(r) for r in rates)
+        # True: puede entregar a otra frecuencia (re-muestrea a su salida)
+        self.resamples = resamples
+        # Frecuencia preferida a igualdad de conversiones (p. ej. la por defecto del dispositivo)
+        self.native = native
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, rates={self.rates}, resamples={self.resamples})"
+
+
+class RatePlan:
+    """Frecuencia de entrada de cada etapa y las conversiones que quedan."""
+
+    def __init__(self, direction, stages, rates):
+        self.direction = direction
+        self.stages = stages
+        self.rates = rates
+        # (etapa, origen, destino) de cada re-muestreo
+        self.hops = [(stage.name, src, dst)
+                     for stage, src, dst in zip(stages, rates, rates[1:]) if src != dst]
+
+    @property
+    def conversions(self):
+        return len(self.hops)
+
+    def rate(self, name):
+        """Frecuencia a la que recibe la etapa `name`."""
+        for stage, rate in zip(self.stages, self.rates):
+            if stage.name == name:
+                return rate
+        raise KeyError(name)
+
+    def output_rate(self, name):
+        """Frecuencia a la que entrega la etapa `name` (la de entrada de la siguiente)."""
+        for i, stage in enumerate(self.stages):
+            if stage.name == name:
+                return self.rates[i + 1] if i + 1 < len(self.rates) else self.rates[i]
+        raise KeyError(name)
+
+    def describe(self):
+        chain = " -> ".join(f"{s.name} {r} Hz" for s, r in zip(self.stages, self.rates))
+        lines = [f"{self.direction}: {chain} ({self.conversions} re-muestreo(s))"]
+        lines += [f"  re-muestreo en {name}: {src} -> {dst} Hz" for name, src, dst in self.hops]
+        return "\n".join(lines)
+
+
+def negotiate(direction, stages):
+    """Plan con menos conversiones para la cadena `stages` (de origen a destino).
+
+    A igualdad, gana el que respeta más frecuencias nativas y el que convierte
+    antes (en código propio, no en el transporte). ValueError si no hay plan.
+    """
+    candidates = sorted(set(CANDIDATE_RATES).union(
+        *(s.rates for s in stages if s.rates is not None)))
+    options = [s.rates if s.rates is not None else candidates for s in stages]
+
+    best, best_score = None, None
+    for rates in itertools.product(*options):
+        hops = []
+        for i, (stage, src, dst) in enumerate(zip(stages, rates, rates[1:])):
+            if src != dst:
+                if not stage.resamples:
+                    break
+                hops.append(i)
+        else:
+            score = (len(hops),
+                     sum(s.native is not None and r != s.native for s, r in zip(stages, rates)),
+                     sum(hops))
+            if best_score is None or score < best_score:
+                best, best_score = rates, score
+    if best is None:
+        raise ValueError(f"Sin frecuencia común para {direction}: {stages}")
+    return RatePlan(direction, stages, list(best))
+
+
+def supported_rates(check, candidates=CANDIDATE_RATES):
+    """Frecuencias de `candidates` que el dispositivo abre sin error.
+
+    `check(rate)` devuelve False o lanza una excepción si no la admite.
+    """
+    rates = []
+    for rate in candidates:
+        try:
+            if check(rate) is not False:
+                rates.append(rate)
+        except Exception:
+            pass
+    return rates
+
+
+def pyaudio_rates(p, index, is_input):
+    """Frecuencias que admite el dispositivo `index` de PyAudio (mono, PCM16)."""
+    fmt = p.get_format_from_width(2)
+    if is_input:
+        kwargs = {"input_device": index, "input_channels": 1, "input_format": fmt}
+    else:
+        kwargs = {"output_device": index, "output_channels": 1, "output_format": fmt}
+    return supported_rates(lambda rate: p.is_format_supported(rate, **kwargs))
+
+
+def sounddevice_rates(device=None, is_input=False):
+    """Frecuencias que admite un dispositivo de sounddevice (mono, float32)."""
+    import sounddevice as sd
+
+    check = sd.check_input_settings if is_input else sd.check_output_settings
+    return supported_rates(lambda rate: check(device=device, channels=1, dtype="float32", samplerate=rate))
@@ -0,0 +1,168 @@
+"""Micro-batching de Whisper entre peticiones concurrentes.
+
+Con varias sesiones (servidor, varias pipelines de pipecat) las frases que
+terminan casi a la vez se agrupan en un lote: se espera como mucho
+`max_wait` segundos a que lleguen más, hasta `max_batch_size`, y el lote
+completo pasa por el encoder y el decoder de CTranslate2 en una sola
+llamada. Cada llamante recibe su resultado en su propio future.
+
+Solo se agrupan frases de hasta 30 s (la ventana de Whisper); las más
+largas van por `WhisperModel.transcribe` como antes. Las dos rutas
+devuelven (segmentos, info) para que el llamante los pase por el mismo
+`SpeechGate.text` (common/stt_gate.py).
+"""
+import asyncio
+import queue
+import threading
+import time
+from collections import Counter, deque, namedtuple
+
+import ctranslate2
+import numpy as np
+from faster_whisper.tokenizer import Tokenizer
+
+from common.startup import set_future_exception, set_future_result
+from common.stt_gate import compression_ratio
+
+SAMPLE_RATE = 16000
+WINDOW_SAMPLES = 30 * SAMPLE_RATE
+
+# Lo que SpeechGate.keep_segment lee de un segmento de faster-whisper
+BatchSegment = namedtuple("BatchSegment", "text no_speech_prob avg_logprob compression_ratio")
+
+
+class BatchedWhisper:
+    def __init__(self, model, max_batch_size=8, max_wait=0.03, language="es", beam_size=5):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.language = language
+        self.beam_size = beam_size
+        self._tokenizer = Tokenizer(model.hf_tokenizer, model.model.is_multilingual,
+                                    task="transcribe", language=language)
+        self._prompt = list(self._tokenizer.sot_sequence) + [self._tokenizer.no_timestamps]
+        self._frames = model.feature_extractor.nb_max_frames
+
+        self._requests = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.queue_waits = deque(maxlen=1000)
+        self.batch_sizes = Counter()
+        self.utterances = 0
+        self.audio_seconds = 0.0
+        self.busy_seconds = 0.0
+        self._worker = threading.Thread(target=self._loop, name="whisper-batch", daemon=True)
+        self._worker.start()
+
+    @property
+    def backlog(self):
+        return self._requests.qsize()
+
+    async def transcribe(self, audio):
+        """Devuelve (segmentos, info); info es None en la ruta por lotes."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._requests.put((np.asarray(audio, dtype=np.float32), loop, future, time.perf_counter()))
+        return await future
+
+    def close(self):
+        self._requests.put(None)
+
+    # --- Worker ---
+
+    def _collect(self):
+        first = self._requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self._requests.put(None)  # Se atiende el lote y luego se cierra
+                break
+            batch.append(request)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            start = time.perf_counter()
+            short = [r for r in batch if len(r[0]) <= WINDOW_SAMPLES]
+            long = [r for r in batch if len(r[0]) > WINDOW_SAMPLES]
+            results = {}
+            try:
+                if short:
+                    for request, segment in zip(short, self._transcribe_batch([r[0] for r in short])):
+                        results[id(request)] = ([segment], None)
+                for request in long:
+                    results[id(request)] = self._transcribe_single(request[0])
+            except Exception as e:
+                for _, loop, future, _ in batch:
+                    loop.call_soon_threadsafe(set_future_exception, future, e)
+                continue
+            elapsed = time.perf_counter() - start
+
+            with self._stats_lock:
+                self.batch_sizes[len(batch)] += 1
+                self.utterances += len(batch)
+                self.busy_seconds += elapsed
+                for audio, _, _, queued_at in batch:
+                    self.queue_waits.append(start - queued_at)
+                    self.audio_seconds += len(audio) / SAMPLE_RATE
+            for request in batch:
+                _, loop, future, _ = request
+                loop.call_soon_threadsafe(set_future_result, future, results[id(request)])
+
+    def _features(self, audio):
+        features = self.model.feature_extractor(audio)
+        # Relleno hasta la ventana fija de 30 s que espera el encoder
+        if features.shape[-1] < self._frames:
+            features = np.pad(features, ((0, 0), (0, self._frames - features.shape[-1])))
+        return features[:, :self._frames]
+
+    def _transcribe_batch(self, audios):
+        features = np.stack([self._features(a) for a in audios]).astype(np.float32)
+        encoded = self.model.model.encode(ctranslate2.StorageView.from_array(features),
+                                          to_cpu=False)
+        results = self.model.model.generate(
+            encoded, [self._prompt] * len(audios), beam_size=self.beam_size,
+            return_scores=True, return_no_speech_prob=True,
+        )
+        segments = []
+        for result in results:
+            tokens = [t for t in result.sequences_ids[0] if t < self._tokenizer.eot]
+            # CTranslate2 devuelve la log-prob normalizada por longitud;
+            # avg_logprob se calcula igual que en faster-whisper
+            avg_logprob = result.scores[0] * len(tokens) / (len(tokens) + 1)
+            text = self._tokenizer.decode(tokens).strip()
+            segments.append(BatchSegment(text, result.no_speech_prob, avg_logprob, compression_ratio(text)))
+        return segments
+
+    def _transcribe_single(self, audio):
+        segments, info = self.model.transcribe(audio, language=self.language,
+                                               beam_size=self.beam_size, vad_filter=True)
+        # Los segmentos se decodifican al iterar: aquí, en el hilo del worker
+        return list(segments), info
+
+    def stats(self):
+        with self._stats_lock:
+            waits = list(self.queue_waits)
+            batches = sum(self.batch_sizes.values())
+            return {
+                "utterances": self.utterances,
+                "batches": batches,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "mean_batch_size": round(self.utterances / batches, 2) if batches else 0.0,
+                "queue_wait_p50_ms": round(float(np.percentile(waits, 50)) * 1000, 1) if waits else None,
+                "queue_wait_p95_ms": round(float(np.percentile(waits, 95)) * 1000, 1) if waits else None,
+                "utterances_per_s": round(self.utterances / self.busy_seconds, 2) if self.busy_seconds else None,
+                "audio_s_per_s": round(self.audio_seconds / self.busy_seconds, 2) if self.busy_seconds else None,
+            }
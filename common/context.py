@@ -0,0 +1,165 @@
+"""Contexto de conversación con presupuesto de tokens y prefijo estable.
+
+El prompt es siempre [system] + [resumen] + turnos recientes. Entre
+plegados solo se añaden mensajes al final, así el prefijo es idéntico byte
+a byte de un turno al siguiente y Ollama reutiliza su caché KV en lugar de
+volver a procesar todo el historial. Cuando se supera el presupuesto, los
+turnos más antiguos se pliegan en un resumen que se genera en segundo plano
+(fuera del camino crítico) y se aplica de golpe, bajando hasta una marca
+inferior para que los plegados, y por tanto las invalidaciones de caché,
+sean poco frecuentes.
+"""
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Resumen de la conversación anterior: "
+
+SUMMARY_PROMPT = (
+    "Resume en español, en pocas frases y en tercera persona, los datos "
+    "importantes de esta conversación entre un usuario y un asistente. "
+    "Conserva nombres, cifras y decisiones."
+)
+
+
+def estimate_tokens(messages, chars_per_token=4.0):
+    """Estimación barata: ~4 caracteres por token más la plantilla de cada mensaje."""
+    return sum(int(len(m.get("content", "")) / chars_per_token) + 4 for m in messages)
+
+
+def make_ollama_summarizer(llm):
+    """Devuelve un resumidor async que usa el mismo OllamaLLM (common/llm_client.py)."""
+
+    async def summarize(previous, messages):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        if previous:
+            transcript = f"{SUMMARY_PREFIX}{previous}\n{transcript}"
+        response = await llm.chat([
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ], profile="summary")
+        return response["message"]["content"].strip()
+
+    return summarize
+
+
+class ConversationContext:
+    def __init__(self, messages=None, max_tokens=2048, low_watermark=0.6,
+                 keep_recent=4, summarizer=None, stats_history=500):
+        messages = list(messages or [])
+        # Los mensajes system iniciales forman el prefijo fijo
+        split = 0
+        while split < len(messages) and messages[split]["role"] == "system":
+            split += 1
+        self._system = messages[:split]
+        self.summary = ""
+        self.messages = self._system + messages[split:]
+
+        self.max_tokens = max_tokens
+        self.low_watermark = low_watermark
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer
+
+        self._folding = None      # Tarea de resumen en curso
+        self.folds = 0
+        self.fold_errors = 0
+        self.turns = 0
+        # Solo los últimos turnos: la sesión puede durar horas
+        self.turn_stats = deque(maxlen=stats_history)
+
+    # --- Interfaz que usan los agregadores y los servicios ---
+
+    def add_message(self, message):
+        self.messages.append(message)
+        self._maybe_fold()
+
+    def get_messages(self):
+        return self.messages
+
+    def clear(self):
+        self.summary = ""
+        self.messages[:] = self._system
+
+    # --- Presupuesto ---
+
+    @property
+    def _prefix_len(self):
+        return len(self._system) + (1 if self.summary else 0)
+
+    def estimated_tokens(self):
+        return estimate_tokens(self.messages)
+
+    def _maybe_fold(self):
+        if self._folding is not None or self.estimated_tokens() <= self.max_tokens:
+            return
+
+        turns = self.messages[self._prefix_len:]
+        target = self.max_tokens * self.low_watermark
+        count = 0
+        while (len(turns) - count > self.keep_recent
+               and estimate_tokens(self.messages[:self._prefix_len] + turns[count:]) > target):
+            count += 1
+        if count == 0:
+            return
+        old = turns[:count]
+
+        if self.summarizer is None:
+            self._apply_fold(old, self.summary)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._apply_fold(old, self.summary)
+            return
+        # Los turnos viejos siguen en el prompt hasta que el resumen esté listo
+        self._folding = loop.create_task(self._summarize(old))
+
+    async def _summarize(self, old):
+        try:
+            summary = await self.summarizer(self.summary, old)
+        except Exception as e:
+            # Sin resumen no se pliega: los turnos se quedan en el prompt y se
+            # reintenta con el siguiente mensaje
+            self.fold_errors += 1
+            logger.error(f"Error resumiendo el contexto: {e}")
+            return
+        finally:
+            self._folding = None
+        self._apply_fold(old, summary)
+
+    def _apply_fold(self, old, summary):
+        start = self._prefix_len
+        # Solo se han añadido mensajes al final: los viejos siguen en su sitio
+        turns = self.messages[start:]
+        if turns[:len(old)] != old:
+            return
+        self.summary = summary
+        prefix = list(self._system)
+        if summary:
+            prefix.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+        self.messages[:] = prefix + turns[len(old):]
+        self.folds += 1
+        logger.info(f"Contexto plegado: {len(old)} mensajes -> resumen "
+                    f"(~{self.estimated_tokens()} tokens)")
+
+    # --- Métricas ---
+
+    def record_usage(self, response):
+        """Registra tokens de prompt y tiempo de prefill que devuelve Ollama
+        en el último chunk (done=True) de cada respuesta."""
+        prompt_tokens = response.get("prompt_eval_count") or 0
+        prefill_s = (response.get("prompt_eval_duration") or 0) / 1e9
+        self.turns += 1
+        stats = {
+            "turn": self.turns,
+            "estimated_prompt_tokens": self.estimated_tokens(),
+            "prompt_eval_count": prompt_tokens,
+            "prefill_s": round(prefill_s, 3),
+            "folds": self.folds,
+        }
+        self.turn_stats.append(stats)
+        logger.info(f"Turno {stats['turn']}: prompt ~{stats['estimated_prompt_tokens']} tokens, "
+                    f"evaluados {prompt_tokens}, prefill {prefill_s * 1000:.0f} ms")
+        return stats
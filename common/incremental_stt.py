@@ -0,0 +1,103 @@
+import re
+import threading
+
+_NORMALIZE = re.compile(r"[^\w]+")
+
+
+def _norm(text):
+    return _NORMALIZE.sub(" ", text.lower()).strip()
+
+
+class IncrementalTranscriber:
+    """Transcripción incremental de una frase mientras el usuario sigue hablando.
+
+    Cada `update` decodifica solo la parte aún no confirmada del audio. Los
+    segmentos iniciales que coinciden en dos decodificaciones seguidas y
+    quedan lejos del borde vivo se confirman y ya no se vuelven a procesar,
+    así que `finalize` solo re-decodifica la cola inestable.
+    """
+
+    def __init__(self, model, sample_rate=16000, language="es", step=1.0,
+                 edge_guard=0.5, max_window=15.0, gate=None, **transcribe_kwargs):
+        self.model = model
+        self.gate = gate  # SpeechGate opcional: descarta segmentos sin voz o repetidos
+        self.sample_rate = sample_rate
+        self.language = language
+        self.step = step                # Segundos de audio nuevo entre decodificaciones
+        self.edge_guard = edge_guard    # No se confirma nada tan cerca del final
+        self.max_window = max_window    # Ventana máxima sin confirmar antes de forzar
+        self.transcribe_kwargs = transcribe_kwargs
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Empieza una frase nueva; espera a la decodificación que esté en curso."""
+        with self._lock:
+            self.committed = []
+            self.committed_samples = 0
+            self.decodes = 0
+            self._hypothesis = []
+            self._last_decoded = 0
+
+    @property
+    def committed_text(self):
+        return " ".join(self.committed).strip()
+
+    @property
+    def interim_text(self):
+        return " ".join(self.committed + [text for _, text in self._hypothesis]).strip()
+
+    def _decode(self, window):
+        prompt = self.committed_text[-200:] or None
+        segments, info = self.model.transcribe(
+            window, language=self.language, initial_prompt=prompt,
+            condition_on_previous_text=False, **self.transcribe_kwargs
+        )
+        self.decodes += 1
+        return [(s.end, s.text.strip()) for s in segments
+                if s.text.strip() and (self.gate is None or self.gate.keep_segment(s))], info
+
+    def due(self, n_samples):
+        """True si desde la última decodificación han llegado `step` segundos."""
+        return n_samples - self._last_decoded >= self.step * self.sample_rate
+
+    def update(self, audio):
+        """Procesa el audio acumulado de la frase; devuelve el texto provisional
+        si hubo decodificación o None si aún no hay `step` segundos nuevos."""
+        if not self.due(len(audio)):
+            return None
+        with self._lock:
+            self._last_decoded = len(audio)
+            window = audio[self.committed_samples:]
+            segments, _ = self._decode(window)
+            live_edge = len(window) / self.sample_rate - self.edge_guard
+            force = len(window) / self.sample_rate > self.max_window
+
+            # Acuerdo local: confirma el prefijo que no cambió desde la vez anterior
+            stable = 0
+            for i, (end, text) in enumerate(segments[:-1]):
+                agreed = i < len(self._hypothesis) and _norm(self._hypothesis[i][1]) == _norm(text)
+                if end <= live_edge and (agreed or force):
+                    stable = i + 1
+                else:
+                    break
+
+            if stable:
+                cut = segments[stable - 1][0]
+                self.committed.extend(text for _, text in segments[:stable])
+                self.committed_samples += int(cut * self.sample_rate)
+                segments = [(end - cut, text) for end, text in segments[stable:]]
+            self._hypothesis = segments
+            return self.interim_text
+
+    def finalize(self, audio):
+        """Cierra la frase re-decodificando solo la cola sin confirmar."""
+        with self._lock:
+            tail = audio[self.committed_samples:]
+            info = None
+            texts = []
+            if len(tail) > 0:
+                segments, info = self._decode(tail)
+                texts = [text for _, text in segments]
+            text = " ".join(self.committed + texts).strip()
+        return text, info
@@ -0,0 +1,124 @@
+"""Capa común sobre el cliente de Ollama para los dos agentes.
+
+- Un `AsyncClient` (y por tanto un pool de conexiones HTTP) por host,
+  compartido entre el LLM, el resumidor del contexto, etc.
+- Precarga del modelo al arrancar y `keep_alive` en cada petición para que
+  el primer turno tras un rato de inactividad no pague la carga en GPU.
+- Opciones de generación fijadas por perfil (`num_ctx`, `num_predict`...):
+  una respuesta de voz no necesita 2000 tokens.
+- Métricas por petición: tiempo hasta el primer token y tokens/s.
+"""
+import logging
+import statistics
+import time
+from collections import deque
+
+from ollama import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP_ALIVE = "30m"
+
+# Opciones de Ollama por perfil. Todos comparten num_ctx: un num_ctx distinto
+# obliga a Ollama a recargar el modelo entre peticiones
+PROFILES = {
+    # Respuestas habladas: cortas y con contexto acotado (ver common/context.py)
+    "voice": {"num_ctx": 4096, "num_predict": 160, "temperature": 0.7},
+    # Resumen del historial: determinista y algo más largo
+    "summary": {"num_ctx": 4096, "num_predict": 256, "temperature": 0.2},
+}
+
+_clients = {}
+
+
+def shared_client(host=None):
+    """Un AsyncClient por host: todas las peticiones reutilizan sus conexiones."""
+    if host not in _clients:
+        _clients[host] = AsyncClient(host=host)
+    return _clients[host]
+
+
+class OllamaLLM:
+    def __init__(self, model="gemma3:12b", host=None, profile="voice",
+                 keep_alive=DEFAULT_KEEP_ALIVE, options=None, metrics_window=500):
+        self.model = model
+        self.client = shared_client(host)
+        self.profile = profile
+        self.keep_alive = keep_alive
+        self.options = {**PROFILES.get(profile, {}), **(options or {})}
+        # Últimas peticiones (el agente corre días: la lista no puede crecer sin fin)
+        self.metrics = deque(maxlen=metrics_window)
+        self.requests = 0
+
+    def _options(self, profile=None, options=None):
+        base = self.options if profile is None else {**PROFILES.get(profile, {})}
+        return {**base, **(options or {})}
+
+    async def preload(self):
+        """Carga el modelo en memoria (generate sin prompt) y lo deja residente."""
+        # Mismo num_ctx que el chat: si cambia, Ollama recarga el modelo
+        options = {"num_ctx": self.options["num_ctx"]} if "num_ctx" in self.options else None
+        start = time.perf_counter()
+        await self.client.generate(model=self.model, prompt="", keep_alive=self.keep_alive,
+                                   options=options)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Modelo {self.model} precargado en {elapsed:.2f}s (keep_alive={self.keep_alive})")
+        return elapsed
+
+    async def chat(self, messages, profile=None, options=None):
+        """Respuesta completa (sin streaming)."""
+        start = time.perf_counter()
+        response = await self.client.chat(
+            model=self.model, messages=messages, stream=False,
+            keep_alive=self.keep_alive, options=self._options(profile, options),
+        )
+        elapsed = time.perf_counter() - start
+        self._record(profile or self.profile, response, ttft=elapsed, total=elapsed)
+        return response
+
+    async def chat_stream(self, messages, profile=None, options=None):
+        """Itera los chunks de Ollama; el último (done=True) trae las estadísticas."""
+        start = time.perf_counter()
+        ttft = None
+        stream = await self.client.chat(
+            model=self.model, messages=messages, stream=True,
+            keep_alive=self.keep_alive, options=self._options(profile, options),
+        )
+        try:
+            async for chunk in stream:
+                if ttft is None and chunk['message']['content']:
+                    ttft = time.perf_counter() - start
+                if chunk.get('done'):
+                    self._record(profile or self.profile, chunk, ttft=ttft,
+                                 total=time.perf_counter() - start)
+                yield chunk
+        finally:
+            # Barge-in: cerrar el stream corta la conexión y Ollama deja de generar
+            await stream.aclose()
+
+    def _record(self, profile, response, ttft, total):
+        tokens = response.get('eval_count') or 0
+        eval_s = (response.get('eval_duration') or 0) / 1e9
+        metric = {
+            "profile": profile,
+            "ttft_s": round(ttft, 3) if ttft is not None else None,
+            "total_s": round(total, 3),
+            "load_s": round((response.get('load_duration') or 0) / 1e9, 3),
+            "prompt_tokens": response.get('prompt_eval_count') or 0,
+            "tokens": tokens,
+            "tokens_per_s": round(tokens / eval_s, 1) if eval_s > 0 else None,
+        }
+        self.metrics.append(metric)
+        self.requests += 1
+        logger.info(f"LLM [{profile}] TTFT {metric['ttft_s']}s, {tokens} tokens "
+                    f"a {metric['tokens_per_s']} tok/s")
+
+    def stats(self):
+        ttfts = [m["ttft_s"] for m in self.metrics if m["ttft_s"] is not None]
+        rates = [m["tokens_per_s"] for m in self.metrics if m["tokens_per_s"]]
+        return {
+            "requests": self.requests,
+            "ttft_p50_s": round(statistics.median(ttfts), 3) if ttfts else None,
+            "ttft_max_s": max(ttfts) if ttfts else None,
+            "tokens_per_s": round(statistics.mean(rates), 1) if rates else None,
+        }
@@ -0,0 +1,488 @@
+"""Almacén local de modelos: descargas reanudables, en paralelo y verificadas.
+
+El manifiesto (common/models.json) describe cada artefacto (Kokoro ONNX y
+voces, pesos CTranslate2 de Whisper) como un grupo de ficheros con URL,
+tamaño y SHA-256. La estructura en disco:
+
+    blobs/sha256/<hash>        contenido, direccionado por su hash
+    partial/<clave>.part       descarga en curso + <clave>.json con los trozos ya hechos
+    artifacts/<nombre>/<fich>  enlaces a los blobs con el nombre que espera cada librería
+    pins.json                  hash y tamaño de lo descargado con `--pin`
+
+Nada se descarga sin un SHA-256 con el que verificarlo: un fichero sin hash
+en el manifiesto se rechaza (UnpinnedError). Solo `--pin` acepta el primer
+contenido descargado, y antes resuelve las ramas de Hugging Face (`main`
+puede cambiar) a su commit con la API, de la que toma también tamaño y
+SHA-256 de los ficheros LFS; el resultado se escribe en models.json para
+revisarlo y versionarlo.
+
+Un fichero se descarga en trozos con `Range` desde varios hilos sobre un
+`.part` preasignado; si se corta, la siguiente ejecución solo pide los trozos
+que faltan. Hasta que el SHA-256 no coincide no se renombra (atómicamente)
+al blob, así que nunca queda un modelo a medias con su nombre final.
+
+    python -m common.model_store kokoro whisper-medium
+    python -m common.model_store --verify --deep
+    python -m common.model_store --pin      # fija commits, tamaños y hashes en models.json
+"""
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models.json")
+STORE_DIR = os.path.expanduser("~/.cache/stt-ollama-tts/models")
+CHUNK_SIZE = 8 * 2**20
+HF_API = "https://huggingface.co/api/models"
+_READ_SIZE = 2**20
+_HF_RESOLVE = re.compile(r"^https://huggingface\.co/(?P<repo>[^/]+/[^/]+)/resolve/(?P<revision>[^/]+)/(?P<file>.+)$")
+_COMMIT = re.compile(r"^[0-9a-f]{40}$")
+# Uno por proceso, no por instancia: varias ModelStore (Whisper, Kokoro, Silero
+# arrancando en paralelo) comparten pins.json
+_pins_lock = threading.Lock()
+
+
+class ChecksumError(Exception):
+    """El contenido descargado no coincide con el SHA-256 o el tamaño esperados."""
+
+
+class UnpinnedError(ChecksumError):
+    """URL de una rama mutable sin SHA-256: no hay con qué verificar lo descargado."""
+
+
+def load_manifest(path=MANIFEST):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hf_parts(url):
+    """(repo, revisión, fichero) de una URL `resolve` de Hugging Face, o None."""
+    match = _HF_RESOLVE.match(url)
+    return (match["repo"], match["revision"], match["file"]) if match else None
+
+
+def is_mutable(url):
+    """True si la URL apunta a una rama o etiqueta de Hugging Face y no a un commit."""
+    parts = hf_parts(url)
+    return parts is not None and not _COMMIT.match(parts[1])
+
+
+def hf_cache_dir():
+    """Caché de huggingface_hub (donde faster-whisper deja sus descargas)."""
+    cache = os.environ.get("HF_HUB_CACHE") or os.environ.get("HUGGINGFACE_HUB_CACHE")
+    if cache:
+        return cache
+    home = os.environ.get("HF_HOME") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "huggingface")
+    return os.path.join(home, "hub")
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    # Temporal propio de cada escritor: dos procesos no se pisan el .tmp
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+class ModelStore:
+    def __init__(self, root=STORE_DIR, manifest=MANIFEST, workers=4, chunk_size=CHUNK_SIZE,
+                 timeout=30.0, retries=3, progress=None, trust_on_first_use=False):
+        self.root = root
+        self.manifest_path = manifest if isinstance(manifest, str) else None
+        self.manifest = load_manifest(manifest) if isinstance(manifest, str) else manifest
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        # progress(fichero, bytes_hechos, total) desde los hilos de descarga
+        self.progress = progress
+        # Solo para fijar el manifiesto (--pin): acepta ficheros sin hash y los apunta
+        self.trust_on_first_use = trust_on_first_use
+        for sub in ("blobs/sha256", "partial", "artifacts"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+        self._pins_path = os.path.join(root, "pins.json")
+        with _pins_lock:
+            self._pins = _read_json(self._pins_path)
+
+    # --- Rutas ---
+
+    def artifact_dir(self, name):
+        return os.path.join(self.root, "artifacts", name)
+
+    def _blob(self, sha256):
+        return os.path.join(self.root, "blobs", "sha256", sha256)
+
+    def _expected(self, spec):
+        """(sha256, tamaño) del manifiesto o, si faltan, de la primera descarga."""
+        pin = self._pins.get(spec["url"], {})
+        return spec.get("sha256") or pin.get("sha256"), spec.get("size") or pin.get("size")
+
+    # --- Verificación ---
+
+    def verify(self, name, deep=False):
+        """Problemas de un artefacto: [] si está completo.
+
+        La pasada rápida (arranque) solo mira que cada enlace apunte a un blob
+        con el tamaño esperado; `deep` vuelve a calcular los SHA-256.
+        """
+        problems = []
+        for filename, spec in self.manifest[name]["files"].items():
+            link = os.path.join(self.artifact_dir(name), filename)
+            sha256, size = self._expected(spec)
+            if not os.path.exists(link):
+                problems.append((filename, "falta"))
+            elif sha256 and not (os.path.exists(self._blob(sha256))
+                                 and os.path.samefile(link, self._blob(sha256))):
+                problems.append((filename, "no apunta al blob esperado"))
+            elif size is not None and os.path.getsize(link) != size:
+                problems.append((filename, f"tamaño {os.path.getsize(link)} != {size}"))
+            elif deep and sha256 and sha256_file(link) != sha256:
+                problems.append((filename, "SHA-256 distinto"))
+        return problems
+
+    def hf_snapshot(self, name):
+        """Snapshot ya descargado en la caché de Hugging Face con todos los
+        ficheros del artefacto, o None.
+
+        Primero el commit del manifiesto y luego los demás, del más reciente al
+        más antiguo. Cada fichero se verifica contra el SHA-256 del manifiesto:
+        en los LFS (el blob se llama como su SHA-256) sin leer el contenido, en
+        los pequeños calculándolo. Sin hash no se acepta ninguno.
+        """
+        files = self.manifest[name]["files"]
+        parts = [hf_parts(spec["url"]) for spec in files.values()]
+        if not parts or None in parts:
+            return None
+        repo, revision, _ = parts[0]
+        snapshots = os.path.join(hf_cache_dir(), f"models--{repo.replace('/', '--')}", "snapshots")
+        if not os.path.isdir(snapshots):
+            return None
+        candidates = sorted(os.listdir(snapshots), reverse=True,
+                            key=lambda c: (c == revision, os.path.getmtime(os.path.join(snapshots, c))))
+        for candidate in candidates:
+            path = os.path.join(snapshots, candidate)
+            if all(self._matches(os.path.join(path, filename), spec) for filename, spec in files.items()):
+                return path
+        return None
+
+    def _matches(self, path, spec):
+        sha256, size = self._expected(spec)
+        if not sha256 or not os.path.exists(path) or (size is not None and os.path.getsize(path) != size):
+            return False
+        blob = os.path.basename(os.path.realpath(path))
+        if re.fullmatch(r"[0-9a-f]{64}", blob):
+            return blob == sha256
+        return sha256_file(path) == sha256
+
+    def ensure(self, name):
+        """Directorio del artefacto, descargando lo que falte o esté dañado."""
+        broken = {filename for filename, _ in self.verify(name)}
+        files = self.manifest[name]["files"]
+        if broken:
+            # Los ficheros de un artefacto también se bajan en paralelo entre sí
+            with ThreadPoolExecutor(min(len(broken), self.workers)) as pool:
+                blobs = dict(zip(broken, pool.map(lambda f: self.fetch(files[f]), broken)))
+            os.makedirs(self.artifact_dir(name), exist_ok=True)
+            for filename, blob in blobs.items():
+                self._link(blob, os.path.join(self.artifact_dir(name), filename))
+        return self.artifact_dir(name)
+
+    def path(self, name, filename):
+        return os.path.join(self.ensure(name), filename)
+
+    def _link(self, blob, link):
+        # Temporal propio de cada escritor, como en _write_json
+        tmp = f"{link}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            os.symlink(os.path.relpath(blob, os.path.dirname(link)), tmp)
+        except OSError:
+            os.link(blob, tmp)  # Sin permisos para symlinks (Windows)
+        os.replace(tmp, link)
+
+    # --- Descarga ---
+
+    def fetch(self, spec):
+        """Descarga un fichero al almacén y devuelve la ruta de su blob."""
+        url = spec["url"]
+        sha256, size = self._expected(spec)
+        if sha256 and os.path.exists(self._blob(sha256)):
+            return self._blob(sha256)
+        if not sha256 and is_mutable(url):
+            raise UnpinnedError(f"{url}: rama sin commit ni SHA-256; "
+                                f"fíjala con `python -m common.model_store --pin`")
+        if not sha256 and not self.trust_on_first_use:
+            raise UnpinnedError(f"{url}: sin SHA-256 en el manifiesto; "
+                                f"fíjalo con `python -m common.model_store --pin`")
+
+        key = sha256 or hashlib.sha256(url.encode()).hexdigest()[:32]
+        part = os.path.join(self.root, "partial", f"{key}.part")
+        remote_size, ranged = self._probe(url)
+        if size is not None and remote_size is not None and remote_size != size:
+            raise ChecksumError(f"{url}: el servidor anuncia {remote_size} bytes, se esperaban {size}")
+
+        if ranged and remote_size:
+            self._download_ranges(url, part, remote_size)
+        else:
+            self._download_stream(url, part)
+
+        digest = sha256_file(part)
+        actual_size = os.path.getsize(part)
+        if (sha256 and digest != sha256) or (size is not None and actual_size != size):
+            os.remove(part)
+            _remove(f"{part}.json")
+            raise ChecksumError(f"{url}: SHA-256 {digest} ({actual_size} bytes), "
+                                f"se esperaba {sha256} ({size} bytes)")
+        blob = self._blob(digest)
+        os.replace(part, blob)
+        _remove(f"{part}.json")
+        if not spec.get("sha256"):
+            # Confianza en el primer uso (--pin): las siguientes verificaciones usan este hash
+            self._pin(url, digest, actual_size)
+        return blob
+
+    def _pin(self, url, sha256, size):
+        """Añade un pin releyendo pins.json: no se pierden los de otras instancias."""
+        with _pins_lock:
+            pins = _read_json(self._pins_path)
+            pins[url] = {"sha256": sha256, "size": size}
+            _write_json(self._pins_path, pins)
+            self._pins = pins
+
+    def _open(self, url, headers=None):
+        request = urllib.request.Request(url, headers={"User-Agent": "stt-ollama-tts", **(headers or {})})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _probe(self, url):
+        """(tamaño, admite Range) pidiendo solo el primer byte."""
+        with self._open(url, {"Range": "bytes=0-0"}) as response:
+            content_range = response.headers.get("Content-Range", "")
+            if response.status == 206 and "/" in content_range:
+                total = content_range.rsplit("/", 1)[1]
+                return (int(total) if total.isdigit() else None), True
+            length = response.headers.get("Content-Length")
+            return (int(length) if length else None), False
+
+    def _download_ranges(self, url, part, size):
+        state_path = f"{part}.json"
+        state = {}
+        if os.path.exists(state_path) and os.path.exists(part):
+            with open(state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        if state.get("size") != size or state.get("chunk_size") != self.chunk_size:
+            state = {"url": url, "size": size, "chunk_size": self.chunk_size, "done": []}
+            _remove(part)
+
+        chunks = [(i, start, min(start + self.chunk_size, size) - 1)
+                  for i, start in enumerate(range(0, size, self.chunk_size))]
+        done = set(state["done"])
+        pending = [c for c in chunks if c[0] not in done]
+        lock = threading.Lock()
+        progress = [sum(end - start + 1 for i, start, end in chunks if i in done)]
+
+        fd = os.open(part, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+
+            def fetch_chunk(chunk):
+                index, start, end = chunk
+                self._retry(lambda: self._fetch_range(url, fd, start, end, lock, progress, size))
+                with lock:
+                    # Solo se apunta el trozo cuando está entero en disco
+                    done.add(index)
+                    state["done"] = sorted(done)
+                    _write_json(state_path, state)
+
+            with ThreadPoolExecutor(self.workers) as pool:
+                for _ in pool.map(fetch_chunk, pending):
+                    pass
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _fetch_range(self, url, fd, start, end, lock, progress, size):
+        with self._open(url, {"Range": f"bytes={start}-{end}"}) as response:
+            if response.status != 206:
+                raise urllib.error.URLError(f"{url}: el servidor ignoró Range (HTTP {response.status})")
+            offset = start
+            while offset <= end:
+                block = response.read(min(_READ_SIZE, end - offset + 1))
+                if not block:
+                    raise urllib.error.URLError(f"{url}: conexión cortada en el byte {offset}")
+                os.pwrite(fd, block, offset)
+                offset += len(block)
+                with lock:
+                    progress[0] += len(block)
+                    if self.progress:
+                        self.progress(url, progress[0], size)
+
+    def _download_stream(self, url, part):
+        """Servidor sin Range: una sola petición, desde el principio."""
+        def run():
+            with self._open(url) as response, open(part, "wb") as f:
+                total = response.headers.get("Content-Length")
+                written = 0
+                for block in iter(lambda: response.read(_READ_SIZE), b""):
+                    f.write(block)
+                    written += len(block)
+                    if self.progress:
+                        self.progress(url, written, int(total) if total else None)
+                f.flush()
+                os.fsync(f.fileno())
+
+        self._retry(run)
+
+    def _retry(self, fn):
+        for attempt in range(self.retries + 1):
+            try:
+                return fn()
+            except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+                if attempt == self.retries:
+                    raise
+                print(f"[modelos] Reintento {attempt + 1}/{self.retries}: {e}")
+                time.sleep(min(2 ** attempt, 10))
+
+    # --- Manifiesto ---
+
+    def resolve_revisions(self):
+        """Cambia en el manifiesto las ramas de Hugging Face por su commit actual
+        y añade tamaño y SHA-256 de los ficheros LFS (los da la API sin descargar)."""
+        repos = {}
+        for artifact in self.manifest.values():
+            for spec in artifact["files"].values():
+                parts = hf_parts(spec["url"])
+                if parts is None or not is_mutable(spec["url"]):
+                    continue
+                repo, revision, filename = parts
+                if (repo, revision) not in repos:
+                    with self._open(f"{HF_API}/{repo}/revision/{revision}?blobs=true") as response:
+                        repos[(repo, revision)] = json.load(response)
+                info = repos[(repo, revision)]
+                spec["url"] = f"https://huggingface.co/{repo}/resolve/{info['sha']}/{filename}"
+                sibling = next((s for s in info.get("siblings", []) if s["rfilename"] == filename), {})
+                lfs = sibling.get("lfs") or {}
+                if lfs.get("sha256") and not spec.get("sha256"):
+                    spec.update(sha256=lfs["sha256"], size=lfs.get("size", sibling.get("size")))
+                elif spec.get("size") is None and sibling.get("size") is not None:
+                    # Ficheros pequeños (no LFS): el hash se fija al descargarlos
+                    spec["size"] = sibling["size"]
+        if self.manifest_path:
+            _write_json(self.manifest_path, self.manifest)
+        return self.manifest
+
+    def pin(self):
+        """Copia al manifiesto los tamaños y hashes de los ficheros ya descargados."""
+        with _pins_lock:
+            self._pins = _read_json(self._pins_path)
+        for artifact in self.manifest.values():
+            for spec in artifact["files"].values():
+                pinned = self._pins.get(spec["url"])
+                if pinned and not spec.get("sha256"):
+                    spec.update(pinned)
+        if self.manifest_path:
+            _write_json(self.manifest_path, self.manifest)
+        return self.manifest
+
+
+def whisper_model(model_size, store=None):
+    """Directorio verificado de los pesos de Whisper, sin descargar lo que ya esté en disco.
+
+    Por orden: el artefacto del almacén si está completo, el snapshot que
+    faster-whisper ya bajó a la caché de Hugging Face (verificado con
+    `hf_snapshot`) y, solo si no hay ninguno, la descarga al almacén. No hay
+    vuelta a la descarga de faster-whisper: si el manifiesto no tiene el
+    modelo o no se puede verificar, se lanza el error. Un directorio local
+    (`model_size` como ruta) se usa tal cual.
+    """
+    if os.path.isdir(model_size):
+        return model_size
+    name = f"whisper-{model_size}"
+    store = store or ModelStore()
+    if name not in store.manifest:
+        raise KeyError(f"{name} no está en {store.manifest_path or 'el manifiesto'}; "
+                       f"añádelo y fíjalo con `python -m common.model_store --pin`")
+    if not store.verify(name):
+        return store.artifact_dir(name)
+    snapshot = store.hf_snapshot(name)
+    if snapshot is not None:
+        return snapshot
+    return store.ensure(name)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descarga y verifica los modelos locales")
+    parser.add_argument("artifacts", nargs="*", help="Por defecto, todos los del manifiesto")
+    parser.add_argument("--root", default=STORE_DIR)
+    parser.add_argument("--manifest", default=MANIFEST)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--verify", action="store_true", help="Solo verificar, sin descargar")
+    parser.add_argument("--deep", action="store_true", help="Verificar también los SHA-256")
+    parser.add_argument("--pin", action="store_true", help="Fijar commits, tamaños y hashes en el manifiesto")
+    args = parser.parse_args()
+
+    last = {}
+
+    def progress(url, done, total):
+        pct = int(100 * done / total) if total else None
+        if pct is not None and pct // 10 != last.get(url):
+            last[url] = pct // 10
+            print(f"  {os.path.basename(url)}: {pct}%")
+
+    store = ModelStore(args.root, args.manifest, workers=args.workers, progress=progress,
+                       trust_on_first_use=args.pin)
+    if args.pin:
+        # Primero los commits: lo que se descargue después ya es inmutable
+        store.resolve_revisions()
+    names = args.artifacts or list(store.manifest)
+    failed = False
+    for name in names:
+        if args.verify:
+            problems = store.verify(name, deep=args.deep)
+            print(f"{name}: {'OK' if not problems else problems}")
+            failed |= bool(problems)
+            continue
+        start = time.perf_counter()
+        path = store.ensure(name)
+        problems = store.verify(name, deep=args.deep)
+        failed |= bool(problems)
+        print(f"{name}: {path} ({time.perf_counter() - start:.1f} s){'' if not problems else f' {problems}'}")
+    if args.pin:
+        store.pin()
+        print(f"Manifiesto actualizado: {args.manifest}")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
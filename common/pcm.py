@@ -0,0 +1,121 @@
+"""Conversión PCM16 <-> float32 sin copias intermedias.
+
+`np.frombuffer(b, np.int16).astype(np.float32) / 32768.0` crea dos arrays
+del tamaño de la frase; `(x * 32767).astype(np.int16).tobytes()` crea tres.
+Aquí cada conversión escribe directamente en su destino en una pasada
+(ufunc con `out=`), y lo único que se reserva es el propio resultado:
+
+- `pcm16_to_float`: bytes/bytearray/memoryview -> float32 (o en `out`).
+- `float_to_pcm16`: float32 -> bytearray PCM16 con recorte a [-1, 1]; el
+  recorte usa un buffer de trabajo del hilo que se reutiliza.
+- `PcmAccumulator`: frase que crece frame a frame ya en float32; `view()`
+  la entrega sin copiar (Whisper incremental la pide cada segundo).
+- `frames`: trocea un buffer en memoryviews de tamaño fijo.
+"""
+import threading
+
+import numpy as np
+
+_TO_FLOAT = np.float32(1 / 32768.0)
+_TO_INT16 = np.float32(32767.0)
+
+_local = threading.local()
+
+
+def scratch(n, dtype=np.float32):
+    """Buffer de trabajo de al menos `n` elementos, propio del hilo y reutilizado.
+
+    El contenido solo es válido hasta la siguiente llamada desde el mismo hilo.
+    """
+    buffers = _local.__dict__.setdefault("buffers", {})
+    key = np.dtype(dtype)
+    buf = buffers.get(key)
+    if buf is None or len(buf) < n:
+        # Crece al doble: tras las primeras frases largas ya no se reserva más
+        buf = np.empty(max(n, 2 * len(buf) if buf is not None else n), dtype=key)
+        buffers[key] = buf
+    return buf[:n]
+
+
+def pcm16_to_float(data, out=None):
+    """PCM16 (cualquier objeto con buffer) -> float32 en [-1, 1), en una pasada."""
+    src = np.frombuffer(data, dtype=np.int16)
+    if out is None:
+        out = np.empty(len(src), dtype=np.float32)
+    else:
+        out = out[:len(src)]
+    np.multiply(src, _TO_FLOAT, out=out, dtype=np.float32)
+    return out
+
+
+def float_to_pcm16(samples, out=None):
+    """float32 -> PCM16 recortado. Devuelve un bytearray nuevo (o `out` relleno).
+
+    El bytearray es el payload del frame: no se comparte, así que puede
+    encolarse sin que la siguiente conversión lo pise.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    n = len(samples)
+    if out is None:
+        out = bytearray(2 * n)
+    dst = np.frombuffer(out, dtype=np.int16, count=n)
+    clipped = np.clip(samples, -1.0, 1.0, out=scratch(n))
+    np.multiply(clipped, _TO_INT16, out=dst, casting="unsafe")
+    return out
+
+
+def frames(data, frame_bytes):
+    """Trozos de `frame_bytes` de un buffer como memoryviews (sin copiar)."""
+    view = memoryview(data)
+    for start in range(0, len(view), frame_bytes):
+        yield view[start:start + frame_bytes]
+
+
+class PcmAccumulator:
+    """Audio de una frase en float32, ampliado por frames PCM16 sin copias extra.
+
+    La capacidad se duplica al llenarse: una frase de 30 s hace unas pocas
+    reservas en lugar de una copia completa por cada actualización.
+    """
+
+    def __init__(self, capacity=16000 * 5):
+        self.capacity = capacity
+        self._data = None
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def clear(self):
+        # No se reutiliza la memoria: alguna vista de la frase anterior puede
+        # seguir en Whisper (executor); la siguiente frase reserva la suya
+        self._data = None
+        self._len = 0
+
+    def extend_pcm16(self, data):
+        src = np.frombuffer(data, dtype=np.int16)
+        end = self._len + len(src)
+        self._reserve(end)
+        np.multiply(src, _TO_FLOAT, out=self._data[self._len:end], dtype=np.float32)
+        self._len = end
+
+    def extend(self, samples):
+        n = len(samples)
+        self._reserve(self._len + n)
+        self._data[self._len:self._len + n] = samples
+        self._len += n
+
+    def view(self):
+        """Vista del audio acumulado. Sigue siendo válida tras más `extend` y
+        tras `clear`: nunca se sobrescribe lo ya escrito."""
+        if self._data is None:
+            return np.zeros(0, dtype=np.float32)
+        return self._data[:self._len]
+
+    def _reserve(self, n):
+        if self._data is None:
+            self._data = np.empty(max(n, self.capacity), dtype=np.float32)
+        elif n > len(self._data):
+            data = np.empty(max(n, 2 * len(self._data)), dtype=np.float32)
+            data[:self._len] = self._data[:self._len]
+            self._data = data
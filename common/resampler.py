@@ -0,0 +1,127 @@
+"""Re-muestreo polifásico racional con estado, compartido por los dos agentes.
+
+La conversión src -> dst se reduce a L/M (subir L, bajar M). La entrada se
+agrupa en bloques de M muestras y cada bloque produce L muestras de salida
+como combinación del bloque anterior, el actual y el siguiente. Los
+coeficientes se diseñan una sola vez por par de frecuencias y se trocean en
+sub-matrices que solo cubren la banda no nula del filtro, así que el trabajo
+son unos pocos productos de matrices (BLAS) sobre vistas contiguas. El objeto
+guarda el último bloque entre llamadas: los trozos de Kokoro se unen sin clics.
+"""
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def design_filter(src_sr, dst_sr, num_zeros=16, rolloff=0.945, beta=8.6):
+    """Diseña (y cachea) los coeficientes polifásicos de un par de frecuencias.
+
+    Devuelve (L, M, P, pieces): tamaño de bloque de salida y de entrada,
+    contexto a cada lado y una tupla de sub-matrices de solo lectura
+    (bloque, fila_ini, fila_fin, col_ini, col_fin, coeficientes), donde
+    bloque 0/1/2 es el anterior, el actual o el siguiente.
+    """
+    g = gcd(src_sr, dst_sr)
+    up, down = dst_sr // g, src_sr // g
+
+    # Al bajar de frecuencia el corte se mueve a la nueva Nyquist
+    scale = min(1.0, up / down)
+    cutoff = rolloff * scale
+    half_width = num_zeros / scale          # En muestras de entrada
+    pad = int(np.ceil(half_width)) + 1
+
+    # Bloques de al menos 2P muestras para que el contexto quepa en los vecinos
+    factor = max(1, -(-2 * pad // down))
+    up, down = up * factor, down * factor
+
+    # Coeficiente de la entrada d (relativa al inicio del bloque) en la salida r
+    d = np.arange(-down, 2 * down)[:, None]
+    r = np.arange(up)[None, :]
+    t = (r * down - d * up) / up             # Distancia en muestras de entrada
+    window = np.clip(1.0 - (t / half_width) ** 2, 0.0, None)
+    kernel = cutoff * np.sinc(cutoff * t) * np.i0(beta * np.sqrt(window)) / np.i0(beta)
+    kernel[np.abs(t) > half_width] = 0.0
+    kernel = kernel.astype(np.float32)
+
+    # Grupos de columnas: cada uno solo lee su banda de entrada. Con pocas
+    # salidas por bloque no compensa trocear más
+    groups = max(1, min(round(down / pad), up // 32))
+    bounds = np.linspace(0, up, groups + 1).astype(int)
+    pieces = []
+    for c0, c1 in zip(bounds[:-1], bounds[1:]):
+        rows = np.flatnonzero(np.any(kernel[:, c0:c1] != 0.0, axis=1))
+        lo, hi = rows[0], rows[-1] + 1
+        for block in range(3):
+            r0, r1 = max(lo, block * down), min(hi, (block + 1) * down)
+            if r0 < r1:
+                coeffs = np.ascontiguousarray(kernel[r0:r1, c0:c1])
+                coeffs.setflags(write=False)
+                pieces.append((block, r0 - block * down, r1 - block * down, c0, c1, coeffs))
+    return up, down, pad, tuple(pieces)
+
+
+class StreamingResampler:
+    """Re-muestreo por bloques que conserva el historial del filtro."""
+
+    def __init__(self, src_sr, dst_sr):
+        self.src_sr = src_sr
+        self.dst_sr = dst_sr
+        self.passthrough = src_sr == dst_sr
+        if not self.passthrough:
+            self._up, self._down, _, self._pieces = design_filter(src_sr, dst_sr)
+        self.reset()
+
+    def reset(self):
+        self.samples_in = 0
+        self.samples_out = 0
+        if not self.passthrough:
+            # Bloque anterior a cero: la primera salida cae en t = 0
+            self._pending = np.zeros(self._down, dtype=np.float32)
+
+    def process(self, samples):
+        """Procesa un trozo y devuelve todas las muestras de salida ya calculables."""
+        x = np.asarray(samples, dtype=np.float32).reshape(-1)
+        self.samples_in += len(x)
+        if self.passthrough:
+            self.samples_out += len(x)
+            return x
+
+        buf = np.concatenate((self._pending, x))
+        m = self._down
+        frames = len(buf) // m - 2
+        if frames <= 0:
+            self._pending = buf
+            return np.zeros(0, dtype=np.float32)
+
+        blocks = buf[:(frames + 2) * m].reshape(frames + 2, m)
+        out = np.zeros((frames, self._up), dtype=np.float32)
+        for block, r0, r1, c0, c1, coeffs in self._pieces:
+            out[:, c0:c1] += blocks[block:block + frames, r0:r1] @ coeffs
+        out = out.reshape(-1)
+
+        self._pending = buf[frames * m:]
+        self.samples_out += len(out)
+        return out
+
+    def flush(self):
+        """Vacía el filtro al terminar el stream, ajusta la longitud total y
+        deja el objeto listo para el siguiente."""
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        expected = -(-self.samples_in * self._up // self._down)
+        missing = expected - self.samples_out
+        out = np.zeros(0, dtype=np.float32)
+        if missing > 0:
+            out = self.process(np.zeros(2 * self._down, dtype=np.float32))[:missing]
+        self.reset()
+        return out
+
+
+def resample(audio, src_sr, dst_sr):
+    """Re-muestrea un array completo de una vez."""
+    resampler = StreamingResampler(src_sr, dst_sr)
+    head = resampler.process(audio)
+    tail = resampler.flush()
+    return np.concatenate((head, tail)) if len(tail) else head
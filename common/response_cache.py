@@ -0,0 +1,191 @@
+"""Caché de respuestas del LLM para preguntas que se repiten.
+
+Dos niveles delante del modelo:
+- Exacto: el texto transcrito normalizado (minúsculas, sin acentos, sin
+  puntuación ni muletillas) es la clave.
+- Similar (opcional): índice de trigramas de caracteres con similitud coseno
+  sobre un umbral; absorbe variaciones de Whisper ("cómo te llamas" /
+  "como te llamas tú"). Los números tienen que coincidir: "dos más dos" y
+  "dos más tres" se parecen mucho en trigramas pero no son la misma pregunta.
+
+Las entradas caducan por TTL y se expulsan por LRU al superar `max_entries`.
+Los turnos que dependen del contexto ("repite eso", "y lo otro") o de datos
+que cambian ("qué hora es") nunca pasan por la caché.
+"""
+import math
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+
+FILLERS = {
+    "eh", "em", "emm", "mmm", "este", "bueno", "pues", "oye", "mira", "vale",
+    "porfa", "porfavor",
+}
+NUMBERS = {
+    "cero", "uno", "una", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho",
+    "nueve", "diez", "once", "doce", "veinte", "treinta", "cien", "cientos", "mil", "millon",
+    "millones", "medio", "mitad",
+}
+# Palabras que remiten a turnos anteriores: la respuesta depende del historial
+REFERENTIAL = {
+    "eso", "esto", "esa", "ese", "aquello", "anterior", "antes", "repite",
+    "repetir", "otra", "tambien", "entonces", "ella", "ellos",
+}
+# La respuesta cambia con el tiempo aunque la pregunta sea la misma
+VOLATILE = {
+    "hora", "horas", "fecha", "hoy", "manana", "ayer", "dia", "ahora", "tiempo", "clima",
+}
+
+_PUNCT = re.compile(r"[^\w\s]")
+_FILLER_PHRASES = re.compile(r"\b(?:a ver|por favor|o sea)\b")
+
+
+def normalize_query(text):
+    """Minúsculas, sin acentos ni puntuación, sin muletillas."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    words = _FILLER_PHRASES.sub(" ", _PUNCT.sub(" ", text)).split()
+    return " ".join(w for w in words if w not in FILLERS)
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _numbers(text):
+    return {w for w in text.split() if w.isdigit() or w in NUMBERS}
+
+
+def _cosine(a, b):
+    dot = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    if not dot:
+        return 0.0
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, ttl=24 * 3600, similarity=0.88, max_reply_chars=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # None desactiva el nivel de similitud
+        self.similarity = similarity
+        self.max_reply_chars = max_reply_chars
+
+        self._entries = OrderedDict()       # clave -> (respuesta, instante, trigramas)
+        self._index = defaultdict(set)      # trigrama -> claves
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def cacheable(self, text):
+        """False para turnos que dependen del historial o de datos cambiantes."""
+        words = set(normalize_query(text).split())
+        return bool(words) and not (words & REFERENTIAL) and not (words & VOLATILE)
+
+    def get(self, text, context_dependent=False):
+        """Respuesta cacheada o None. `context_dependent` fuerza el bypass."""
+        if context_dependent or not self.cacheable(text):
+            self.bypassed += 1
+            return None
+
+        key = normalize_query(text)
+        reply = self._fresh(key)
+        if reply is not None:
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return reply
+
+        if self.similarity is not None:
+            match = self._most_similar(key)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self.similar_hits += 1
+                return self._entries[match][0]
+
+        self.misses += 1
+        return None
+
+    def peek(self, text):
+        """Como get(), pero sin efectos: ni cuenta, ni toca el orden LRU, ni
+        retira las entradas caducadas (solo las ignora)."""
+        if not self.cacheable(text):
+            return None
+        key = normalize_query(text)
+        reply = self._fresh(key, evict=False)
+        if reply is None and self.similarity is not None:
+            match = self._most_similar(key, evict=False)
+            if match is not None:
+                reply = self._entries[match][0]
+        return reply
+
+    def put(self, text, reply, context_dependent=False):
+        reply = reply.strip()
+        if context_dependent or not reply or len(reply) > self.max_reply_chars or not self.cacheable(text):
+            return
+        key = normalize_query(text)
+        self._remove(key)
+        grams = _trigrams(key)
+        self._entries[key] = (reply, time.monotonic(), grams)
+        for gram in grams:
+            self._index[gram].add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _fresh(self, key, evict=True):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.ttl:
+            if not evict:
+                return None
+            self._remove(key)
+            self.expirations += 1
+            return None
+        return entry[0]
+
+    def _most_similar(self, key, evict=True):
+        grams = _trigrams(key)
+        numbers = _numbers(key)
+        # Solo se comparan las entradas que comparten algún trigrama
+        candidates = set()
+        for gram in grams:
+            candidates |= self._index.get(gram, set())
+        best, best_score = None, self.similarity
+        for candidate in candidates:
+            if _numbers(candidate) != numbers or self._fresh(candidate, evict) is None:
+                continue
+            score = _cosine(grams, self._entries[candidate][2])
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for gram in entry[2]:
+            keys = self._index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[gram]
+
+    def stats(self):
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round((self.exact_hits + self.similar_hits) / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,232 @@
+"""Registro de sesión que no bloquea el audio: JSONL por lotes en un hilo.
+
+`SessionRecorder.record(kind, **campos)` solo encola un dict (O(1), sin
+tocar disco ni serializar); un hilo de escritura los agrupa, los escribe en
+JSONL y hace fsync cada `fsync_interval` segundos. Cuando el fichero pasa
+de `max_bytes` se abre otro y, con `compress=True`, el cerrado se comprime
+a .gz en el mismo hilo. El audio de cada frase (opcional) va en segmentos
+PCM16 crudos; el JSONL apunta a fichero, offset y muestras:
+
+    directorio/
+        session-20261018-101500-000.jsonl[.gz]
+        session-20261018-101500-audio-000.pcm
+
+`queue_logging` hace lo mismo con `logging`: los handlers de fichero y
+consola escriben desde un QueueListener, no desde el event loop.
+"""
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from common.pcm import float_to_pcm16
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class SessionRecorder:
+    def __init__(self, directory, prefix="session", max_bytes=16 * 2**20, batch_size=256,
+                 flush_interval=0.5, fsync_interval=5.0, compress=False,
+                 audio_segment_bytes=64 * 2**20, max_pending=10000):
+        self.directory = directory
+        self.prefix = f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}"
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.compress = compress
+        self.audio_segment_bytes = audio_segment_bytes
+        self.max_pending = max_pending
+        os.makedirs(directory, exist_ok=True)
+
+        # Turno actual: lo abre `new_turn` (frase del usuario) y lo heredan los registros
+        self.turn = 0
+        self._turn_started = None
+
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self.records = 0
+        self.dropped = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.rotations = 0
+        self.bytes_written = 0
+
+        self._file = None
+        self._segment = -1
+        self._size = 0
+        self._audio = None
+        self._audio_segment = -1
+        self._audio_size = 0
+        self._last_fsync = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="session-recorder", daemon=True)
+        self._thread.start()
+
+    # --- Lado del pipeline: solo encolar ---
+
+    def new_turn(self):
+        self.turn += 1
+        self._turn_started = time.perf_counter()
+        return self.turn
+
+    def since_turn(self):
+        """Segundos desde el inicio del turno actual (None si aún no hay)."""
+        if self._turn_started is None:
+            return None
+        return round(time.perf_counter() - self._turn_started, 4)
+
+    def record(self, kind, **fields):
+        """Encola un registro; nunca espera al disco."""
+        if self._closed or self._queue.qsize() >= self.max_pending:
+            # Cerrado (nadie lo escribiría) o el disco no da abasto: mejor
+            # perder registros que frenar el audio
+            self.dropped += 1
+            return
+        self._queue.put({"ts": round(time.time(), 3), "kind": kind, "turn": self.turn, **fields})
+
+    def record_audio(self, samples, sample_rate, **fields):
+        """Encola el audio de una frase (float32 o PCM16). No se copia: el array
+        no debe modificarse después (las vistas de PcmAccumulator no lo hacen)."""
+        self.record("audio", sample_rate=sample_rate, _audio=samples, **fields)
+
+    def close(self, timeout=5.0):
+        """Escribe lo pendiente, hace fsync y cierra los ficheros."""
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "records": self.records,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "fsyncs": self.fsyncs,
+            "rotations": self.rotations,
+            "bytes": self.bytes_written,
+            "pending": self._queue.qsize(),
+        }
+
+    # --- Hilo de escritura ---
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # _STOP puede quedar en mitad del lote si otro hilo registró a la vez que close()
+            if any(entry is _STOP for entry in batch):
+                batch = [entry for entry in batch if entry is not _STOP]
+                stop = True
+            try:
+                if batch:
+                    self._write(batch)
+                if stop or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                    self._sync()
+            except Exception as e:
+                # Un lote perdido no debe matar el hilo: los siguientes se siguen escribiendo
+                logger.error(f"Registro de sesión: {e}")
+        self._closed = True
+        self._close_files()
+
+    def _write(self, batch):
+        if self._file is None or self._size >= self.max_bytes:
+            self._rotate()
+        lines = []
+        for entry in batch:
+            audio = entry.pop("_audio", None)
+            if audio is not None:
+                entry.update(self._write_audio(audio))
+            lines.append(json.dumps(entry, ensure_ascii=False, default=str))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+        self.bytes_written += len(data)
+        self.records += len(batch)
+        self.batches += 1
+
+    def _write_audio(self, audio):
+        if isinstance(audio, np.ndarray) and audio.dtype != np.int16:
+            pcm = float_to_pcm16(audio)
+        else:
+            pcm = audio
+        if self._audio is None or self._audio_size >= self.audio_segment_bytes:
+            if self._audio is not None:
+                self._audio.close()
+            self._audio_segment += 1
+            self._audio = open(self._path(f"audio-{self._audio_segment:03d}.pcm"), "ab")
+            self._audio_size = 0
+        size = pcm.nbytes if isinstance(pcm, np.ndarray) else len(pcm)
+        offset = self._audio_size
+        self._audio.write(pcm)
+        self._audio.flush()
+        self._audio_size += size
+        return {"file": os.path.basename(self._audio.name), "offset": offset, "samples": size // 2}
+
+    def _sync(self):
+        for f in (self._file, self._audio):
+            if f is not None:
+                os.fsync(f.fileno())
+        self._last_fsync = time.monotonic()
+        self.fsyncs += 1
+
+    def _rotate(self):
+        previous = self._file
+        if previous is not None:
+            os.fsync(previous.fileno())
+            previous.close()
+            self.rotations += 1
+            if self.compress:
+                self._gzip(previous.name)
+        self._segment += 1
+        self._file = open(self._path(f"{self._segment:03d}.jsonl"), "ab")
+        self._size = 0
+
+    def _gzip(self, path):
+        with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+
+    def _close_files(self):
+        for f in (self._file, self._audio):
+            if f is not None:
+                f.close()
+        if self._file is not None and self.compress:
+            self._gzip(self._file.name)
+        self._file = self._audio = None
+
+    def _path(self, suffix):
+        return os.path.join(self.directory, f"{self.prefix}-{suffix}")
+
+
+def queue_logging(*handlers, level=logging.INFO, fmt="%(asctime)s - %(levelname)s - %(message)s"):
+    """Configura `logging` con un QueueHandler: los `handlers` (fichero, consola)
+    escriben en el hilo de un QueueListener, que se vacía al salir del proceso."""
+    formatter = logging.Formatter(fmt)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    # El QueueHandler solo interpola el mensaje; el formato lo ponen los handlers finales
+    logging.basicConfig(level=level, format="%(message)s", handlers=[logging.handlers.QueueHandler(log_queue)])
+    return listener
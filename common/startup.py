@@ -0,0 +1,126 @@
+"""Arranque en paralelo de los modelos con un timeline por componente.
+
+Whisper, Kokoro, Silero y la precarga de Ollama no dependen entre sí: cada
+uno se carga en su propio hilo (los imports pesados, torch, kokoro o
+faster_whisper, ocurren dentro de ese hilo) y quien los necesita recibe un
+`concurrent.futures.Future`. El micrófono puede abrirse mientras tanto;
+el primer turno solo espera al modelo que le falte.
+
+    startup = Startup()
+    whisper = startup.submit("whisper", load_whisper, "medium")
+    listener = Listener(model=whisper)   # Listener espera al Future al transcribir
+    await startup.wait()
+    print(startup.report())
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+def load_whisper(model_size="medium", device="cuda", compute_type="float16"):
+    """WhisperModel con el import diferido: faster_whisper arrastra ctranslate2.
+
+    Los pesos salen del almacén verificado (common/model_store.py) o del
+    snapshot que faster-whisper ya tenga en la caché de Hugging Face.
+    """
+    from faster_whisper import WhisperModel
+
+    from common.model_store import whisper_model
+
+    return WhisperModel(whisper_model(model_size), device=device, compute_type=compute_type)
+
+
+def resolve(value):
+    """El objeto ya cargado, esperando si todavía es un Future."""
+    return value.result() if isinstance(value, Future) else value
+
+
+def set_future_result(future, result):
+    """Para `loop.call_soon_threadsafe` desde un worker: el llamante pudo cancelar."""
+    if not future.done():
+        future.set_result(result)
+
+
+def set_future_exception(future, exc):
+    if not future.done():
+        future.set_exception(exc)
+
+
+class Startup:
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="startup")
+        self._lock = threading.Lock()
+        self._pending = []
+        self.t0 = time.perf_counter()
+        self.timeline = []  # (componente, inicio, fin, error) relativos a t0
+
+    def _record(self, name, start, error=None):
+        with self._lock:
+            self.timeline.append((name, start - self.t0, time.perf_counter() - self.t0, error))
+
+    def submit(self, name, fn, *args, **kwargs):
+        """Carga `fn(*args, **kwargs)` en segundo plano y devuelve su Future."""
+        def run():
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._record(name, start, e)
+                raise
+            self._record(name, start)
+            return result
+
+        future = self._executor.submit(run)
+        self._pending.append(future)
+        return future
+
+    def run(self, name, fn, *args, **kwargs):
+        """Paso síncrono en el hilo actual (p. ej. abrir el micrófono), también cronometrado."""
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._record(name, start, e)
+            raise
+        self._record(name, start)
+        return result
+
+    def track(self, name, awaitable):
+        """Cronometra una corrutina (precarga de Ollama, frases del TTS) como tarea."""
+        async def run():
+            start = time.perf_counter()
+            try:
+                result = await awaitable
+            except Exception as e:
+                self._record(name, start, e)
+                raise
+            self._record(name, start)
+            return result
+
+        task = asyncio.ensure_future(run())
+        self._pending.append(task)
+        return task
+
+    async def wait(self):
+        """Espera a que termine todo lo lanzado y devuelve los errores (quedan en el timeline)."""
+        pending = [asyncio.wrap_future(p) if isinstance(p, Future) else p for p in self._pending]
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+        return [r for r in results if isinstance(r, BaseException)]
+
+    def report(self, width=40):
+        """Timeline de texto: una barra por componente sobre el tiempo total."""
+        with self._lock:
+            rows = sorted(self.timeline, key=lambda r: r[1])
+        if not rows:
+            return ""
+        total = max(end for _, _, end, _ in rows)
+        scale = width / total if total else 0
+        name_width = max(len(name) for name, *_ in rows)
+        lines = [f"--- Arranque: {total:.1f} s ---"]
+        for name, start, end, error in rows:
+            bar = " " * int(start * scale) + "█" * max(1, int((end - start) * scale))
+            status = f"  ERROR: {error}" if error else ""
+            lines.append(f"{name:<{name_width}}  {start:5.1f} → {end:5.1f} s  {end - start:5.1f} s  {bar:<{width}}{status}")
+        return "\n".join(lines)
@@ -0,0 +1,180 @@
+"""Filtro de frases antes y después de Whisper, común a los dos agentes.
+
+Antes de decodificar (`check`), solo con numpy: duración mínima, energía en
+la banda de voz y fracción de tramas con voz. Un golpe, un carraspeo o un
+tramo de ruido que el VAD dejó pasar no llega a ocupar la GPU.
+
+Después (`text` / `accept`): los segmentos con `no_speech_prob` alto y
+`avg_logprob` bajo (la regla de Whisper) o con el texto repetido en bucle
+(`compression_ratio`) se descartan, y la frase entera se rechaza si el
+idioma es dudoso, es demasiado corta o contiene una alucinación conocida.
+La lista negra se compila una vez en una sola expresión regular.
+"""
+import logging
+import re
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from common.vad import EnergyVAD
+
+logger = logging.getLogger(__name__)
+
+# Mismos umbrales que faster-whisper
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4
+
+# Lo que Whisper "oye" en silencio o ruido (subtítulos de vídeos de su entrenamiento)
+HALLUCINATIONS = (
+    "subtítulos por la comunidad de amara.org",
+    "subtítulos realizados por",
+    "transcripción realizada por",
+    "gracias por ver el vídeo",
+    "suscríbete",
+    "amara.org",
+)
+
+_NON_WORD = re.compile(r"[^\w]+")
+# Tildes y diéresis fuera sin pasar por unicodedata en cada frase
+_ACCENTS = str.maketrans("áàâäéèêëíìîïóòôöúùûü", "aaaaeeeeiiiioooouuuu")
+
+
+def normalize(text):
+    """Minúsculas, sin tildes ni puntuación: "¡Gracias por ver el Video!" == "gracias por ver el vídeo"."""
+    return _NON_WORD.sub(" ", text.lower().translate(_ACCENTS)).strip()
+
+
+def _trie_pattern(keys):
+    """Alternativa factorizada por prefijos ("gracias por (?:ver|...)"): el motor de
+    re descarta de una vez todas las frases que no empiezan por la letra actual."""
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        ends = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+def compile_blacklist(phrases):
+    """Una sola expresión con todas las frases, por palabras completas."""
+    keys = {normalize(p) for p in phrases} - {""}
+    if not keys:
+        return None
+    return re.compile(r"\b" + _trie_pattern(keys) + r"\b")
+
+
+def compression_ratio(text):
+    data = text.encode("utf-8")
+    return len(data) / len(zlib.compress(data)) if data else 0.0
+
+
+class SpeechGate:
+    def __init__(self, sample_rate=16000, min_duration=0.25, min_level_db=-55.0,
+                 speech_margin_db=9.0, min_speech_ratio=0.1, min_language_prob=0.5,
+                 min_chars=3, blacklist=HALLUCINATIONS):
+        self.sample_rate = sample_rate
+        self.min_duration = min_duration
+        self.min_level_db = min_level_db          # Nivel mínimo de una trama con voz (dBFS en banda)
+        self.speech_margin_db = speech_margin_db  # Sobre el suelo de ruido, si se conoce
+        self.min_speech_ratio = min_speech_ratio
+        self.min_language_prob = min_language_prob
+        self.min_chars = min_chars
+        self.blacklist = compile_blacklist(blacklist)
+        self._features = EnergyVAD(sample_rate)
+
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0     # Decodificaciones evitadas
+        self.rejected = 0    # Decodificadas pero descartadas después
+        self.reasons = Counter()
+
+    def check(self, audio, noise_floor_db=None):
+        """Motivo para no decodificar `audio`, o None si merece pasar por Whisper."""
+        audio = np.asarray(audio, dtype=np.float32)
+        reason = None
+        frame = self._features.frame_samples
+        count = len(audio) // frame
+        if len(audio) < self.min_duration * self.sample_rate or count == 0:
+            reason = "corta"
+        else:
+            db, _ = self._features.features(audio[:count * frame].reshape(count, frame))
+            threshold = self.min_level_db
+            if noise_floor_db is not None:
+                threshold = max(threshold, noise_floor_db + self.speech_margin_db)
+            voiced = np.count_nonzero(db > threshold)
+            if voiced == 0:
+                reason = "sin voz"
+            elif voiced / count < self.min_speech_ratio:
+                reason = "poca voz"
+        with self._lock:
+            self.checked += 1
+            if reason is not None:
+                self.skipped += 1
+                self.reasons[reason] += 1
+        return reason
+
+    def keep_segment(self, segment):
+        """Regla de Whisper para segmentos sin voz más la de texto repetido."""
+        if segment.no_speech_prob > NO_SPEECH_THRESHOLD and segment.avg_logprob < LOGPROB_THRESHOLD:
+            return False
+        return segment.compression_ratio <= COMPRESSION_RATIO_THRESHOLD
+
+    def text(self, segments, info=None):
+        """Texto de los segmentos de faster-whisper que pasan el filtro ("" si ninguno)."""
+        kept, dropped = [], 0
+        for segment in segments:
+            if self.keep_segment(segment):
+                kept.append(segment.text)
+            else:
+                dropped += 1
+        if dropped:
+            with self._lock:
+                self.reasons["segmento sin voz"] += dropped
+        return self.accept(" ".join(kept).strip(), info)
+
+    def accept(self, text, info=None):
+        """`text` si es una frase válida; "" si hay que ignorarla."""
+        reason = self.reject_reason(text, info)
+        if reason is None:
+            return text
+        with self._lock:
+            self.rejected += 1
+            self.reasons[reason] += 1
+        if text:
+            logger.info(f"Whisper ignorado ({reason}): {text}")
+        return ""
+
+    def reject_reason(self, text, info=None):
+        if info is not None and info.language_probability < self.min_language_prob:
+            return "idioma"
+        if len(text) < self.min_chars:
+            return "texto corto"
+        if compression_ratio(text) > COMPRESSION_RATIO_THRESHOLD:
+            return "repetición"
+        if self.blacklist is not None and self.blacklist.search(normalize(text)):
+            return "alucinación"
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "decodes_avoided": self.skipped,
+                "rejected_after_decode": self.rejected,
+                "reasons": dict(self.reasons),
+            }
@@ -0,0 +1,146 @@
+"""Trazas de bajo coste en formato Chrome trace-event y monitor del event loop.
+
+`TraceBuffer` guarda eventos como tuplas en un anillo acotado (memoria fija,
+apto para dejarlo activo) y solo genera JSON al exportar; el fichero se abre
+en chrome://tracing o https://ui.perfetto.dev.
+
+`LoopLagMonitor` mide el retraso del event loop con un latido cada
+`interval` segundos. Un hilo vigía comprueba el latido: si lleva más de
+`threshold` sin llegar, captura la pila del hilo del loop en ese momento, es
+decir, el callback que lo está bloqueando, y al volver el latido lo registra
+como evento "bloqueo" con esa pila.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TraceBuffer:
+    def __init__(self, max_events=100000):
+        self._events = deque(maxlen=max_events)
+        self._origin = time.perf_counter()
+        self._tids = {}
+
+    def _tid(self, name):
+        tid = self._tids.get(name)
+        if tid is None:
+            tid = self._tids[name] = len(self._tids) + 1
+        return tid
+
+    def complete(self, name, cat, thread, start, end, args=None):
+        """Tramo [start, end] (perf_counter) en la fila `thread`."""
+        self._events.append(("X", name, cat, self._tid(thread), start, end - start, args))
+
+    def counter(self, name, value, at=None):
+        self._events.append(("C", name, "counter", 0, time.perf_counter() if at is None else at, value, None))
+
+    def __len__(self):
+        return len(self._events)
+
+    def events(self):
+        """Eventos en el formato de Chrome (tiempos en µs desde la creación)."""
+        out = [{"ph": "M", "name": "thread_name", "pid": 1, "tid": tid, "args": {"name": name}}
+               for name, tid in self._tids.items()]
+        for ph, name, cat, tid, at, value, args in list(self._events):
+            event = {"ph": ph, "name": name, "cat": cat, "pid": 1, "tid": tid,
+                     "ts": round((at - self._origin) * 1e6, 1)}
+            if ph == "X":
+                event["dur"] = round(value * 1e6, 1)
+                if args:
+                    event["args"] = args
+            else:
+                event["args"] = {name: round(value, 3)}
+            out.append(event)
+        return out
+
+    def export(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, f)
+        os.replace(tmp, path)
+        return path
+
+
+class LoopLagMonitor:
+    def __init__(self, trace=None, interval=0.01, threshold=0.05, stack_depth=8, window=6000):
+        self.trace = trace
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_depth = stack_depth
+        self.stalls = deque(maxlen=100)   # (ms, pila) de los últimos bloqueos
+        self._lags = deque(maxlen=window)
+        self._beat = time.perf_counter()
+        self._stack = None
+        self._task = None
+        self._watchdog = None
+        self._running = False
+        self._thread_id = None
+
+    def start(self):
+        """Arranca el latido en el loop actual y el hilo vigía."""
+        self._thread_id = threading.get_ident()
+        self._running = True
+        self._beat = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            self._beat = now
+            self._lags.append(lag)
+            if self.trace is not None and lag >= 0.001:
+                self.trace.counter("loop_lag_ms", lag * 1000, at=now)
+            if lag > self.threshold:
+                self._report(expected, now, lag)
+            self._stack = None
+
+    def _report(self, start, end, lag):
+        stack = self._stack or ["(pila no capturada)"]
+        self.stalls.append((round(lag * 1000, 1), stack))
+        if self.trace is not None:
+            self.trace.complete("bloqueo", "loop", "event loop", start, end, {"stack": stack})
+        logger.warning(f"Event loop bloqueado {lag * 1000:.0f} ms en {stack[-1]}")
+
+    def _watch(self):
+        while self._running:
+            time.sleep(self.threshold / 2)
+            if self._stack is None and time.perf_counter() - self._beat > self.threshold + self.interval:
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is not None:
+                    self._stack = [f"{os.path.basename(f.filename)}:{f.lineno} {f.name}"
+                                   for f in traceback.extract_stack(frame, limit=self.stack_depth)]
+
+    def summary(self):
+        lags = np.array(list(self._lags)) * 1000
+        if not len(lags):
+            return {"beats": 0, "stalls": len(self.stalls)}
+        return {
+            "beats": len(lags),
+            "p50_ms": round(float(np.percentile(lags, 50)), 2),
+            "p99_ms": round(float(np.percentile(lags, 99)), 2),
+            "max_ms": round(float(lags.max()), 1),
+            "stalls": len(self.stalls),
+        }
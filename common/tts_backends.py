@@ -0,0 +1,124 @@
+"""Backends de síntesis de Kokoro con la misma interfaz de streaming.
+
+`stream(text, voice, speed)` itera trozos de PCM float32 a `sample_rate`
+(24 kHz), igual que el generador de `KPipeline` pero sin grafemas ni
+fonemas. Speaker, LocalKokoroService y SharedTTS solo dependen de esto.
+
+- `KPipelineBackend`: la implementación de siempre con PyTorch.
+- `OnnxKokoroBackend`: ONNX Runtime con `kokoro-v1.0.onnx` y `voices.bin`
+  del almacén de modelos (common/model_store.py, los descarga setup_ia.py).
+  No importa torch: arranca antes y ocupa bastante menos memoria en nodos
+  solo CPU.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+
+KOKORO_SR = 24000
+ONNX_MODEL = "kokoro-v1.0.onnx"
+ONNX_VOICES = "voices.bin"
+
+# El modelo ONNX se invoca frase a frase: el primer audio no espera al texto entero
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+
+_voices = {}
+_voices_lock = threading.Lock()
+
+
+def kokoro_files():
+    """Rutas (modelo, voces) del artefacto "kokoro", descargándolo si falta."""
+    from common.model_store import ModelStore
+
+    path = ModelStore().ensure("kokoro")
+    return os.path.join(path, ONNX_MODEL), os.path.join(path, ONNX_VOICES)
+
+
+def load_voices(path):
+    """Vectores de estilo de todas las voces, leídos una sola vez por proceso.
+
+    voices.bin es un npz: sin esto cada acceso a una voz la descomprime de nuevo.
+    """
+    path = os.path.abspath(path)
+    with _voices_lock:
+        if path not in _voices:
+            with np.load(path) as data:
+                _voices[path] = {name: data[name] for name in data.files}
+        return _voices[path]
+
+
+def quantized_model(model_path):
+    """Ruta de la versión int8 del modelo; se genera la primera vez (pesos dinámicos)."""
+    root, ext = os.path.splitext(model_path)
+    target = f"{root}.int8{ext}"
+    if not os.path.exists(target):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp = f"{root}.int8.tmp{ext}"
+        quantize_dynamic(model_path, tmp, weight_type=QuantType.QUInt8)
+        os.replace(tmp, target)
+    return target
+
+
+class KPipelineBackend:
+    name = "torch"
+    sample_rate = KOKORO_SR
+
+    def __init__(self, lang_code="es"):
+        from kokoro import KPipeline
+
+        self.pipeline = KPipeline(lang_code=lang_code)
+
+    def stream(self, text, voice, speed):
+        for _, _, audio in self.pipeline(text, voice=voice, speed=speed):
+            yield np.asarray(audio, dtype=np.float32)
+
+
+class OnnxKokoroBackend:
+    name = "onnx"
+    sample_rate = KOKORO_SR
+
+    def __init__(self, model_path=None, voices_path=None, lang="es",
+                 quantized=False, threads=None, providers=None):
+        import onnxruntime as ort
+        from kokoro_onnx import Kokoro
+
+        if model_path is None or voices_path is None:
+            default_model, default_voices = kokoro_files()
+            model_path = model_path or default_model
+            voices_path = voices_path or default_voices
+        self.model_path = quantized_model(model_path) if quantized else model_path
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # El grafo es casi secuencial: el paralelismo útil está dentro de cada operador.
+        # Por defecto la mitad de los núcleos lógicos, el resto queda para Whisper
+        options.inter_op_num_threads = 1
+        options.intra_op_num_threads = threads or max(1, (os.cpu_count() or 2) // 2)
+        # Sin espera activa entre frases: los hilos no compiten con el STT
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        session = ort.InferenceSession(self.model_path, options,
+                                       providers=providers or ["CPUExecutionProvider"])
+        self.kokoro = Kokoro.from_session(session, voices_path)
+        self.voices = load_voices(voices_path)
+        self.lang = lang
+
+    def stream(self, text, voice, speed):
+        style = self.voices[voice]
+        for sentence in _SENTENCE_END.split(text.strip()):
+            if not sentence:
+                continue
+            audio, _ = self.kokoro.create(sentence, voice=style, speed=speed, lang=self.lang)
+            yield np.asarray(audio, dtype=np.float32)
+
+
+BACKENDS = {"torch": KPipelineBackend, "onnx": OnnxKokoroBackend}
+
+
+def create_backend(name="torch", **kwargs):
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Backend de TTS desconocido: {name} (opciones: {', '.join(BACKENDS)})")
+    return backend(**kwargs)
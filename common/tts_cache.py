@@ -0,0 +1,208 @@
+"""Caché de audio sintetizado para frases que se repiten (despedidas, respuestas cortas).
+
+La clave es (texto normalizado, voz, velocidad, sample rate de salida) y el
+valor es el PCM final float32, listo para el dispositivo. Hay un nivel en
+memoria (LRU acotado por bytes) y otro opcional en disco con PCM crudo que
+se abre con memmap, así que sobrevive a reinicios sin coste de carga.
+
+Al disco no va todo: solo las frases precargadas, las cortas (hasta
+`disk_max_chars`) y las que se han pedido `disk_min_seen` veces. El
+directorio tiene un presupuesto de `disk_max_bytes`; al pasarse se borran
+los ficheros con mtime más antiguo (cada acierto en disco lo renueva).
+"""
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Normaliza unicode y espacios. Mayúsculas y puntuación se conservan
+    porque cambian la entonación de Kokoro."""
+    return _SPACES.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class TTSCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, max_entry_bytes=None,
+                 disk_max_bytes=256 * 1024 * 1024, disk_max_chars=40, disk_min_seen=2, max_seen=4096):
+        self.max_bytes = max_bytes
+        # Por defecto no se guardan respuestas largas que no se van a repetir
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 8
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_max_chars = disk_max_chars
+        self.disk_min_seen = disk_min_seen
+        self.max_seen = max_seen
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._seen = OrderedDict()  # clave -> veces pedida (acotado a max_seen)
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_writes = 0
+        self.disk_evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_files())
+
+    def key(self, text, voice, speed, sample_rate):
+        return (normalize_text(text), voice, float(speed), int(sample_rate))
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.f32")
+
+    def get(self, text, voice, speed, sample_rate):
+        """Devuelve el PCM cacheado o None."""
+        key = self.key(text, voice, speed, sample_rate)
+        seen = self._see(key)
+        audio = self._lookup(key, count=True)
+        if audio is not None and seen == self.disk_min_seen and not isinstance(audio, np.memmap):
+            # Se repite: pasa a disco para sobrevivir al reinicio
+            self._persist(key, audio)
+        return audio
+
+    def peek(self, text, voice, speed, sample_rate):
+        """Como `get`, pero sin contar en las estadísticas (precarga)."""
+        return self._lookup(self.key(text, voice, speed, sample_rate), count=False)
+
+    def _lookup(self, key, count):
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += count
+                return audio
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                audio = np.memmap(path, dtype=np.float32, mode="r")
+                try:
+                    os.utime(path)  # LRU por mtime: lo usado no se desaloja
+                except OSError:
+                    pass
+                with self._lock:
+                    self.disk_hits += count
+                    self._insert(key, audio)
+                return audio
+
+        with self._lock:
+            self.misses += count
+        return None
+
+    def put(self, text, voice, speed, sample_rate, audio, persist=False):
+        """Guarda el PCM en memoria y, si lo merece (`persist`, frase corta o
+        repetida), en disco."""
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        if audio.nbytes == 0 or audio.nbytes > self.max_entry_bytes:
+            return
+        key = self.key(text, voice, speed, sample_rate)
+        audio.setflags(write=False)
+        with self._lock:
+            self._insert(key, audio)
+            seen = self._seen.get(key, 0)
+        if persist or len(key[0]) <= self.disk_max_chars or seen >= self.disk_min_seen:
+            self._persist(key, audio)
+
+    def _see(self, key):
+        with self._lock:
+            seen = self._seen.pop(key, 0) + 1
+            self._seen[key] = seen
+            if len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+            return seen
+
+    def _persist(self, key, audio):
+        if not self.disk_dir or audio.nbytes > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        with self._disk_lock:
+            if os.path.exists(path):
+                return
+            try:
+                # Escritura atómica: nunca queda un fichero a medias en la caché
+                tmp = f"{path}.{os.getpid()}.tmp"
+                audio.tofile(tmp)
+                os.replace(tmp, path)
+            except OSError:
+                return
+            self._disk_bytes += audio.nbytes
+            self.disk_writes += 1
+            if self._disk_bytes > self.disk_max_bytes:
+                self._trim_disk()
+
+    def _disk_files(self):
+        files = []
+        with os.scandir(self.disk_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".f32"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, entry.path, st.st_size))
+        return files
+
+    def _trim_disk(self):
+        """Borra los ficheros menos usados hasta quedar en el 90 % del presupuesto
+        (un margen para no recorrer el directorio en cada escritura)."""
+        files = sorted(self._disk_files())
+        self._disk_bytes = sum(size for _, _, size in files)
+        target = self.disk_max_bytes * 0.9
+        for _, path, size in files:
+            if self._disk_bytes <= target:
+                break
+            try:
+                # Un memmap abierto sobre el fichero sigue siendo válido en POSIX
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+            self.disk_evictions += 1
+
+    def _insert(self, key, audio):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[key] = audio
+        self._bytes += audio.nbytes
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def prewarm(self, phrases, voice, speed, sample_rate, synthesize):
+        """Sintetiza con `synthesize(text)` las frases que aún no están en caché."""
+        for text in phrases:
+            if self.peek(text, voice, speed, sample_rate) is None:
+                self.put(text, voice, speed, sample_rate, synthesize(text), persist=True)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_bytes": self._disk_bytes,
+                "disk_writes": self.disk_writes,
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,178 @@
+"""Latencias por turno del bucle de voz.
+
+`TurnTimer` guarda instantes (time.perf_counter) de cada hito del turno y
+calcula las duraciones entre ellos. `TurnMetrics` escribe cada turno como
+una línea JSONL y mantiene ventanas deslizantes con las que reescribe un
+fichero de texto en formato Prometheus (p50/p95/p99), apto para el
+textfile collector de node_exporter.
+
+`record` no toca el disco: agrega en memoria y encola la línea; un hilo la
+añade al JSONL y reescribe el .prom como mucho cada `prom_interval`
+segundos (el collector no lo lee más a menudo).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Duración -> (hito inicial, hito final)
+STAGES = {
+    "endpointing_s": ("last_voice", "speech_end"),     # silencio hasta cortar la frase
+    "stt_s": ("speech_end", "transcript"),
+    "llm_ttft_s": ("transcript", "first_token"),
+    "tts_first_audio_s": ("first_token", "first_audio"),
+    "response_s": ("speech_end", "first_audio"),        # lo que percibe el usuario
+    "turn_s": ("speech_end", "end"),
+    "utterance_s": ("speech_start", "last_voice"),
+}
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class TurnTimer:
+    def __init__(self):
+        self.marks = {}
+        self.values = {}
+
+    def mark(self, name, at=None):
+        """Registra un hito; `at` permite pasar un instante medido en otro hilo."""
+        if at is not None or name not in self.marks:
+            self.marks[name] = at if at is not None else time.perf_counter()
+
+    def set(self, name, value):
+        self.values[name] = value
+
+    def breakdown(self):
+        result = {}
+        for stage, (begin, end) in STAGES.items():
+            if begin in self.marks and end in self.marks and self.marks[end] >= self.marks[begin]:
+                result[stage] = round(self.marks[end] - self.marks[begin], 4)
+        result.update(self.values)
+        return result
+
+
+class TurnMetrics:
+    def __init__(self, jsonl_path=None, prom_path=None, window=500, prefix="voice_agent", prom_interval=5.0):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.prefix = prefix
+        self.prom_interval = prom_interval
+        for path in (jsonl_path, prom_path):
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._window = window
+        self._samples = {}
+        self._sums = {}
+        self._counts = {}
+        self.turns = 0
+        self._lock = threading.Lock()
+
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        if jsonl_path or prom_path:
+            self._thread = threading.Thread(target=self._run, name="turn-metrics", daemon=True)
+            self._thread.start()
+            # Lo pendiente se escribe también si el proceso sale sin close()
+            atexit.register(self.close)
+
+    def record(self, turn):
+        """Añade un turno (TurnTimer o dict de valores); la exportación la hace
+        el hilo de escritura."""
+        values = turn.breakdown() if isinstance(turn, TurnTimer) else dict(turn)
+        with self._lock:
+            self.turns += 1
+            entry = {"ts": round(time.time(), 3), "turn": self.turns, **values}
+            for name, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                self._samples.setdefault(name, deque(maxlen=self._window)).append(value)
+                self._sums[name] = self._sums.get(name, 0.0) + value
+                self._counts[name] = self._counts.get(name, 0) + 1
+
+        if self._thread is not None:
+            self._queue.put(entry)
+        return entry
+
+    def close(self, timeout=5.0):
+        """Escribe los turnos pendientes y el .prom final."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        stop = False
+        dirty = False
+        last_prom = None
+        while not stop:
+            # Con cambios sin exportar, se despierta cuando toca reescribir el .prom
+            timeout = None
+            if dirty and last_prom is not None:
+                timeout = max(0.0, last_prom + self.prom_interval - time.monotonic())
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if any(entry is _STOP for entry in batch):
+                stop = True
+                batch = [entry for entry in batch if entry is not _STOP]
+            try:
+                if batch and self.jsonl_path:
+                    with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                        f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch))
+                dirty |= bool(batch)
+                due = last_prom is None or time.monotonic() - last_prom >= self.prom_interval
+                if self.prom_path and dirty and (stop or due):
+                    self._write_prometheus()
+                    last_prom = time.monotonic()
+                    dirty = False
+            except Exception as e:
+                logger.error(f"Métricas de turno: {e}")
+
+    def summary(self):
+        """{métrica: {p50, p95, p99, count}} sobre la ventana deslizante."""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        result = {}
+        for name, values in samples.items():
+            percentiles = np.percentile(values, [q * 100 for q in QUANTILES])
+            result[name] = {f"p{int(q * 100)}": round(float(p), 4) for q, p in zip(QUANTILES, percentiles)}
+            result[name]["count"] = len(values)
+        return result
+
+    def prometheus_text(self):
+        summary = self.summary()
+        lines = []
+        for name in sorted(summary):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                lines.append(f'{metric}{{quantile="{q}"}} {summary[name][f"p{int(q * 100)}"]}')
+            with self._lock:
+                lines.append(f"{metric}_sum {round(self._sums[name], 4)}")
+                lines.append(f"{metric}_count {self._counts[name]}")
+        lines.append(f"# TYPE {self.prefix}_turns_total counter")
+        lines.append(f"{self.prefix}_turns_total {self.turns}")
+        return "\n".join(lines) + "\n"
+
+    def _write_prometheus(self):
+        # Escritura atómica: el collector nunca lee un fichero a medias
+        tmp = f"{self.prom_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, self.prom_path)
@@ -0,0 +1,270 @@
+"""Detección de voz por tramas fijas y fin de frase con tiempos adaptativos.
+
+Dos detectores con la misma interfaz, `probs(frames)`: recibe un array
+(n, frame_samples) y devuelve n probabilidades de voz.
+
+- `EnergyVAD`: sin dependencias. Compara la energía de cada trama en la
+  banda de voz con un suelo de ruido que se adapta (baja deprisa, sube
+  despacio), así un zumbido de red o un ventilador no mantienen el turno
+  abierto.
+- `SileroVAD`: el modelo ONNX de Silero (v5), más robusto con ruido; el
+  fichero sale del almacén de modelos.
+
+`Endpointer` trocea el audio en tramas, aplica el detector y decide inicio
+y fin de frase con histéresis: hace falta `min_speech` de voz para abrir
+(los golpes y chasquidos no disparan) y el silencio para cerrar depende de
+lo que dure la frase: corto para "sí" / "vale", más largo cuando el usuario
+está explicando algo y hace pausas. Antes del cierre avisa de la pausa
+("pause" / "resume") para quien quiera adelantarse (respuesta especulativa).
+"""
+from collections import deque
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+class EnergyVAD:
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=20, margin_db=9.0, min_db=-60.0,
+                 band=(250.0, 4000.0)):
+        self.sample_rate = sample_rate
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.min_db = min_db
+        freqs = np.fft.rfftfreq(self.frame_samples, 1 / sample_rate)
+        self._band = (freqs >= band[0]) & (freqs <= band[1])
+        self._window = np.hanning(self.frame_samples).astype(np.float32)
+        self.noise_floor_db = None
+
+    def features(self, frames):
+        """(energía en la banda de voz en dBFS, fracción de la energía en esa banda) por trama.
+
+        Solo cuenta la banda de voz: un zumbido de 50/100 Hz no sube el suelo de ruido.
+        """
+        frames = np.asarray(frames, dtype=np.float32)
+        energy = np.mean(frames * frames, axis=1)
+        spectrum = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2
+        ratio = spectrum[:, self._band].sum(axis=1) / (spectrum.sum(axis=1) + 1e-10)
+        db = 10 * np.log10(energy * ratio + 1e-10)
+        return db, ratio
+
+    def probs(self, frames):
+        db, _ = self.features(frames)
+        if self.noise_floor_db is None:
+            # El micrófono se abre antes de que hable nadie: la primera trama es ruido
+            self.noise_floor_db = float(db[0]) if len(db) else None
+        # El suelo es una recurrencia (cada trama depende de la anterior): se
+        # recorre con floats de Python y lo demás va vectorizado
+        floors = np.empty(len(db), dtype=np.float32)
+        floor = self.noise_floor_db
+        half = self.margin_db / 2
+        for i, value in enumerate(db.tolist()):
+            floors[i] = floor
+            # Suelo de ruido: baja rápido, sube lento (~1 s cerca del suelo, ~10 s
+            # por encima), así un ruido que se queda acaba siendo el nuevo suelo
+            # pero las sílabas débiles de una frase no lo arrastran
+            if value < floor:
+                alpha = 0.2
+            else:
+                alpha = 0.02 if value - floor < half else 0.002
+            floor += alpha * (value - floor)
+        self.noise_floor_db = floor
+        out = 1.0 / (1.0 + np.exp(-(db - floors - self.margin_db) / 1.5))
+        np.minimum(out, 0.1, out=out, where=db < self.min_db)
+        return out.astype(np.float32, copy=False)
+
+    def reset(self):
+        self.noise_floor_db = None
+
+
+class SileroVAD:
+    """Silero VAD v5 con ONNX Runtime (tramas de 512 muestras a 16 kHz)."""
+
+    CONTEXT = 64
+
+    def __init__(self, model_path=None, threads=1):
+        import onnxruntime as ort
+
+        if model_path is None:
+            from common.model_store import ModelStore
+
+            model_path = ModelStore().path("silero-vad", "silero_vad.onnx")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.sample_rate = SAMPLE_RATE
+        self.frame_samples = 512
+        self._sr = np.array(SAMPLE_RATE, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+        # Entrada preasignada: las últimas 64 muestras de la trama anterior
+        # delante (v5 las espera) y la trama nueva detrás
+        self._input = np.zeros((1, self.CONTEXT + self.frame_samples), dtype=np.float32)
+
+    def probs(self, frames):
+        """Una inferencia por trama; Listener la llama desde su hilo de VAD, no desde el callback."""
+        out = np.empty(len(frames), dtype=np.float32)
+        x = self._input
+        for i, frame in enumerate(np.asarray(frames, dtype=np.float32)):
+            x[0, self.CONTEXT:] = frame
+            prob, self._state = self.session.run(None, {"input": x, "state": self._state, "sr": self._sr})
+            x[0, :self.CONTEXT] = frame[-self.CONTEXT:]
+            out[i] = prob[0][0]
+        return out
+
+
+class Endpointer:
+    """Inicio y fin de frase a partir de las probabilidades por trama.
+
+    `process(block)` acepta bloques de cualquier tamaño y devuelve eventos
+    ("start", muestra) / ("end", muestra) con posiciones absolutas desde el
+    primer bloque. El inicio apunta a la primera trama con voz, no al
+    instante en que se confirma. Tras `pause` segundos de silencio dentro
+    de una frase llega ("pause", fin de la voz); si la voz vuelve antes del
+    cierre, ("resume", muestra).
+    """
+
+    def __init__(self, vad=None, threshold=0.5, strict_threshold=0.85, min_speech=0.12,
+                 onset_gap=0.06, short_utterance=1.0, short_silence=0.35, long_silence=0.7,
+                 pause=0.2):
+        self.vad = vad or EnergyVAD()
+        self.sample_rate = self.vad.sample_rate
+        self.frame_samples = self.vad.frame_samples
+        self.threshold = threshold
+        # Con el altavoz sonando se exige más confianza (eco de la propia voz)
+        self.strict_threshold = strict_threshold
+        # Histéresis: una vez dentro de la frase, basta menos para seguir en ella
+        self.neg_threshold = threshold - 0.15
+        self.min_speech_frames = max(1, round(min_speech * self.sample_rate / self.frame_samples))
+        self.onset_gap_frames = max(1, round(onset_gap * self.sample_rate / self.frame_samples))
+        self.short_utterance = short_utterance
+        self.short_silence = short_silence
+        self.long_silence = long_silence
+        self.pause_frames = max(1, round(pause * self.sample_rate / self.frame_samples))
+
+        self._pending = np.zeros(self.frame_samples, dtype=np.float32)
+        self._pending_len = 0
+        self.position = 0   # Muestras consumidas (tramas completas)
+        self.in_speech = False
+        self.speech_start = None
+        self.last_voice = None  # Fin de la última trama con voz
+        self._onset = None
+        self._onset_frames = 0
+        self._silence_frames = 0
+        self._paused = False
+
+        # Estadísticas
+        self.utterances = 0
+        self.rejected_onsets = 0  # Disparos que no llegaron a min_speech
+        self.endpoint_delays = deque(maxlen=500)
+
+    def process(self, block, strict=False):
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        frames = self._frames(block)
+        if frames is None:
+            return []
+        events = []
+        start_threshold = self.strict_threshold if strict else self.threshold
+        for p in self.vad.probs(frames):
+            end = self.position + self.frame_samples
+            if not self.in_speech:
+                if p >= start_threshold:
+                    if self._onset is None:
+                        self._onset = self.position
+                    self._onset_frames += 1
+                    self._silence_frames = 0
+                    if self._onset_frames >= self.min_speech_frames:
+                        self.in_speech = True
+                        self.speech_start = self._onset
+                        self.last_voice = end
+                        self._silence_frames = 0
+                        events.append(("start", self._onset))
+                elif self._onset is not None:
+                    # Huecos cortos entre sílabas no anulan el arranque; uno largo sí
+                    self._silence_frames += 1
+                    if self._silence_frames > self.onset_gap_frames:
+                        self.rejected_onsets += 1
+                        self._close()
+            elif p >= self.neg_threshold:
+                if self._paused:
+                    self._paused = False
+                    events.append(("resume", self.position))
+                self.last_voice = end
+                self._silence_frames = 0
+            else:
+                self._silence_frames += 1
+                if self._silence_frames == self.pause_frames:
+                    self._paused = True
+                    events.append(("pause", self.last_voice))
+                spoken = (self.last_voice - self.speech_start) / self.sample_rate
+                limit = self.short_silence if spoken < self.short_utterance else self.long_silence
+                if self._silence_frames * self.frame_samples >= limit * self.sample_rate:
+                    events.append(("end", end))
+                    self.endpoint_delays.append((end - self.last_voice) / self.sample_rate)
+                    self.utterances += 1
+                    self._close()
+            self.position = end
+        return events
+
+    def skip_to(self, position):
+        """Salta a la muestra absoluta `position` (el audio intermedio se perdió)."""
+        self.force_end()
+        self._pending_len = 0
+        self.position = position
+        return position
+
+    def force_end(self):
+        """Cierra la frase en curso (p. ej. al llegar a la duración máxima)."""
+        if self.in_speech:
+            self.utterances += 1
+            self._close()
+
+    def _close(self):
+        self.in_speech = False
+        self._onset = None
+        self._onset_frames = 0
+        self._silence_frames = 0
+        self._paused = False
+
+    def _frames(self, block):
+        """Tramas completas del bloque más lo que quedó del anterior."""
+        if self._pending_len == 0 and len(block) and len(block) % self.frame_samples == 0:
+            # Bloque de tramas completas (Listener lee así del ring): vista sin copia
+            return block.reshape(-1, self.frame_samples)
+        n = self._pending_len + len(block)
+        count = n // self.frame_samples
+        if count == 0:
+            self._pending[self._pending_len:n] = block
+            self._pending_len = n
+            return None
+        frames = np.empty((count, self.frame_samples), dtype=np.float32)
+        flat = frames.reshape(-1)
+        flat[:self._pending_len] = self._pending[:self._pending_len]
+        used = count * self.frame_samples - self._pending_len
+        flat[self._pending_len:] = block[:used]
+        rest = len(block) - used
+        self._pending[:rest] = block[used:]
+        self._pending_len = rest
+        return frames
+
+    def stats(self):
+        delays = list(self.endpoint_delays)
+        return {
+            "utterances": self.utterances,
+            "rejected_onsets": self.rejected_onsets,
+            "endpoint_delay_p50_ms": round(float(np.percentile(delays, 50)) * 1000, 1) if delays else None,
+            "endpoint_delay_p95_ms": round(float(np.percentile(delays, 95)) * 1000, 1) if delays else None,
+            "noise_floor_db": round(self.vad.noise_floor_db, 1)
+            if getattr(self.vad, "noise_floor_db", None) is not None else None,
+        }
+
+
+def create_vad(name="energy", **kwargs):
+    if name == "silero":
+        return SileroVAD(**kwargs)
+    if name == "energy":
+        return EnergyVAD(**kwargs)
+    raise ValueError(f"VAD desconocido: {name} (opciones: energy, silero)")
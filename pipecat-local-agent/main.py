@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import os
 import signal
 import sys
 import pyaudio
@@ -7,7 +8,7 @@ import pyaudio
 from pipecat.transports.local.audio import LocalAudioTransport, LocalAudioTransportParams
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
-from pipecat.pipeline.task import PipelineTask
+from pipecat.pipeline.task import PipelineParams, PipelineTask
 from pipecat.frames.frames import StartFrame
 from pipecat.audio.vad.silero import SileroVADAnalyzer
 
@@ -18,129 +19,194 @@ from pipecat.processors.aggregators.llm_response import (
 )
 from pipecat.processors.aggregators.sentence import SentenceAggregator
 
+# Raíz del repo en el path: módulos compartidos con stt-llm-tts (common/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from services.whisper_stt import LocalWhisperService
 from services.gemma_llm import LocalGemmaService
 from services.kokoro_tts import LocalKokoroService
-
-# Clase de contexto simple para evitar dependencias de OpenAI/Frameworks específicos
-class SimpleContext:
-    def __init__(self, messages=None):
-        self.messages = messages or []
-    
-    def add_message(self, message):
-        self.messages.append(message)
-
-    def get_messages(self):
-        return self.messages
-
-    def clear(self):
-        self.messages = []
-
-
-def select_device(p, is_input):
-    """Permite al usuario seleccionar un dispositivo de audio desde la terminal."""
-    type_str = "entrada (Micrófono)" if is_input else "salida (Altavoces)"
-    print(f"\nScanning {type_str} devices...")
-    
-    count = p.get_device_count()
-    devices = []
-    
-    print(f"\n--- DISPOSITIVOS DE {type_str.upper()} DISPONIBLES ---")
-    idx_counter = 1
-    for i in range(count):
-        dev = p.get_device_info_by_index(i)
-        channels = dev['maxInputChannels'] if is_input else dev['maxOutputChannels']
-        if channels > 0:
-            devices.append((i, dev['name']))
-            print(f"{idx_counter}. {dev['name']}")
-            idx_counter += 1
-            
-    if not devices:
-        print(f"Error: No se encontraron dispositivos de {type_str}.")
-        sys.exit(1)
-
-    while True:
-        try:
-            choice = input(f"\nSelecciona el número del dispositivo de {type_str}: ")
-            idx = int(choice) - 1
-            if 0 <= idx < len(devices):
-                selected_id, selected_name = devices[idx]
-                print(f"-> Seleccionado: {selected_name} (ID: {selected_id})")
-                return selected_id
-            print("Número inválido, intenta nuevamente.")
-        except ValueError:
-            print("Por favor ingresa un número válido.")
+from services.session_recorder import TranscriptRecorder
+from services.frame_tracer import FrameTracer
+from common.tts_cache import TTSCache
+from common.tts_backends import KOKORO_SR, create_backend
+from common.startup import Startup, load_whisper
+from common.context import ConversationContext, make_ollama_summarizer
+from common.response_cache import ResponseCache
+from common.audio_rates import Stage, negotiate, pyaudio_rates
+from common.audio_devices import configure
+from common.session_log import SessionRecorder, queue_logging
+from common.tracing import LoopLagMonitor, TraceBuffer
+
+# Frases cortas que se repiten mucho: se sintetizan al arrancar y quedan en caché
+PREWARM_PHRASES = [
+    "Hola, ¿en qué puedo ayudarte?",
+    "De nada.",
+    "Claro.",
+]
+TTS_CACHE_DIR = os.path.expanduser("~/.cache/stt-ollama-tts/tts")
+# "onnx" usa kokoro-v1.0.onnx + voices.bin (setup_ia.py) sin cargar PyTorch
+TTS_BACKEND = "torch"
+OLLAMA_MODEL = "gemma3:12b"
+OLLAMA_KEEP_ALIVE = "30m"
+# Silero y Whisper trabajan a 16 kHz
+STT_SR = 16000
+# Registro de la sesión (JSONL por turnos); SESSION_AUDIO guarda también el PCM de cada frase
+SESSION_DIR = os.path.expanduser("~/.cache/stt-ollama-tts/sessions")
+SESSION_AUDIO = False
+# Traza de frames y del event loop (Chrome trace-event JSON al salir); coste de
+# unos µs por frame y etapa, se puede dejar activa
+TRACE = False
+TRACE_FILE = os.path.expanduser("~/.cache/stt-ollama-tts/trace.json")
+
+def plan_sample_rates(p, mic_id, spk_id):
+    """Frecuencias de entrada y salida con el mínimo de re-muestreos.
+
+    El transporte local no convierte la entrada: si el micrófono no abre a
+    16 kHz, PortAudio/el servidor de audio hace la conversión.
+    """
+    mic = p.get_device_info_by_index(mic_id)
+    spk_sr = int(p.get_device_info_by_index(spk_id)["defaultSampleRate"])
+    plans = {}
+    try:
+        plans["entrada"] = negotiate("entrada", [
+            Stage("micrófono", pyaudio_rates(p, mic_id, is_input=True), native=int(mic["defaultSampleRate"])),
+            Stage("transporte"),
+            Stage("stt", [STT_SR]),
+        ])
+    except ValueError:
+        logging.getLogger(__name__).warning(f"El micrófono no abre a {STT_SR} Hz: convierte el host")
+        plans["entrada"] = negotiate("entrada", [Stage("transporte", [STT_SR]), Stage("stt", [STT_SR])])
+    # El TTS re-muestrea si hace falta: el transporte recibe ya la frecuencia
+    # del altavoz y no convierte por su cuenta
+    plans["salida"] = negotiate("salida", [
+        Stage("kokoro", [KOKORO_SR]),
+        Stage("tts", [KOKORO_SR], resamples=True),
+        Stage("transporte", resamples=True),
+        Stage("altavoz", pyaudio_rates(p, spk_id, is_input=False) or [spk_sr], native=spk_sr),
+    ])
+    return plans
 
 async def main():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('app.log'),
-            logging.StreamHandler()
-        ]
-    )
+    # Fichero y consola escriben desde el hilo de un QueueListener: un log no
+    # detiene el event loop (ni el audio) esperando al disco
+    queue_logging(logging.FileHandler('app.log'), logging.StreamHandler())
     logger = logging.getLogger(__name__)
 
     logger.info("INICIANDO SISTEMA PIPECAT")
 
-    # Selección de dispositivos de audio
+    # Silero, Whisper y Kokoro cargan en hilos mientras se eligen los dispositivos
+    startup = Startup()
+    vad_future = startup.submit("silero", SileroVADAnalyzer)
+    whisper_future = startup.submit("whisper", load_whisper, "medium")
+    tts_future = startup.submit("kokoro", create_backend, TTS_BACKEND)
+
+    # Dispositivos por nombre (common/audio_devices.py): solo se eligen por
+    # terminal la primera vez o si el guardado ya no está conectado
     p = pyaudio.PyAudio()
     try:
-        mic_id = select_device(p, is_input=True)
-        spk_id = select_device(p, is_input=False)
+        audio = startup.run("dispositivos", configure, p=p)
+        mic_id, spk_id = audio.input_index, audio.output_index
+        rate_plans = plan_sample_rates(p, mic_id, spk_id)
     finally:
         p.terminate()
 
     logger.info(f"Configurando audio (Mic: {mic_id}, Spk: {spk_id})...")
+    for plan in rate_plans.values():
+        logger.info(plan.describe())
+    out_sr = rate_plans["salida"].rate("altavoz")
 
     try:
         transport = LocalAudioTransport(
             params=LocalAudioTransportParams(
-                sample_rate=16000,
-                audio_out_sample_rate=44100,
+                sample_rate=STT_SR,
+                audio_out_sample_rate=out_sr,
                 audio_in_enabled=True,
                 audio_out_enabled=True,
                 audio_in_index=mic_id,
                 audio_out_index=spk_id,
-                buffer_size=4096
+                # Bloque calibrado (antes 4096: 256 ms a 16 kHz antes de llegar al VAD)
+                buffer_size=audio.blocksize(STT_SR)
             )
         )
     except Exception as e:
         logger.error(f"ERROR INICIALIZANDO AUDIO: {e}")
         return
 
-    logger.info("Cargando modelos...")
-    vad = SileroVADAnalyzer()
-    stt = LocalWhisperService(vad_analyzer=vad)
-    llm = LocalGemmaService(model="gemma3:12b")
-    tts = LocalKokoroService(voice="af_bella", output_sr=16000)
-    sentence_aggregator = SentenceAggregator()
+    # El pipeline solo encola; un hilo agrupa, escribe, rota y hace fsync
+    session = SessionRecorder(SESSION_DIR, compress=True)
 
-    # Contexto de la conversación con SimpleContext
+    def record_utterance(audio_np, text, stt_s):
+        session.new_turn()
+        session.record("user", text=text, audio_s=round(len(audio_np) / STT_SR, 2), stt_s=stt_s)
+        if SESSION_AUDIO:
+            session.record_audio(audio_np, STT_SR)
+
+    # Solo Silero (cientos de ms) se espera antes de montar el pipeline: el STT lo
+    # necesita al construirse. Whisper y Kokoro entran como Future y el
+    # transporte empieza a capturar mientras terminan de cargar
+    try:
+        vad = await asyncio.wrap_future(vad_future)
+    except Exception as e:
+        logger.error(f"ERROR CARGANDO EL VAD: {e}\n{startup.report()}")
+        return
+    stt = LocalWhisperService(vad_analyzer=vad, incremental=True, model=whisper_future,
+                              on_utterance=record_utterance)
+    # Contexto con presupuesto de tokens: system + resumen + turnos recientes
     messages = [
         {
             "role": "system",
             "content": "Eres un asistente de voz útil y amable. Responde de manera concisa y clara."
         }
     ]
-    context = SimpleContext(messages)
-    
+    context = ConversationContext(messages, max_tokens=2048)
+    llm = LocalGemmaService(model=OLLAMA_MODEL, context=context, keep_alive=OLLAMA_KEEP_ALIVE,
+                            cache=ResponseCache())
+    # El resumidor reutiliza el cliente (y el pool de conexiones) del LLM
+    context.summarizer = make_ollama_summarizer(llm.llm)
+    tts = LocalKokoroService(voice="af_bella", output_sr=rate_plans["salida"].output_rate("tts"), cache=TTSCache(disk_dir=TTS_CACHE_DIR),
+                             backend=tts_future)
+    # Precarga de Gemma y frases fijas del TTS en segundo plano: el primer turno
+    # espera a la precarga (LocalGemmaService.ready) y la primera frase va en el
+    # hilo de Kokoro detrás de las precargadas
+    llm.ready = startup.track("ollama", llm.preload())
+    startup.submit("tts prewarm", tts.prewarm, PREWARM_PHRASES)
+
+    async def report_startup():
+        errors = await startup.wait()
+        if errors:
+            logger.error(f"ERROR CARGANDO MODELOS: {errors[0]}\n{startup.report()}")
+        else:
+            logger.info(f"Modelos listos\n{startup.report()}")
+
+    # Referencia a la tarea: que no la recoja el GC antes de terminar
+    startup_report = asyncio.create_task(report_startup())
+    sentence_aggregator = SentenceAggregator()
+
     user_aggregator = LLMUserContextAggregator(context)
     assistant_aggregator = LLMAssistantContextAggregator(context)
 
-    pipeline = Pipeline([
+    processors = [
         transport.input(),
         stt,
         user_aggregator,
         llm,
         sentence_aggregator,
+        TranscriptRecorder(session, role="assistant"),
         tts,
         transport.output(),
         assistant_aggregator
-    ])
-
-    task = PipelineTask(pipeline)
+    ]
+    # Traza opcional: tiempo por frame y etapa, espera entre etapas y bloqueos del loop
+    tracer = monitor = None
+    if TRACE:
+        trace = TraceBuffer()
+        tracer = FrameTracer(trace)
+        tracer.instrument(processors)
+        monitor = LoopLagMonitor(trace).start()
+    pipeline = Pipeline(processors)
+
+    # Barge-in: al detectar voz del usuario se cancela el LLM y se corta el TTS
+    task = PipelineTask(pipeline, params=PipelineParams(allow_interruptions=True))
     runner = PipelineRunner()
 
     # Iniciar la conversación
@@ -148,14 +214,23 @@ async def main():
 
     async def shutdown(sig, frame):
         logger.info("Apagando agente...")
+        logger.info(f"Filtro STT: {stt.gate.stats()}")
         await task.cancel()
+        session.close()
+        logger.info(f"Registro de sesión: {session.stats()}")
+        if tracer is not None:
+            monitor.stop()
+            logger.info(f"Event loop: {monitor.summary()}")
+            for row in tracer.summary():
+                logger.info(f"Traza: {row}")
+            logger.info(f"Traza guardada en {tracer.trace.export(TRACE_FILE)} (chrome://tracing)")
         sys.exit(0)
 
     loop = asyncio.get_running_loop()
     for sig in (signal.SIGINT, signal.SIGTERM):
         loop.add_signal_handler(sig, lambda: asyncio.create_task(shutdown(sig, None)))
 
-    logger.info("¡SISTEMA LISTO! Habla ahora (Ctrl+C para salir).")
+    logger.info("¡SISTEMA LISTO! Habla ahora (Ctrl+C para salir; el primer turno espera a los modelos que falten).")
 
     try:
         await runner.run(task)
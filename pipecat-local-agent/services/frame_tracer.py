@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+
+from common.tracing import TraceBuffer
+
+
+class FrameTracer:
+    """Traza opcional del pipeline: envuelve `process_frame` y `push_frame` de
+    cada FrameProcessor.
+
+    Por cada frame y procesador registra el tiempo de proceso y la espera
+    desde que el anterior lo empujó hasta que este lo empieza (la cola entre
+    etapas). Los eventos van a un TraceBuffer (common/tracing.py) y los
+    agregados por (procesador, tipo de frame) a `summary()`.
+    """
+
+    def __init__(self, trace=None, max_in_flight=4096):
+        self.trace = trace if trace is not None else TraceBuffer()
+        self._max_in_flight = max_in_flight
+        self._pushed = OrderedDict()  # id del frame -> instante del último push
+        self._stats = {}
+
+    def instrument(self, processors):
+        for processor in processors:
+            self._wrap(processor)
+        return processors
+
+    def _wrap(self, processor):
+        name = getattr(processor, "name", None) or type(processor).__name__
+        process_frame, push_frame = processor.process_frame, processor.push_frame
+        pushed, trace = self._pushed, self.trace
+
+        async def traced_process(frame, direction):
+            start = time.perf_counter()
+            queued_at = pushed.pop(_frame_id(frame), None)
+            try:
+                return await process_frame(frame, direction)
+            finally:
+                end = time.perf_counter()
+                kind = type(frame).__name__
+                trace.complete(kind, "frame", name, start, end)
+                if queued_at is not None:
+                    trace.complete(kind, "cola", f"{name} (cola)", queued_at, start)
+                self._add(name, kind, end - start, None if queued_at is None else start - queued_at)
+
+        async def traced_push(frame, *args, **kwargs):
+            pushed[_frame_id(frame)] = time.perf_counter()
+            if len(pushed) > self._max_in_flight:
+                # Frames que nadie consumió (fin del pipeline): se olvidan los más viejos
+                pushed.popitem(last=False)
+            return await push_frame(frame, *args, **kwargs)
+
+        # Atributos de instancia: pipecat llama a self.process_frame / self.push_frame
+        processor.process_frame = traced_process
+        processor.push_frame = traced_push
+
+    def _add(self, processor, kind, seconds, waited):
+        stats = self._stats.get((processor, kind))
+        if stats is None:
+            stats = self._stats[(processor, kind)] = [0, 0.0, 0.0, 0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+        if waited is not None:
+            stats[3] += 1
+            stats[4] += waited
+            stats[5] = max(stats[5], waited)
+
+    def summary(self, top=10):
+        """Procesador/frame con más tiempo total, con medias y máximos en ms."""
+        rows = []
+        for (processor, kind), (n, total, peak, nw, waited, peak_wait) in self._stats.items():
+            rows.append({
+                "processor": processor, "frame": kind, "count": n,
+                "total_ms": round(total * 1000, 1),
+                "mean_ms": round(total / n * 1000, 3), "max_ms": round(peak * 1000, 1),
+                "queue_mean_ms": round(waited / nw * 1000, 3) if nw else None,
+                "queue_max_ms": round(peak_wait * 1000, 1) if nw else None,
+            })
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows[:top]
+
+
+def _frame_id(frame):
+    return getattr(frame, "id", None) or id(frame)
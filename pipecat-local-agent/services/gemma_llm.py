@@ -1,16 +1,95 @@
+import asyncio
 import logging
 
 from pipecat.services.llm_service import LLMService
 from pipecat.frames.frames import LLMMessagesFrame, TextFrame, LLMFullResponseEndFrame
-from ollama import AsyncClient
+
+try:
+    from pipecat.frames.frames import InterruptionFrame
+except ImportError:  # Versiones de pipecat anteriores al renombrado
+    from pipecat.frames.frames import StartInterruptionFrame as InterruptionFrame
+
+from common.llm_client import OllamaLLM, DEFAULT_KEEP_ALIVE
 
 logger = logging.getLogger(__name__)
 
 class LocalGemmaService(LLMService):
-    def __init__(self, model="gemma3:12b"):
+    def __init__(self, model="gemma3:12b", context=None, profile="voice",
+                 keep_alive=DEFAULT_KEEP_ALIVE, cache=None, host=None):
         super().__init__()
         self._model = model
-        self._client = AsyncClient()
+        self._context = context  # ConversationContext opcional (common/context.py)
+        # host: None usa el Ollama por defecto; los benchmarks pasan uno falso
+        self._llm = OllamaLLM(model, host=host, profile=profile, keep_alive=keep_alive)
+        self._cache = cache  # ResponseCache opcional (common/response_cache.py)
+        self._generation = None
+        # Tarea de precarga lanzada al arrancar: solo la espera el primer turno
+        self.ready = None
+
+    async def _generate(self, messages, query=None):
+        parts = []
+        try:
+            if self.ready is not None:
+                try:
+                    # shield: un barge-in cancela este turno, no la precarga
+                    await asyncio.shield(self.ready)
+                except Exception:
+                    pass  # Sin precarga, Ollama carga el modelo con esta misma petición
+                self.ready = None
+            # Streaming real con el historial completo, no solo el último texto
+            async for chunk in self._llm.chat_stream(messages):
+                content = chunk['message']['content']
+                if content:
+                    parts.append(content)
+                    await self.push_frame(TextFrame(content))
+                if chunk.get('done'):
+                    self._report_usage(chunk)
+
+            # Solo llega aquí si la respuesta no se cortó por barge-in
+            if self._cache is not None and query:
+                self._cache.put(query, "".join(parts))
+            await self.push_frame(LLMFullResponseEndFrame())
+        except asyncio.CancelledError:
+            # Barge-in: al cancelar se cierra la conexión y Ollama deja de generar
+            logger.info("LLM interrumpido por el usuario")
+            raise
+        except Exception as e:
+            logger.error(f"Error LLM: {e}")
+
+    @property
+    def llm(self):
+        return self._llm
+
+    async def preload(self):
+        """Carga el modelo en GPU antes del primer turno."""
+        return await self._llm.preload()
+
+    def _report_usage(self, chunk):
+        """Tokens de prompt y prefill del turno: si el prefijo se reutiliza,
+        Ollama solo evalúa los mensajes nuevos."""
+        if self._context is not None:
+            self._context.record_usage(chunk)
+        else:
+            logger.info(f"Prompt: {chunk.get('prompt_eval_count')} tokens, "
+                        f"prefill {(chunk.get('prompt_eval_duration') or 0) / 1e6:.0f} ms")
+
+    @staticmethod
+    def _last_user_text(messages):
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                return message.get("content")
+        return None
+
+    async def _cancel_generation(self):
+        if self._generation is not None and not self._generation.done():
+            self._generation.cancel()
+            try:
+                await self._generation
+            except asyncio.CancelledError:
+                pass
+        self._generation = None
+        # Tarea de precarga lanzada al arrancar: solo la espera el primer turno
+        self.ready = None
 
     async def process_frame(self, frame, direction):
         await super().process_frame(frame, direction)
@@ -18,18 +97,17 @@ class LocalGemmaService(LLMService):
         # AHORA escuchamos LLMMessagesFrame, no TextFrame
         if isinstance(frame, LLMMessagesFrame):
             logger.info(f"LLM Processing messages: {len(frame.messages)}")
-
-            try:
-                # Streaming real con el historial completo
-                async for chunk in self._client.chat(
-                    model=self._model,
-                    messages=frame.messages, # Pasamos el historial, no solo el último texto
-                    stream=True
-                ):
-                    content = chunk['message']['content']
-                    if content:
-                        await self.push_frame(TextFrame(content))
-
+            # La generación va en su propia tarea para poder cancelarla
+            await self._cancel_generation()
+            messages = self._context.get_messages() if self._context is not None else frame.messages
+            query = self._last_user_text(messages)
+            cached = self._cache.get(query) if self._cache is not None and query else None
+            if cached is not None:
+                logger.info(f"Respuesta desde caché ({self._cache.stats()['hit_rate']} aciertos)")
+                await self.push_frame(TextFrame(cached))
                 await self.push_frame(LLMFullResponseEndFrame())
-            except Exception as e:
-                logger.error(f"Error LLM: {e}")
\ No newline at end of file
+                return
+            self._generation = asyncio.create_task(self._generate(messages, query))
+        elif isinstance(frame, InterruptionFrame):
+            await self._cancel_generation()
+            await self.push_frame(frame, direction)
@@ -1,18 +1,97 @@
+import asyncio
+import contextlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from pipecat.services.tts_service import TTSService
 from pipecat.frames.frames import TextFrame, AudioRawFrame, TTSStartedFrame, TTSStoppedFrame
-from kokoro import KPipeline
 import numpy as np
 
+try:
+    from pipecat.frames.frames import InterruptionFrame
+except ImportError:  # Versiones de pipecat anteriores al renombrado
+    from pipecat.frames.frames import StartInterruptionFrame as InterruptionFrame
+
+from common.pcm import float_to_pcm16
+from common.resampler import StreamingResampler
+from common.startup import resolve
+from common.tts_backends import KPipelineBackend
+
 logger = logging.getLogger(__name__)
 
 class LocalKokoroService(TTSService):
-    def __init__(self, voice="af_bella", output_sr=44100):
+    def __init__(self, voice="af_bella", output_sr=44100, cache=None, backend=None):
         super().__init__()
-        self._pipeline = KPipeline(lang_code='es')
+        # Backend de Kokoro (common/tts_backends.py): PyTorch por defecto, ONNX en CPU.
+        # Puede llegar como Future de Startup: se espera en el hilo de Kokoro, no en el loop
+        self._backend = backend or KPipelineBackend(lang_code='es')
         self._voice = voice
+        self._speed = 1.1
         self._output_sr = output_sr
+        self._cache = cache  # TTSCache opcional (common/tts_cache.py)
+        # Un solo hilo para todo lo que toca el backend: KPipeline no admite dos
+        # síntesis a la vez y, en orden FIFO, una frase nueva espera a que acabe
+        # (y se cierre) la interrumpida
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="kokoro")
+        self._interrupted = asyncio.Event()
+
+    @property
+    def backend(self):
+        self._backend = resolve(self._backend)
+        return self._backend
+
+    def _synthesize_chunks(self, text):
+        """PCM float32 trozo a trozo, ya re-muestreado a output_sr."""
+        # Un resampler por frase: el filtro continúa entre trozos (sin clics)
+        resampler = StreamingResampler(self.backend.sample_rate, self._output_sr)
+        for audio in self.backend.stream(text, self._voice, self._speed):
+            yield resampler.process(audio)
+        tail = resampler.flush()
+        if len(tail):
+            yield tail
+
+    async def _stream_chunks(self, text):
+        """Igual que _synthesize_chunks, pero cada trozo de Kokoro se genera en
+        el hilo de Kokoro: el event loop (y el VAD) siguen vivos durante la
+        síntesis. Un barge-in deja de esperar al trozo en curso al momento."""
+        loop = asyncio.get_running_loop()
+        chunks = self._synthesize_chunks(text)
+        interrupted = asyncio.ensure_future(self._interrupted.wait())
+        try:
+            while True:
+                pending = loop.run_in_executor(self._executor, next, chunks, None)
+                done, _ = await asyncio.wait({pending, interrupted}, return_when=asyncio.FIRST_COMPLETED)
+                if pending not in done:
+                    pending.cancel()  # El trozo termina en su hilo; nadie lo recoge
+                    break
+                chunk = pending.result()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            interrupted.cancel()
+            # El generador se cierra en el hilo de Kokoro, detrás del trozo en curso
+            self._executor.submit(chunks.close)
+
+    def _synthesize(self, text):
+        chunks = list(self._synthesize_chunks(text))
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+
+    def _cached(self, text):
+        if self._cache is None:
+            return None
+        return self._cache.get(text, self._voice, self._speed, self._output_sr)
+
+    def _store(self, text, audio):
+        if self._cache is not None:
+            self._cache.put(text, self._voice, self._speed, self._output_sr, audio)
+
+    def prewarm(self, phrases):
+        """Sintetiza y cachea frases fijas al arrancar (bloqueante: usar en executor)."""
+        if self._cache is not None:
+            self._executor.submit(self._cache.prewarm, phrases, self._voice, self._speed,
+                                  self._output_sr, self._synthesize).result()
+            logger.info(f"TTS cache precargada: {self._cache.stats()}")
 
     # --- MÉTODO OBLIGATORIO POR LA CLASE PADRE (TTSService) ---
     async def run_tts(self, text: str) -> bytes:
@@ -21,48 +100,54 @@ class LocalKokoroService(TTSService):
         Nota: En process_frame usamos streaming, pero debemos tener este definido.
         """
         # Esta implementación es básica y no hace streaming, solo cumple el contrato.
-        generator = self._pipeline(text, voice=self._voice, speed=1.1)
-        audio_list = []
-        for _, _, audio in generator:
-            audio_list.append(audio)
-            
-        if not audio_list:
+        resampled = self._cached(text)
+        if resampled is None:
+            resampled = await asyncio.get_running_loop().run_in_executor(self._executor, self._synthesize, text)
+            self._store(text, resampled)
+
+        if not len(resampled):
             return b""
-            
-        full_audio = np.concatenate(audio_list)
-        
-        # Resample simple
-        num_samples = int(len(full_audio) * self._output_sr / 24000)
-        resampled = np.interp(
-            np.linspace(0, len(full_audio), num_samples),
-            np.arange(len(full_audio)),
-            full_audio
-        ).astype(np.float32)
-        
-        return (resampled * 32767).astype(np.int16).tobytes()
+
+        return bytes(float_to_pcm16(resampled))
 
     async def process_frame(self, frame, direction):
         await super().process_frame(frame, direction)
 
+        if isinstance(frame, InterruptionFrame):
+            # Barge-in: la frase en curso deja de generarse; pipecat ya descarta
+            # los TextFrame encolados y el transporte vacía su buffer de salida
+            self._interrupted.set()
+            await self.push_frame(frame, direction)
+            return
+
         if isinstance(frame, TextFrame):
+            self._interrupted.clear()
             await self.push_frame(TTSStartedFrame())
 
             try:
-                # Generación con streaming (Lo que realmente usamos)
-                generator = self._pipeline(frame.text, voice=self._voice, speed=1.1)
-
-                for _, _, audio in generator:
-                    # RE-MUESTREO: 24kHz -> 44.1kHz
-                    num_samples = int(len(audio) * self._output_sr / 24000)
-                    resampled = np.interp(
-                        np.linspace(0, len(audio), num_samples),
-                        np.arange(len(audio)),
-                        audio
-                    ).astype(np.float32)
-
-                    audio_bytes = (resampled * 32767).astype(np.int16).tobytes()
-                    await self.push_frame(AudioRawFrame(audio_bytes, self._output_sr, 1))
+                cached = self._cached(frame.text)
+                if cached is not None:
+                    # PCM16 escrito directamente en el payload del frame (sin temporales)
+                    await self.push_frame(AudioRawFrame(float_to_pcm16(cached), self._output_sr, 1))
+                else:
+                    # Generación con streaming (Lo que realmente usamos)
+                    pieces = [] if self._cache is not None else None
+                    size = 0
+                    # aclosing: al cortar el bucle el generador se cierra ya, no al recolectarlo
+                    async with contextlib.aclosing(self._stream_chunks(frame.text)) as stream:
+                        async for resampled in stream:
+                            if self._interrupted.is_set():
+                                break
+                            if pieces is not None:
+                                pieces.append(resampled)
+                                size += resampled.nbytes
+                                if size > self._cache.max_entry_bytes:
+                                    pieces = None  # Demasiado largo para cachear
+                            await self.push_frame(AudioRawFrame(float_to_pcm16(resampled), self._output_sr, 1))
+                    # Interrumpida (aquí o dentro de _stream_chunks): no se cachea a medias
+                    if pieces and not self._interrupted.is_set():
+                        self._store(frame.text, np.concatenate(pieces))
             except Exception as e:
                 logger.error(f"TTS Error: {e}")
 
-            await self.push_frame(TTSStoppedFrame())
\ No newline at end of file
+            await self.push_frame(TTSStoppedFrame())
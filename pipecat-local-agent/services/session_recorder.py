@@ -0,0 +1,28 @@
+from pipecat.frames.frames import InterimTranscriptionFrame, TextFrame
+from pipecat.processors.frame_processor import FrameProcessor
+
+
+class TranscriptRecorder(FrameProcessor):
+    """Encola en un SessionRecorder (common/session_log.py) los textos que
+    pasan por el pipeline; el disco lo toca el hilo del recorder."""
+
+    def __init__(self, recorder, role="user", echo=False):
+        super().__init__()
+        self._recorder = recorder
+        self._role = role
+        self._echo = echo
+
+    async def process_frame(self, frame, direction):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, TextFrame) and not isinstance(frame, InterimTranscriptionFrame):
+            if self._role == "user":
+                # Cada frase del usuario abre un turno; las respuestas lo heredan
+                self._recorder.new_turn()
+                self._recorder.record(self._role, text=frame.text)
+            else:
+                self._recorder.record(self._role, text=frame.text, since_turn_s=self._recorder.since_turn())
+            if self._echo:
+                print(f"📝 Detectado: {frame.text}")
+
+        await self.push_frame(frame, direction)
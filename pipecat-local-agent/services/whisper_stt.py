@@ -1,19 +1,68 @@
 import logging
 import functools
+import time
+from collections import deque
+from concurrent.futures import Future
 
 from pipecat.services.stt_service import STTService
-from pipecat.frames.frames import TextFrame
-from faster_whisper import WhisperModel
-import numpy as np
+from pipecat.frames.frames import (
+    TextFrame,
+    InputAudioRawFrame,
+    InterimTranscriptionFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.utils.time import time_now_iso8601
 import asyncio
 
+from common.incremental_stt import IncrementalTranscriber
+from common.pcm import PcmAccumulator, pcm16_to_float
+from common.startup import load_whisper
+from common.stt_gate import SpeechGate
+
 logger = logging.getLogger(__name__)
 
 class LocalWhisperService(STTService):
-    def __init__(self, vad_analyzer=None):
+    def __init__(self, vad_analyzer=None, incremental=False, engine=None, model=None, gate=None,
+                 on_utterance=None):
         super().__init__(vad_analyzer=vad_analyzer)
-        # Optimizamos para RTX 5060 (16GB)
-        self._model = WhisperModel("medium", device="cuda", compute_type="float16")
+        # on_utterance(audio, text, stt_s): p. ej. encolar la frase en un SessionRecorder
+        self.on_utterance = on_utterance
+        # Filtro antes/después de Whisper compartido con stt-llm-tts (common/stt_gate.py)
+        self.gate = gate or SpeechGate()
+        # BatchedWhisper opcional (common/batched_stt.py), compartido entre pipelines:
+        # reutiliza su modelo en lugar de cargar otra copia
+        self._engine = engine
+        if engine is not None:
+            self._model = engine.model
+        elif model is not None:
+            # Cargado de antemano o aún cargándose (Future de common/startup.py):
+            # el pipeline arranca sin esperarlo y solo la primera frase lo espera
+            self._model = model
+        else:
+            # Optimizamos para RTX 5060 (16GB)
+            self._model = load_whisper("medium", device="cuda", compute_type="float16")
+
+        # Modo incremental: se transcribe durante la frase y al final solo la cola.
+        # Hasta que Whisper esté cargado se transcribe la frase entera al final
+        self._incremental_enabled = incremental
+        self._incremental = None
+        self._model_ready()
+        self._speaking = False
+        # La frase se acumula ya en float32: las parciales la leen sin copiarla
+        self._speech = PcmAccumulator()
+        self._preroll = deque(maxlen=3)  # Frames previos al aviso del VAD
+        self._update_task = None
+
+    def _model_ready(self):
+        """True si Whisper ya está cargado (sin bloquear); crea entonces el incremental."""
+        if isinstance(self._model, Future):
+            if not self._model.done() or self._model.exception() is not None:
+                return False
+            self._model = self._model.result()
+        if self._incremental_enabled and self._incremental is None:
+            self._incremental = IncrementalTranscriber(self._model, gate=self.gate)
+        return True
 
     async def run_stt(self, audio: bytes):
         """
@@ -22,55 +71,93 @@ class LocalWhisperService(STTService):
         """
         if not audio:
             return
+        if isinstance(self._model, Future):
+            # Primera frase durante la carga: se espera a Whisper sin bloquear el loop
+            try:
+                await asyncio.wrap_future(self._model)
+            except Exception as e:
+                logger.error(f"Whisper no se pudo cargar: {e}")
+                return
+            self._model_ready()
 
-        # Conversión a float32 normalizado (requerido por Faster-Whisper)
-        audio_np = np.frombuffer(audio, dtype=np.int16).astype(np.float32) / 32768.0
-
-        # Transcripción (bloqueante en GPU, idealmente iría en un thread aparte, pero funciona rápido en 5060)
-        transcribe_func = functools.partial(self._model.transcribe, vad_filter=True)
-        segments, info = await asyncio.get_event_loop().run_in_executor(None, transcribe_func, audio_np, "es")
-        text = " ".join([s.text for s in segments]).strip()
-
-        # Filtros anti-alucinación (mismos parámetros que stt-llm-tts)
-        if info.language_probability < 0.5:
-            if text:
-                logger.info(f"Whisper ignorado (Baja prob {info.language_probability:.2f}): {text}")
-            return
-
-        # Lista negra de alucinaciones comunes de Whisper en silencio
-        HALLUCINATIONS = [
-            "subtítulos por la comunidad de amara.org",
-            "¡gracias por ver el vídeo!",
-            "gracias por ver el video",
-            "suscríbete",
-            "¡suscríbete!",
-            "amara.org",
-            "subtítulos realizados por",
-            "transcripción realizada por"
-        ]
-
-        text_lower = text.lower()
-        if any(h in text_lower for h in HALLUCINATIONS):
-             logger.info(f"Whisper ignorado (Alucinación conocida): {text}")
-             return
-
-        if len(text) < 3:
-             if text:
-                 logger.info(f"Whisper ignorado (Muy corto): {text}")
-             return
-
+        start = time.perf_counter()
+        if self._incremental is not None and self._speech:
+            # El prefijo ya se confirmó mientras el usuario hablaba
+            audio_np = self._speech.view()
+            self._speech.clear()
+            if self._update_task is not None:
+                await self._update_task
+            if self._skip(audio_np):
+                return
+            text, info = await asyncio.get_event_loop().run_in_executor(
+                None, self._incremental.finalize, audio_np
+            )
+            text = self.gate.accept(text, info)
+        else:
+            # Conversión a float32 normalizado (requerido por Faster-Whisper), en una pasada
+            audio_np = pcm16_to_float(audio)
+            if self._skip(audio_np):
+                return
+            if self._engine is not None:
+                # Se agrupa con las frases de otras sesiones que terminen a la vez
+                segments, info = await self._engine.transcribe(audio_np)
+                text = self.gate.text(segments, info)
+            else:
+                # Transcripción (bloqueante en GPU, idealmente iría en un thread aparte, pero funciona rápido en 5060)
+                transcribe_func = functools.partial(self._model.transcribe, vad_filter=True)
+                segments, info = await asyncio.get_event_loop().run_in_executor(None, transcribe_func, audio_np, "es")
+                # Los segmentos se generan al iterar: el filtro también va en el executor
+                text = await asyncio.get_event_loop().run_in_executor(None, self.gate.text, segments, info)
 
         if text:
             logger.info(f"User (Whisper): {text}")
+            if self.on_utterance is not None:
+                self.on_utterance(audio_np, text, round(time.perf_counter() - start, 4))
             yield TextFrame(text)
 
+    def _skip(self, audio_np):
+        """Ruido, golpes o un VAD demasiado sensible: no ocupan la GPU."""
+        reason = self.gate.check(audio_np)
+        if reason is not None:
+            logger.info(f"Whisper omitido ({reason}): {len(audio_np) / 16000:.2f} s")
+        return reason is not None
+
+    async def _update_incremental(self, audio_np):
+        interim = await asyncio.get_event_loop().run_in_executor(
+            None, self._incremental.update, audio_np
+        )
+        if interim:
+            await self.push_frame(InterimTranscriptionFrame(interim, "", time_now_iso8601()))
+
+    async def _track_speech(self, frame):
+        if isinstance(frame, UserStartedSpeakingFrame):
+            self._speaking = True
+            # Con el lock de update/finalize y fuera del loop: si aún decodifica
+            # la frase anterior, espera a que termine sin bloquear el pipeline
+            await asyncio.get_event_loop().run_in_executor(None, self._incremental.reset)
+            self._speech.clear()
+            for chunk in self._preroll:
+                self._speech.extend_pcm16(chunk)
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            self._speaking = False
+        elif isinstance(frame, InputAudioRawFrame):
+            if not self._speaking:
+                self._preroll.append(frame.audio)
+                return
+            self._speech.extend_pcm16(frame.audio)
+            busy = self._update_task is not None and not self._update_task.done()
+            if not busy and self._incremental.due(len(self._speech)):
+                self._update_task = asyncio.create_task(self._update_incremental(self._speech.view()))
+
     async def process_frame(self, frame, direction):
         """
         Procesar frames para consumir InputAudioRawFrame y pasar otros.
         """
         await super().process_frame(frame, direction)
 
-        from pipecat.frames.frames import InputAudioRawFrame
+        if self._incremental is not None or (self._incremental_enabled and self._model_ready()):
+            await self._track_speech(frame)
+
         if isinstance(frame, InputAudioRawFrame):
             # Consumir el frame de audio sin pasar
             pass
\ No newline at end of file
@@ -8,42 +8,25 @@ import os
 
 # Add the current directory to sys.path so we can import services
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# And the repo root, for the modules shared with stt-llm-tts (common/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from pipecat.transports.local.audio import LocalAudioTransport, LocalAudioTransportParams
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineTask
-from pipecat.frames.frames import StartFrame, TextFrame
+from pipecat.frames.frames import StartFrame
 from pipecat.audio.vad.silero import SileroVADAnalyzer
-from pipecat.processors.frame_processor import FrameProcessor
 
 # Import the existing Whisper Service (which has the fixes)
 from services.whisper_stt import LocalWhisperService
+from services.session_recorder import TranscriptRecorder
+from common.session_log import SessionRecorder
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-class TextToFileWriter(FrameProcessor):
-    def __init__(self, filename="transcription_output.txt"):
-        super().__init__()
-        self.filename = filename
-        # Initialize file with header
-        with open(self.filename, "w", encoding="utf-8") as f:
-            f.write("--- SESIÓN DE TRANSCRIPCIÓN ---\n")
-        print(f"📁 Guardando transcripción en: {os.path.abspath(self.filename)}")
-
-    async def process_frame(self, frame, direction):
-        await super().process_frame(frame, direction)
-        
-        if isinstance(frame, TextFrame):
-            text = frame.text
-            print(f"📝 Detectado: {text}")
-            with open(self.filename, "a", encoding="utf-8") as f:
-                f.write(f"{text}\n")
-        
-        await self.push_frame(frame, direction)
-
 def select_input_device(p):
     """Select input device helper."""
     count = p.get_device_count()
@@ -100,8 +83,10 @@ async def main():
     # Using the LocalWhisperService which we know has the proper configuration
     stt = LocalWhisperService(vad_analyzer=vad)
 
-    # 4. File Writer
-    file_writer = TextToFileWriter("transcription_output.txt")
+    # 4. File Writer: JSONL por lotes desde un hilo, el pipeline solo encola
+    session = SessionRecorder("transcription_output", prefix="transcripcion")
+    print(f"📁 Guardando transcripción en: {os.path.abspath(session.directory)}")
+    file_writer = TranscriptRecorder(session, role="user", echo=True)
 
     pipeline = Pipeline([
         transport.input(),
@@ -117,6 +102,7 @@ async def main():
     async def shutdown(sig, frame):
         print("\nFinalizando...")
         await task.cancel()
+        session.close()
         sys.exit(0)
 
     loop = asyncio.get_running_loop()
@@ -124,7 +110,7 @@ async def main():
         loop.add_signal_handler(sig, lambda: asyncio.create_task(shutdown(sig, None)))
 
     print("\n--- PRUEBA INICIADA ---")
-    print("Habla ahora. El texto aparecerá aquí y en 'transcription_output.txt'")
+    print("Habla ahora. El texto aparecerá aquí y en 'transcription_output/' (JSONL)")
     print("Presiona Ctrl+C para salir.\n")
 
     try:
@@ -1,20 +1,33 @@
 import os
-import urllib.request
 
-def setup_local_models():
-    files = {
-        "kokoro-v1.0.onnx": "https://github.com/thewhodidthis/kokoro-onnx/releases/download/v0.2.0/kokoro-v1.0.onnx",
-        "voices.bin": "https://github.com/thewhodidthis/kokoro-onnx/releases/download/v0.2.0/voices.bin"
-    }
+from common.model_store import ChecksumError, ModelStore
+
+# Artefactos del manifiesto (common/models.json) que necesitan los agentes
+ARTIFACTS = ["kokoro", "whisper-medium"]
+_reported = {}
 
-    print("--- Verificando modelos locales para la voz ---")
-    for name, url in files.items():
-        if not os.path.exists(name):
-            print(f"Descargando {name}... (esto puede tardar un poco)")
-            urllib.request.urlretrieve(url, name)
-            print(f"{name} listo.")
-        else:
+def progress(url, done, total):
+    # Una línea cada 10 %: varios ficheros se descargan a la vez
+    pct = int(100 * done / total) if total else 0
+    if pct // 10 != _reported.get(url):
+        _reported[url] = pct // 10
+        print(f"  {os.path.basename(url)}: {pct}%")
+
+def setup_local_models():
+    print("--- Verificando modelos locales (voz y Whisper) ---")
+    # Descargas reanudables y verificadas con SHA-256 en ~/.cache/stt-ollama-tts/models
+    store = ModelStore(progress=progress)
+    for name in ARTIFACTS:
+        problems = store.verify(name)
+        if not problems:
             print(f"{name} ya existe.")
+            continue
+        print(f"Descargando {name}... (esto puede tardar un poco)")
+        try:
+            print(f"{name} listo en {store.ensure(name)}")
+        except ChecksumError as e:
+            # Sin hash fijado no se descarga nada: hay que fijar el manifiesto con --pin
+            print(f"{name} no verificado: {e}")
 
     print("\n--- Asegurando que Gemma 3:12b esté en Ollama ---")
     os.system("ollama pull gemma3:12b")
@@ -1,35 +1,106 @@
 # --- 4. ORQUESTADOR (Main Pipeline) ---
 import asyncio
+import os
+import sys
 import sounddevice as sd
 
-from core.listener import Listener
+# Raíz del repo en el path: módulos compartidos con pipecat-local-agent (common/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.listener import STT_SR, Listener, input_rate_plan
 from core.brain import Brain
-from core.speaker import Speaker
+from core.speaker import Speaker, output_rate_plan
+from core.metrics import TurnRecorder
+from core.speculation import Speculator
+from utils.text_tools import echo_sentences
+from common.tts_cache import TTSCache
+from common.tts_backends import create_backend
+from common.startup import Startup, load_whisper
+from common.response_cache import ResponseCache
+from common.vad import create_vad
+from common.turn_metrics import TurnMetrics
+from common.audio_devices import configure
+from config import FAREWELL, PREWARM_PHRASES, TTS_CACHE_DIR, TTS_BACKEND, VAD, SPECULATE, OLLAMA_MODEL, OLLAMA_KEEP_ALIVE, METRICS_DIR
+
 class VoiceAgent:
     def __init__(self):
-        # Asignamos ID 12 como default para Pipewire/Linux
-        sd.default.device = [12, 12]
-        self.listener = Listener()
-        self.brain = Brain()
-        self.speaker = Speaker()
+        # Dispositivos por nombre (common/audio_devices.py): la primera vez se eligen
+        # y se calibra el bloque; después el arranque no pregunta
+        audio = configure()
+        sd.default.device = [audio.input_index, audio.output_index]
+        sd.default.latency = audio.latency
+        # Frecuencias negociadas con los dispositivos: como mucho un re-muestreo por sentido
+        output_plan = output_rate_plan()
+        out_sr = output_plan.rate("altavoz")
+        for plan in (input_rate_plan(), output_plan):
+            print(plan.describe())
+        # Whisper y Kokoro cargan en paralelo en hilos; nada espera por ellos aquí
+        self.startup = Startup()
+        whisper = self.startup.submit("whisper", load_whisper, "medium")
+        tts_backend = self.startup.submit("kokoro", create_backend, TTS_BACKEND)
+        self.listener = Listener(model=whisper, vad=create_vad(VAD), blocksize=audio.blocksize(STT_SR))
+        self.brain = Brain(OLLAMA_MODEL, keep_alive=OLLAMA_KEEP_ALIVE, cache=ResponseCache())
+        self.speaker = Speaker(output_sr=out_sr, blocksize=audio.blocksize(out_sr),
+                               cache=TTSCache(disk_dir=TTS_CACHE_DIR), backend=tts_backend)
+        self.listener.playback_active = lambda: self.speaker.is_playing
+        self.speculator = None
+        if SPECULATE:
+            self.speculator = Speculator(self.listener, self.brain, self.speaker)
+            self.listener.on_pause = self.speculator.on_pause
+            self.listener.on_resume = self.speculator.on_resume
+        self.recorder = TurnRecorder(self.listener, self.brain, self.speaker, TurnMetrics(
+            jsonl_path=os.path.join(METRICS_DIR, "turns.jsonl"),
+            prom_path=os.path.join(METRICS_DIR, "voice_agent.prom"),
+        ))
 
     async def run(self):
+        # El micrófono graba desde ya; LLM y frases fijas del TTS cargan con el resto
+        self.startup.run("micrófono", self.listener.start)
+        self.startup.track("ollama", self.brain.preload())
+        self.startup.track("tts prewarm", self.speaker.prewarm(PREWARM_PHRASES))
+        loading = asyncio.create_task(self._report_startup())
         print("\n>>> AGENTE ACTIVO (Gemma 3 + Whisper Medium)")
+        listening = asyncio.create_task(self.listener.listen())
         try:
             while True:
-                audio = await self.listener.get_audio_input()
-                text = await self.listener.transcribe(audio)
+                audio = await listening
+                self.recorder.begin()
+                text = await self.recorder.transcribe(audio)
+                draft = self.speculator.claim(text) if self.speculator is not None else None
+                self.recorder.turn.set("speculative", draft is not None)
+                # El micrófono sigue armado mientras la IA habla (barge-in)
+                listening = asyncio.create_task(self.listener.listen())
                 
                 if text:
                     print(f"Tú: {text}")
                     if "adiós" in text.lower():
-                        await self.speaker.play_audio("Hasta luego, ha sido un placer.")
+                        if draft is not None:
+                            draft.cancel()
+                        await self.speaker.speak(FAREWELL)
                         break
                     
-                    response = await self.brain.generate_response(text)
-                    await self.speaker.play_audio(response)
+                    completed = await self.speaker.speak_stream(
+                        echo_sentences(self.brain.think_stream(text, draft=draft)),
+                        interrupt_on=self.listener.speech_started
+                    )
+                    if not completed:
+                        print("[barge-in] Respuesta interrumpida")
+                    self.recorder.finish(completed)
         except Exception as e:
             print(f"[!] Error en el pipeline: {e}")
+        finally:
+            if self.speculator is not None:
+                self.speculator.cancel()
+                print(f"Especulación: {self.speculator.summary()}")
+            print(f"Filtro STT: {self.listener.gate.stats()}")
+            loading.cancel()
+            listening.cancel()
+            self.listener.close()
+            self.speaker.close()
+
+    async def _report_startup(self):
+        await self.startup.wait()
+        print(self.startup.report())
 
 if __name__ == "__main__":
     agent = VoiceAgent()
@@ -0,0 +1,22 @@
+import os
+
+FAREWELL = "Hasta luego, ha sido un placer."
+# Frases fijas que se sintetizan al arrancar y se sirven desde la caché
+PREWARM_PHRASES = [FAREWELL]
+TTS_CACHE_DIR = os.path.expanduser("~/.cache/stt-ollama-tts/tts")
+# Backend de Kokoro: "torch" (KPipeline) u "onnx" (kokoro-v1.0.onnx + voices.bin
+# de setup_ia.py, más ligero en máquinas sin GPU)
+TTS_BACKEND = "torch"
+# Detector de voz del Listener: "energy" (sin dependencias) o "silero"
+# (silero_vad.onnx del almacén de modelos, mejor con ruido de fondo)
+VAD = "energy"
+# Respuesta especulativa: Gemma empieza en la primera pausa de la frase y se
+# usa lo generado solo si la transcripción final coincide (core/speculation.py)
+SPECULATE = True
+
+# LLM: el modelo se precarga al arrancar y queda residente en GPU
+OLLAMA_MODEL = "gemma3:12b"
+OLLAMA_KEEP_ALIVE = "30m"
+
+# Latencias por turno: JSONL y fichero de texto para Prometheus
+METRICS_DIR = os.path.expanduser("~/.cache/stt-ollama-tts/metrics")
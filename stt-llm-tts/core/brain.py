@@ -1,14 +1,118 @@
-from ollama import AsyncClient
+import time
+
+from utils.text_tools import SentenceSplitter
+from core.speculation import Draft
+from common.context import ConversationContext, make_ollama_summarizer
+from common.llm_client import OllamaLLM, DEFAULT_KEEP_ALIVE
+
+SYSTEM_PROMPT = 'Eres un asistente técnico conciso. Responde en español, máximo 2 frases.'
 
 class Brain:
-    def __init__(self, model="gemma3:12b"):
-        self.client = AsyncClient()
+    def __init__(self, model="gemma3:12b", host=None, max_context_tokens=2048,
+                 profile="voice", keep_alive=DEFAULT_KEEP_ALIVE, cache=None):
+        self.llm = OllamaLLM(model, host=host, profile=profile, keep_alive=keep_alive)
         self.model = model
+        # Memoria de la conversación: prefijo estable para reutilizar la caché KV
+        self.context = ConversationContext(
+            [{'role': 'system', 'content': SYSTEM_PROMPT}],
+            max_tokens=max_context_tokens,
+            summarizer=make_ollama_summarizer(self.llm),
+        )
+        self.cache = cache  # ResponseCache opcional (common/response_cache.py)
+        # Instante (perf_counter) del primer token de la última respuesta
+        self.first_token_at = None
+
+    async def preload(self):
+        """Carga el modelo en GPU antes del primer turno."""
+        return await self.llm.preload()
+
+    def _build_messages(self, user_input):
+        self.context.add_message({'role': 'user', 'content': user_input})
+        return self.context.get_messages()
+
+    def _remember(self, reply):
+        if reply:
+            self.context.add_message({'role': 'assistant', 'content': reply})
+
+    def _cached(self, user_input):
+        if self.cache is None:
+            return None
+        return self.cache.get(user_input)
+
+    def _store(self, user_input, reply):
+        if self.cache is not None:
+            self.cache.put(user_input, reply)
+
+    def draft(self, user_input, stats, on_sentence=None):
+        """Empieza a generar sin tocar el contexto (respuesta especulativa).
+
+        None si la respuesta ya está en la caché: no hace falta adelantarse.
+        """
+        if self.cache is not None and self.cache.peek(user_input) is not None:
+            return None
+        messages = list(self.context.get_messages()) + [{'role': 'user', 'content': user_input}]
+        return Draft(user_input, messages, self.llm.chat_stream(messages), stats, on_sentence)
 
     async def think(self, user_input):
-        messages = [
-            {'role': 'system', 'content': 'Eres un asistente técnico conciso. Responde en español, máximo 2 frases.'},
-            {'role': 'user', 'content': user_input}
-        ]
-        response = await self.client.chat(model=self.model, messages=messages)
-        return response['message']['content']
\ No newline at end of file
+        messages = self._build_messages(user_input)
+        reply = self._cached(user_input)
+        if reply is None:
+            response = await self.llm.chat(messages)
+            self.context.record_usage(response)
+            reply = response['message']['content']
+            self._store(user_input, reply)
+        self._remember(reply)
+        return reply
+
+    async def think_stream(self, user_input, draft=None):
+        """Genera la respuesta en streaming y la entrega frase a frase.
+
+        `draft`: borrador de Speculator ya validado; sus chunks sustituyen a
+        la petición a Ollama.
+        """
+        splitter = SentenceSplitter()
+        parts = []
+        messages = self._build_messages(user_input)
+        self.first_token_at = None
+        cached = self._cached(user_input)
+        if cached is not None:
+            if draft is not None:
+                draft.cancel()
+            # Respuesta ya conocida: sin pasar por el modelo
+            self.first_token_at = time.perf_counter()
+            try:
+                for sentence in splitter.push(cached + " "):
+                    yield sentence
+                rest = splitter.flush()
+                if rest:
+                    yield rest
+            finally:
+                self._remember(cached)
+            return
+
+        completed = False
+        source = draft.replay() if draft is not None else self.llm.chat_stream(messages)
+        try:
+            async for chunk in source:
+                content = chunk['message']['content']
+                if content:
+                    if self.first_token_at is None:
+                        self.first_token_at = time.perf_counter()
+                    parts.append(content)
+                    for sentence in splitter.push(content):
+                        yield sentence
+                if chunk.get('done'):
+                    self.context.record_usage(chunk)
+            rest = splitter.flush()
+            if rest:
+                yield rest
+            completed = True
+        finally:
+            if draft is not None:
+                draft.close()
+            reply = "".join(parts).strip()
+            # Solo se cachean respuestas completas, no las cortadas por barge-in
+            if completed:
+                self._store(user_input, reply)
+            # Si hubo barge-in se recuerda solo lo que se llegó a generar
+            self._remember(reply)
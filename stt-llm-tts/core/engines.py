@@ -0,0 +1,166 @@
+"""Motores compartidos por todas las sesiones del servidor (server.py).
+
+Whisper y Kokoro se cargan una sola vez por proceso. Cada motor tiene un
+`FairScheduler`: un hilo que atiende por turnos las colas de cada sesión,
+así una sesión con muchas frases pendientes no deja sin servicio a las demás.
+El trabajo de TTS se planifica trozo a trozo de Kokoro para que el reparto
+sea fino.
+"""
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+
+from common.resampler import StreamingResampler
+from common.startup import load_whisper, set_future_exception, set_future_result
+from common.stt_gate import SpeechGate
+from common.tts_backends import KOKORO_SR, KPipelineBackend
+
+logger = logging.getLogger(__name__)
+
+class FairScheduler:
+    def __init__(self, name, workers=1):
+        self.name = name
+        self._queues = OrderedDict()   # sesión -> deque de trabajos; el orden es el turno
+        self._cond = threading.Condition()
+        self._closed = False
+        self.completed = 0
+        self._threads = [threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def backlog(self):
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def submit(self, session_id, fn, *args):
+        """Encola `fn(*args)` para la sesión y devuelve un future de asyncio."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._cond:
+            self._queues.setdefault(session_id, deque()).append((loop, future, fn, args))
+            self._cond.notify()
+        return future
+
+    def post(self, session_id, fn, *args):
+        """Encola `fn(*args)` sin esperar el resultado (limpieza); `drop` no lo descarta."""
+        with self._cond:
+            self._queues.setdefault(session_id, deque()).append((None, None, fn, args))
+            self._cond.notify()
+
+    def drop(self, session_id):
+        """Descarta los trabajos pendientes de una sesión (desconexión o barge-in)."""
+        with self._cond:
+            jobs = self._queues.pop(session_id, ())
+            cleanup = deque(job for job in jobs if job[1] is None)
+            if cleanup:
+                self._queues[session_id] = cleanup
+        for loop, future, _, _ in jobs:
+            if future is not None:
+                loop.call_soon_threadsafe(future.cancel)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _next_job(self):
+        with self._cond:
+            while not self._closed and not self._queues:
+                self._cond.wait()
+            if self._closed:
+                return None
+            # Round-robin: se atiende a la primera sesión y pasa al final de la cola
+            session_id, jobs = next(iter(self._queues.items()))
+            job = jobs.popleft()
+            del self._queues[session_id]
+            if jobs:
+                self._queues[session_id] = jobs
+            return job
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            loop, future, fn, args = job
+            if future is None:
+                try:
+                    fn(*args)
+                except Exception as e:
+                    logger.warning(f"{self.name}: error en limpieza: {e}")
+                continue
+            if future.cancelled():
+                continue
+            try:
+                result = fn(*args)
+            except Exception as e:
+                loop.call_soon_threadsafe(set_future_exception, future, e)
+            else:
+                loop.call_soon_threadsafe(set_future_result, future, result)
+            self.completed += 1
+
+
+class SharedSTT:
+    def __init__(self, model_size="medium", device="cuda", compute_type="float16", language="es",
+                 max_batch_size=1, max_wait=0.03):
+        self.model = load_whisper(model_size, device=device, compute_type=compute_type)
+        self.language = language
+        # Un solo filtro para todas las sesiones: sus contadores son los del servidor
+        self.gate = SpeechGate()
+        self.scheduler = FairScheduler("stt")
+        # Con max_batch_size > 1 las frases de varias sesiones se agrupan en lotes
+        self.batcher = None
+        if max_batch_size > 1:
+            # Import diferido: ctranslate2 solo hace falta con lotes
+            from common.batched_stt import BatchedWhisper
+
+            self.batcher = BatchedWhisper(self.model, max_batch_size=max_batch_size,
+                                          max_wait=max_wait, language=language)
+
+    @property
+    def backlog(self):
+        if self.batcher is not None:
+            return self.batcher.backlog
+        return self.scheduler.backlog
+
+    def _transcribe(self, audio):
+        segments, info = self.model.transcribe(audio, language=self.language, vad_filter=True)
+        # Mismo filtro contra alucinaciones que Listener.transcribe
+        return self.gate.text(segments, info)
+
+    async def transcribe(self, session_id, audio, noise_floor_db=None):
+        if self.gate.check(audio, noise_floor_db=noise_floor_db) is not None:
+            return ""
+        if self.batcher is not None:
+            segments, info = await self.batcher.transcribe(audio)
+            return self.gate.text(segments, info)
+        return await self.scheduler.submit(session_id, self._transcribe, audio)
+
+
+class SharedTTS:
+    def __init__(self, voice="em_alex", speed=1.1, lang_code="es", backend=None):
+        self.backend = backend or KPipelineBackend(lang_code=lang_code)
+        self.voice = voice
+        self.speed = speed
+        self.scheduler = FairScheduler("tts")
+
+    async def synthesize(self, session_id, text, output_sr=KOKORO_SR):
+        """Itera el PCM float32 de la frase, trozo a trozo de Kokoro."""
+        chunks = self.backend.stream(text, self.voice, self.speed)
+        resampler = StreamingResampler(self.backend.sample_rate, output_sr)
+        try:
+            while True:
+                audio = await self.scheduler.submit(session_id, next, chunks, None)
+                if audio is None:
+                    break
+                yield resampler.process(audio)
+        finally:
+            # Si el consumidor cancela, el generador de Kokoro se cierra en el
+            # hilo del planificador, detrás del `next` que pudiera estar en curso
+            self.scheduler.post(session_id, chunks.close)
+        tail = resampler.flush()
+        if len(tail):
+            yield tail
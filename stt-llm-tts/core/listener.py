@@ -1,55 +1,271 @@
 import asyncio
-import numpy as np
+import threading
+import time
 import sounddevice as sd
-from faster_whisper import WhisperModel
+from concurrent.futures import Future
+from common.audio_rates import Stage, negotiate, sounddevice_rates
+from utils.ring_buffer import CaptureRing
+from common.incremental_stt import IncrementalTranscriber
+from common.startup import load_whisper, resolve
+from common.stt_gate import SpeechGate
+from common.vad import Endpointer
+
+STT_SR = 16000
+
+
+def input_rate_plan(device=None):
+    """Whisper y el VAD trabajan a 16 kHz; si el micrófono no abre a esa
+    frecuencia, la conversión la hace PortAudio/el servidor de audio."""
+    try:
+        return negotiate("entrada", [
+            Stage("micrófono", sounddevice_rates(device, is_input=True)),
+            Stage("listener", [STT_SR]),
+        ])
+    except ValueError:
+        print(f"Aviso: el micrófono no abre a {STT_SR} Hz; convierte el host")
+        return negotiate("entrada", [Stage("listener", [STT_SR])])
 
 class Listener:
-    def __init__(self, model_size="medium", device="cuda"):
-        self.model = WhisperModel(model_size, device=device, compute_type="float16")
-        self.sample_rate = 16000
-        self.energy_threshold = 0.5
-        self.silence_limit = 0.7  # Segundos de silencio para cortar
+    def __init__(self, model_size="medium", device="cuda", preroll=0.3,
+                 max_utterance=30.0, blocksize=512, incremental=False, on_interim=None,
+                 playback_active=None, compute_type="float16",
+                 input_stream=None, model=None, vad=None, on_pause=None, on_resume=None,
+                 gate=None):
+        # model: WhisperModel ya cargado o un Future de Startup; así el micrófono
+        # se abre mientras Whisper sigue cargando en otro hilo
+        self._model = model if model is not None else load_whisper(model_size, device, compute_type)
+        self.sample_rate = STT_SR
+        # Detector por tramas (common/vad.py): EnergyVAD por defecto, SileroVAD opcional.
+        # Decide inicio y fin de frase; el silencio de cierre depende de lo que dure
+        self.endpointer = Endpointer(vad)
+        self.preroll = preroll    # Segundos previos al disparo que se conservan
+        # Filtro antes/después de Whisper (common/stt_gate.py): lo que no es voz no se decodifica
+        self.gate = gate or SpeechGate(self.sample_rate)
+        self.blocksize = blocksize
 
-    async def listen(self):
-        audio_buffer = []
-        recording = False
-        silence_counter = 0
-
-        # Log device information for debugging
-        print("Available audio devices:")
-        devices = sd.query_devices()
-        for i, device in enumerate(devices):
-            print(f"Device {i}: {device['name']}, Input channels: {device['max_input_channels']}, Output channels: {device['max_output_channels']}, Default sample rate: {device['default_samplerate']}")
-        print(f"Default input device: {sd.default.device['input']}")
-        print(f"Default output device: {sd.default.device['output']}")
-
-        def callback(indata, frames, time, status):
-            nonlocal recording, silence_counter
-            volume = np.linalg.norm(indata) * 10
-            if volume > self.energy_threshold:
-                recording = True
-                silence_counter = 0
-                audio_buffer.append(indata.copy())
-            elif recording:
-                silence_counter += frames / self.sample_rate
-                audio_buffer.append(indata.copy())
+        # Margen extra para que la vista entregada no se sobrescriba mientras
+        # Whisper la está transcribiendo
+        capacity = int((max_utterance + preroll + 10.0) * self.sample_rate)
+        self._ring = CaptureRing(capacity)
+        self._max_samples = int(max_utterance * self.sample_rate)
+        self._stream = None
+        # El detector corre en su propio hilo leyendo del ring: el callback de
+        # PortAudio solo copia muestras
+        self._vad_thread = None
+        self._vad_running = False
+        self._vad_pos = 0   # Siguiente muestra absoluta que verá el detector
+        # Clase del stream de entrada; los benchmarks pasan una que lee WAVs
+        self._stream_cls = input_stream or sd.InputStream
+
+        # Modo incremental: Whisper trabaja mientras el usuario sigue hablando
+        # (se crea cuando el modelo está listo)
+        self._incremental_enabled = incremental
+        self._incremental = None
+        self.on_interim = on_interim
+        # Pausa dentro de la frase (aún sin cerrar): on_pause(audio hasta la
+        # última voz) y on_resume() si el usuario sigue; los usa la especulación
+        self.on_pause = on_pause
+        self.on_resume = on_resume
+
+        # Barge-in: con el altavoz sonando el detector exige más confianza para
+        # no dispararse con el eco de la propia voz del agente
+        self.playback_active = playback_active
+        self.speech_started = asyncio.Event()
+
+        # Estado de la frase, solo lo modifica el hilo del detector mientras está armado
+        self._armed = False
+        self._speech_start = None
+        self._speech_end = None
+        self._pause_end = None
 
+        # Instantes (perf_counter) de la última frase, para medir latencias
+        self.speech_started_at = None
+        self.last_voice_at = None
+        self.speech_ended_at = None
+
+    @property
+    def model(self):
+        """WhisperModel; bloquea si aún se está cargando."""
+        self._model = resolve(self._model)
+        return self._model
+
+    @property
+    def model_ready(self):
+        return not isinstance(self._model, Future) or self._model.done()
+
+    async def ready(self):
+        """Espera (sin bloquear el event loop) a que Whisper esté cargado."""
+        if isinstance(self._model, Future):
+            await asyncio.wrap_future(self._model)
+        if self._incremental_enabled and self._incremental is None:
+            self._incremental = IncrementalTranscriber(self.model, sample_rate=self.sample_rate,
+                                                       gate=self.gate)
+        return self.model
+
+    def start(self):
+        """Abre el stream de entrada una sola vez para toda la sesión."""
+        if self._stream is not None:
+            return
+        self._vad_running = True
+        self._vad_thread = threading.Thread(target=self._vad_loop, name="vad", daemon=True)
+        self._vad_thread.start()
         try:
-            with sd.InputStream(samplerate=self.sample_rate, channels=1, callback=callback):
-                while not recording or silence_counter < self.silence_limit:
-                    await asyncio.sleep(0.1)
+            self._stream = self._stream_cls(
+                samplerate=self.sample_rate, channels=1, dtype='float32',
+                blocksize=self.blocksize, callback=self._callback
+            )
+            self._stream.start()
         except sd.PortAudioError as e:
             print(f"Error opening InputStream: {e}")
+            self._stream = None
+            self._stop_vad()
             raise
-            while not recording or silence_counter < self.silence_limit:
-                await asyncio.sleep(0.1)
-        
-        return np.concatenate(audio_buffer).flatten()
+        if self._stream_cls is sd.InputStream:
+            print(f"Micrófono activo: {sd.query_devices(kind='input')['name']}")
 
-    async def transcribe(self, audio_data):
-        segments, info = self.model.transcribe(audio_data, language="es", vad_filter=True)
-        text = " ".join([s.text for s in segments]).strip()
-        # Filtro de seguridad contra alucinaciones de Whisper
-        if info.language_probability < 0.5 or len(text) < 3:
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self._stop_vad()
+
+    def _stop_vad(self):
+        self._vad_running = False
+        if self._vad_thread is not None:
+            self._vad_thread.join()
+            self._vad_thread = None
+
+    def _callback(self, indata, frames, time_info, status):
+        # Solo copia al buffer preasignado: nada de listas, arrays nuevos ni VAD
+        self._ring.write(indata[:, 0])
+
+    def _vad_loop(self):
+        """Pasa al detector las tramas completas que el callback ya dejó en el ring."""
+        ep = self.endpointer
+        frame = ep.frame_samples
+        poll = frame / self.sample_rate / 2
+        while self._vad_running:
+            total = self._ring.total_written
+            if total - self._vad_pos > self._ring.capacity:
+                # El detector se quedó atrás más de una vuelta: salta a lo que queda
+                self._vad_pos = ep.skip_to(self._ring.oldest)
+            end = self._vad_pos + (total - self._vad_pos) // frame * frame
+            if end == self._vad_pos:
+                time.sleep(poll)
+                continue
+            # Vista sin copia y tramas completas: el Endpointer las reparte sin copiar
+            self._endpoint(self._ring.view(self._vad_pos, end), end)
+            self._vad_pos = end
+
+    def _endpoint(self, block, total):
+        # El detector ve todo el audio (también desarmado) para que su posición
+        # coincida con la del ring y su suelo de ruido siga al día
+        strict = self.playback_active is not None and self.playback_active()
+        events = self.endpointer.process(block, strict=strict)
+        if not self._armed or self._speech_end is not None:
+            return
+
+        # Los instantes se refieren a la muestra `total`, que llegó hace un poco
+        now = time.perf_counter() - (self._ring.total_written - total) / self.sample_rate
+        ep = self.endpointer
+        if self._speech_start is None and ep.in_speech:
+            # Arranque (o frase que ya había empezado al armar): desde la primera trama con voz
+            self._speech_start = max(ep.speech_start - int(self.preroll * self.sample_rate),
+                                     total - self._max_samples)
+            self.speech_started_at = now - (total - ep.speech_start) / self.sample_rate
+        if self._speech_start is not None and ep.last_voice is not None:
+            self.last_voice_at = now - (total - ep.last_voice) / self.sample_rate
+        for event, position in events:
+            if self._speech_start is None:
+                continue
+            if event == "pause":
+                self._pause_end = position
+            elif event == "resume":
+                self._pause_end = None
+            elif event == "end":
+                self._speech_end = position
+                self.speech_ended_at = now
+                return
+
+        if (self._speech_start is not None
+                and total - self._speech_start >= self._max_samples):
+            self._speech_end = total
+            self.speech_ended_at = now
+            ep.force_end()
+
+    async def listen(self):
+        """Espera a la siguiente frase y la devuelve como vista del buffer."""
+        self.start()
+        self._speech_start = None
+        self._speech_end = None
+        self._pause_end = None
+        self.speech_started_at = self.last_voice_at = self.speech_ended_at = None
+        self.speech_started.clear()
+        # Si Whisper aún carga se graba igual; las parciales empiezan cuando esté
+        if self._incremental_enabled and self._incremental is None and self.model_ready:
+            await self.ready()
+        if self._incremental is not None:
+            self._incremental.reset()
+        update = None
+        pause = None
+        self._armed = True
+        try:
+            while self._speech_end is None:
+                if self._speech_start is not None and not self.speech_started.is_set():
+                    self.speech_started.set()
+                if self._pause_end != pause:
+                    pause = self._pause_end
+                    if pause is not None and self.on_pause is not None:
+                        self.on_pause(self._ring.view(self._speech_start, pause))
+                    elif pause is None and self.on_resume is not None:
+                        self.on_resume()
+                if self._incremental is not None and self._speech_start is not None \
+                        and (update is None or update.done()) \
+                        and self._incremental.due(self._ring.total_written - self._speech_start):
+                    partial = self._ring.view(self._speech_start, self._ring.total_written)
+                    update = asyncio.create_task(self._update_incremental(partial))
+                await asyncio.sleep(0.02)
+        finally:
+            self._armed = False
+            # Nadie debe ver el aviso de una frase que ya terminó
+            self.speech_started.clear()
+        if update is not None:
+            await update
+        return self._ring.view(self._speech_start, self._speech_end)
+
+    def utterance_marks(self):
+        """Hitos de la última frase (perf_counter); leer antes de volver a armar."""
+        return {
+            "speech_start": self.speech_started_at,
+            "last_voice": self.last_voice_at,
+            "speech_end": self.speech_ended_at,
+        }
+
+    async def _update_incremental(self, audio):
+        interim = await asyncio.to_thread(self._incremental.update, audio)
+        if interim and self.on_interim:
+            self.on_interim(interim)
+
+    async def transcribe(self, audio_data, background=False):
+        """Texto de la frase ("" si parece alucinación).
+
+        background=True decodifica en un hilo sin bloquear el event loop
+        (transcripciones especulativas mientras el micrófono sigue armado).
+        """
+        await self.ready()
+        if background:
+            return await asyncio.to_thread(self._transcribe, audio_data)
+        return self._transcribe(audio_data)
+
+    def _transcribe(self, audio_data):
+        noise_floor = getattr(self.endpointer.vad, "noise_floor_db", None)
+        if self.gate.check(audio_data, noise_floor_db=noise_floor) is not None:
             return ""
-        return text
\ No newline at end of file
+        if self._incremental is not None:
+            # Solo se re-decodifica la cola que no quedó confirmada al hablar
+            text, info = self._incremental.finalize(audio_data)
+            return self.gate.accept(text, info)
+        segments, info = self.model.transcribe(audio_data, language="es", vad_filter=True)
+        # Segmentos sin voz, idioma dudoso y alucinaciones conocidas fuera
+        return self.gate.text(segments, info)
@@ -0,0 +1,49 @@
+import time
+
+from common.turn_metrics import TurnTimer
+
+class TurnRecorder:
+    """Reúne los hitos de un turno repartidos entre Listener, Brain y Speaker."""
+
+    def __init__(self, listener, brain, speaker, metrics):
+        self.listener = listener
+        self.brain = brain
+        self.speaker = speaker
+        self.metrics = metrics
+        self.turn = None
+
+    def begin(self):
+        """Llamar nada más terminar listen(), antes de re-armar el micrófono."""
+        self.turn = TurnTimer()
+        for name, at in self.listener.utterance_marks().items():
+            if at is not None:
+                self.turn.mark(name, at)
+        self._tts_before = (self.speaker.synthesis_seconds, self.speaker.synthesized_audio_seconds)
+
+    async def transcribe(self, audio):
+        # Si Whisper aún se está cargando, la espera no cuenta en el RTF
+        await self.listener.ready()
+        start = time.perf_counter()
+        text = await self.listener.transcribe(audio)
+        self.turn.mark("transcript")
+        audio_s = len(audio) / self.listener.sample_rate
+        if audio_s:
+            self.turn.set("stt_rtf", round((time.perf_counter() - start) / audio_s, 3))
+        self.turn.set("audio_s", round(audio_s, 3))
+        return text
+
+    def finish(self, completed=True):
+        turn, self.turn = self.turn, None
+        turn.mark("end")
+        if self.brain.first_token_at is not None:
+            turn.mark("first_token", self.brain.first_token_at)
+        first_audio = self.speaker.first_audio_after(turn.marks["transcript"])
+        if first_audio is not None:
+            turn.mark("first_audio", first_audio)
+
+        synth = self.speaker.synthesis_seconds - self._tts_before[0]
+        produced = self.speaker.synthesized_audio_seconds - self._tts_before[1]
+        if produced:
+            turn.set("tts_rtf", round(synth / produced, 3))
+        turn.set("interrupted", not completed)
+        return self.metrics.record(turn)
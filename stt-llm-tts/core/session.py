@@ -0,0 +1,162 @@
+"""Una conversación de voz sobre WebSocket dentro del servidor (server.py).
+
+Protocolo:
+- Cliente -> servidor: frames binarios PCM16 mono a 16 kHz; texto JSON
+  {"type": "end"} para cerrar.
+- Servidor -> cliente: frames binarios PCM16 mono a `sample_rate_out` y
+  eventos JSON: ready, transcript, response_start, response_end, barge_in.
+
+Cada sesión tiene su propio detector de voz, su contexto de conversación
+(un Brain) y su medición de latencias; Whisper, Kokoro y el pool de
+conexiones de Ollama son los del proceso.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from common.pcm import float_to_pcm16, pcm16_to_float
+from common.turn_metrics import TurnTimer
+from common.vad import Endpointer
+
+
+class StreamEndpointer:
+    """El Endpointer de Listener (common/vad.py), alimentado a mano y guardando el audio."""
+
+    def __init__(self, sample_rate=16000, vad=None, preroll=0.3, max_utterance=30.0):
+        self.sample_rate = sample_rate
+        self.endpointer = Endpointer(vad)
+        self.max_samples = int(max_utterance * sample_rate)
+        self.preroll_samples = int(preroll * sample_rate)
+        # Fuera de una frase se guarda el preroll más lo que tarda en confirmarse
+        # el arranque: el inicio apunta a la primera trama con voz, ya pasada
+        self._history = self.preroll_samples + sample_rate
+        self._blocks = deque()  # (posición absoluta, bloque)
+        self._written = 0
+        self._start = None
+        self._end = None
+        self.active = False
+        self.last_voice_at = None
+
+    def feed(self, block, strict=False):
+        """Devuelve 'start', 'end' o None. Tras 'end', `utterance()` da el audio."""
+        self._blocks.append((self._written, block))
+        self._written += len(block)
+        events = self.endpointer.process(block, strict=strict)
+        now = time.perf_counter()
+        result = None
+        for event, position in events:
+            if event == "start":
+                self.active = True
+                self._start = max(position - self.preroll_samples, self._blocks[0][0])
+                result = "start"
+            elif event == "end" and self.active:
+                self._end = position
+                return "end"
+        if self.active:
+            last_voice = self.endpointer.last_voice
+            self.last_voice_at = now - (self._written - last_voice) / self.sample_rate
+            if self._written - self._start >= self.max_samples:
+                self.endpointer.force_end()
+                self._end = self._written
+                return "end"
+        else:
+            while self._blocks and self._blocks[0][0] + len(self._blocks[0][1]) <= self._written - self._history:
+                self._blocks.popleft()
+        return result
+
+    def utterance(self):
+        first = self._blocks[0][0]
+        audio = np.concatenate([b for _, b in self._blocks])[self._start - first:self._end - first]
+        self.active = False
+        self._start = self._end = None
+        return audio
+
+
+class Session:
+    def __init__(self, session_id, websocket, stt, tts, brain, metrics=None,
+                 sample_rate_in=16000, sample_rate_out=24000, vad=None):
+        self.id = session_id
+        self.websocket = websocket
+        self.stt = stt
+        self.tts = tts
+        self.brain = brain
+        self.metrics = metrics
+        self.sample_rate_in = sample_rate_in
+        self.sample_rate_out = sample_rate_out
+        self.endpointer = StreamEndpointer(sample_rate_in, vad)
+        self._response = None
+        self.turns = 0
+
+    async def send_event(self, type_, **fields):
+        await self.websocket.send(json.dumps({"type": type_, **fields}, ensure_ascii=False))
+
+    async def run(self):
+        await self.send_event("ready", session=self.id, sample_rate_in=self.sample_rate_in,
+                              sample_rate_out=self.sample_rate_out)
+        try:
+            async for message in self.websocket:
+                if isinstance(message, str):
+                    if json.loads(message).get("type") == "end":
+                        break
+                    continue
+                block = pcm16_to_float(message)
+                event = self.endpointer.feed(block, strict=self._responding)
+                if event == "start" and self._responding:
+                    await self._interrupt()
+                elif event == "end":
+                    turn = TurnTimer()
+                    turn.mark("last_voice", self.endpointer.last_voice_at)
+                    turn.mark("speech_end")
+                    audio = self.endpointer.utterance()
+                    self._response = asyncio.create_task(self._respond(audio, turn))
+        finally:
+            await self._interrupt(notify=False)
+
+    @property
+    def _responding(self):
+        return self._response is not None and not self._response.done()
+
+    async def _interrupt(self, notify=True):
+        """Barge-in o desconexión: se corta la respuesta en curso."""
+        if not self._responding:
+            return
+        self._response.cancel()
+        self.stt.scheduler.drop(self.id)
+        self.tts.scheduler.drop(self.id)
+        try:
+            await self._response
+        except asyncio.CancelledError:
+            pass
+        if notify:
+            await self.send_event("barge_in")
+
+    async def _respond(self, audio, turn):
+        noise_floor = getattr(self.endpointer.endpointer.vad, "noise_floor_db", None)
+        text = await self.stt.transcribe(self.id, audio, noise_floor_db=noise_floor)
+        turn.mark("transcript")
+        if not text:
+            return
+        await self.send_event("transcript", text=text)
+        await self.send_event("response_start")
+
+        completed = False
+        try:
+            async for sentence in self.brain.think_stream(text):
+                async for chunk in self.tts.synthesize(self.id, sentence, self.sample_rate_out):
+                    turn.mark("first_audio")  # solo cuenta la primera vez
+                    await self.websocket.send(float_to_pcm16(chunk))
+            completed = True
+            await self.send_event("response_end")
+        finally:
+            turn.mark("end")
+            if self.brain.first_token_at is not None:
+                turn.mark("first_token", self.brain.first_token_at)
+            # Como texto: es un identificador (solo va al JSONL), no una métrica numérica
+            turn.set("session", str(self.id))
+            turn.set("interrupted", not completed)
+            self.turns += 1
+            if self.metrics is not None:
+                self.metrics.record(turn)
@@ -1,16 +1,284 @@
+import asyncio
+import collections
+import queue
+import threading
+import time
+import numpy as np
 import sounddevice as sd
-from kokoro import KPipeline
-from utils.audio_tools import resample_audio
+from common.audio_rates import Stage, negotiate, sounddevice_rates
+from common.resampler import StreamingResampler
+from common.startup import resolve
+from common.tts_backends import KOKORO_SR, KPipelineBackend
+from utils.ring_buffer import RingBuffer
+
+
+def output_rate_plan(device=None, tts_sr=KOKORO_SR):
+    """Frecuencia del altavoz con el mínimo de re-muestreos: la de Kokoro si el
+    dispositivo la admite; si no, Speaker convierte una sola vez (a la frecuencia
+    por defecto del dispositivo si no se pudo consultar)."""
+    try:
+        default = int(sd.query_devices(device, 'output')['default_samplerate'])
+    except Exception:
+        default = 44100
+    return negotiate("salida", [
+        Stage("kokoro", [tts_sr]),
+        Stage("speaker", [tts_sr], resamples=True),
+        Stage("altavoz", sounddevice_rates(device) or [default], native=default),
+    ])
+
+class SpeechJob:
+    """Una frase encolada; termina cuando su última muestra ha sonado."""
+
+    def __init__(self, speaker, text, play=True):
+        self.speaker = speaker
+        self.text = text
+        self.play = play      # False: solo sintetizar y guardar en caché
+        self.epoch = speaker._epoch
+        self.end_mark = None  # total_written del ring al acabar la síntesis
+
+    @property
+    def finished(self):
+        return self.end_mark is not None and self.speaker._buffer.total_read >= self.end_mark
+
+    async def wait(self):
+        while not self.finished:
+            await asyncio.sleep(self.speaker.poll_interval)
+
 
 class Speaker:
-    def __init__(self, output_sr=44100):
-        self.pipeline = KPipeline(lang_code='es')
+    def __init__(self, output_sr=44100, voice='em_alex', speed=1.1,
+                 buffer_seconds=2.0, blocksize=1024, cache=None, output_stream=None, backend=None):
+        # Backend de Kokoro (common/tts_backends.py): PyTorch por defecto, ONNX en CPU.
+        # Puede llegar como Future de Startup: el worker lo espera antes de la primera frase
+        self._backend = backend or KPipelineBackend(lang_code='es')
         self.output_sr = output_sr
+        self.voice = voice
+        self.speed = speed
+        self.cache = cache  # TTSCache opcional (common/tts_cache.py)
+        self.poll_interval = blocksize / output_sr
+
+        # Contadores para ver si la síntesis va por detrás de la reproducción
+        self.underruns = 0
+        self.chunks_synthesized = 0
+        # Tiempo de cómputo de Kokoro y audio generado (RTF = uno / otro)
+        self.synthesis_seconds = 0.0
+        self.synthesized_audio_seconds = 0.0
+        # Instantes (perf_counter) en que el altavoz pasa de silencio a sonido
+        self._playback_starts = collections.deque(maxlen=64)
+
+        self._buffer = RingBuffer(int(buffer_seconds * output_sr))
+        self._jobs = queue.Queue()
+        # Cada contador lo escribe un solo hilo: no hace falta lock
+        self._jobs_enqueued = 0
+        self._jobs_done = 0
+        self._playing = False
+        # interrupt() sube la época: los trabajos de épocas anteriores se descartan
+        self._epoch = 0
+        self._flush_requested = False
+
+        # Un único stream de salida para toda la vida del agente: sin huecos
+        # entre trozos ni coste de abrir el dispositivo en cada frase
+        # output_stream permite sustituir el dispositivo (p. ej. un sumidero a fichero)
+        self._stream = (output_stream or sd.OutputStream)(
+            samplerate=output_sr, channels=1, dtype='float32',
+            blocksize=blocksize, callback=self._callback
+        )
+        self._worker = threading.Thread(target=self._synthesis_loop, daemon=True)
+        self._worker.start()
+        self._stream.start()
+
+    @property
+    def backend(self):
+        self._backend = resolve(self._backend)
+        return self._backend
+
+    @property
+    def queue_depth(self):
+        """Frases pendientes de sintetizar (sin contar la que está en curso)."""
+        return self._jobs.qsize()
+
+    @property
+    def is_playing(self):
+        return self._playing or self._buffer.available > 0
+
+    @property
+    def buffered_seconds(self):
+        return self._buffer.available / self.output_sr
+
+    def first_audio_after(self, t):
+        """Primer instante en que sonó audio después de `t` (None si aún no)."""
+        return next((s for s in list(self._playback_starts) if s >= t), None)
+
+    def stats(self):
+        stats = {
+            'queue_depth': self.queue_depth,
+            'buffered_ms': round(self.buffered_seconds * 1000, 1),
+            'underruns': self.underruns,
+            'chunks_synthesized': self.chunks_synthesized,
+            'tts_rtf': round(self.synthesis_seconds / self.synthesized_audio_seconds, 3)
+            if self.synthesized_audio_seconds else None,
+        }
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
+
+    def enqueue(self, text, play=True):
+        """Encola una frase para síntesis sin bloquear el event loop."""
+        job = SpeechJob(self, text, play)
+        self._jobs_enqueued += 1
+        self._jobs.put(job)
+        return job
+
+    async def prewarm(self, phrases):
+        """Deja en caché frases fijas (despedidas, respuestas cortas) al arrancar.
+
+        Se sintetizan en el mismo worker, así el backend nunca se usa desde
+        dos hilos a la vez.
+        """
+        if self.cache is None:
+            return
+        jobs = [self.enqueue(text, play=False) for text in phrases]
+        for job in jobs:
+            await job.wait()
 
     async def speak(self, text):
-        generator = self.pipeline(text, voice='em_alex', speed=1.1)
-        for _, _, audio in generator:
-            # Aplicamos el resampling antes de enviar al hardware USB
-            final_audio = resample_audio(audio, 24000, self.output_sr)
-            sd.play(final_audio, self.output_sr)
-            sd.wait()
\ No newline at end of file
+        await self.enqueue(text).wait()
+
+    async def speak_stream(self, sentences, interrupt_on=None):
+        """Reproduce frases de un async iterator mientras se siguen generando.
+
+        Cada frase se encola en cuanto llega: el worker la sintetiza mientras
+        suena la anterior y el LLM sigue produciendo la siguiente. Si se
+        activa `interrupt_on` (asyncio.Event) hay barge-in: se cancela el
+        iterator (y con él el stream de Ollama) y se corta el audio.
+        Devuelve False si la respuesta fue interrumpida.
+        """
+        playback = asyncio.create_task(self._speak_stream(sentences))
+        if interrupt_on is None:
+            await playback
+            return True
+
+        barge_in = asyncio.create_task(interrupt_on.wait())
+        try:
+            done, _ = await asyncio.wait({playback, barge_in}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            playback.cancel()
+            raise
+        finally:
+            barge_in.cancel()
+
+        if playback in done:
+            playback.result()
+            return True
+
+        playback.cancel()
+        self.interrupt()
+        try:
+            await playback
+        except asyncio.CancelledError:
+            pass
+        return False
+
+    async def _speak_stream(self, sentences):
+        last = None
+        async for sentence in sentences:
+            last = self.enqueue(sentence)
+        if last is not None:
+            await last.wait()
+
+    def interrupt(self):
+        """Barge-in: descarta lo encolado, corta la síntesis en curso y vacía
+        el buffer de salida en el siguiente callback (< un bloque de audio)."""
+        self._epoch += 1
+        self._flush_requested = True
+
+    def close(self):
+        self._jobs.put(None)
+        self._stream.stop()
+        self._stream.close()
+
+    def _synthesis_loop(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            try:
+                if job.epoch == self._epoch:
+                    self._run_job(job)
+            except Exception as e:
+                print(f"[!] Error en síntesis: {e}")
+            finally:
+                if job.epoch != self._epoch:
+                    # Por si algún trozo se escribió justo al interrumpir
+                    self._flush_requested = True
+                job.end_mark = self._buffer.total_written
+                self._jobs_done += 1
+
+    def _run_job(self, job):
+        if self.cache is not None:
+            lookup = self.cache.get if job.play else self.cache.peek
+            cached = lookup(job.text, self.voice, self.speed, self.output_sr)
+            if cached is not None:
+                if job.play:
+                    self._write_blocking(cached, job)
+                return
+
+        pieces, size = [], 0
+        for chunk in self._synthesize_chunks(job.text):
+            if job.play and not self._write_blocking(chunk, job):
+                return  # Interrumpido: ni se sigue ni se cachea a medias
+            self.chunks_synthesized += 1
+            if self.cache is not None and pieces is not None:
+                pieces.append(chunk)
+                size += chunk.nbytes
+                if size > self.cache.max_entry_bytes:
+                    pieces = None  # Demasiado largo para cachear
+        if pieces:
+            # Las precargas (play=False) van a disco; el resto, según la política de la caché
+            self.cache.put(job.text, self.voice, self.speed, self.output_sr, np.concatenate(pieces),
+                           persist=not job.play)
+
+    def _synthesize_chunks(self, text):
+        """PCM final trozo a trozo, ya re-muestreado para el dispositivo."""
+        # Resampling con estado antes de enviar al hardware USB:
+        # el filtro continúa de un trozo al siguiente
+        resampler = StreamingResampler(self.backend.sample_rate, self.output_sr)
+        start = time.perf_counter()
+        for audio in self.backend.stream(text, self.voice, self.speed):
+            out = resampler.process(audio)
+            self.synthesis_seconds += time.perf_counter() - start
+            self.synthesized_audio_seconds += len(audio) / self.backend.sample_rate
+            yield out
+            # La espera por hueco en el ring no cuenta como síntesis
+            start = time.perf_counter()
+        tail = resampler.flush()
+        if len(tail):
+            yield tail
+
+    def _write_blocking(self, samples, job):
+        """Escribe en el ring esperando hueco; False si el trabajo se interrumpió."""
+        written = 0
+        while written < len(samples):
+            if job.epoch != self._epoch:
+                return False
+            written += self._buffer.write(samples[written:])
+            if written < len(samples):
+                time.sleep(self.poll_interval)
+        return True
+
+    def _callback(self, outdata, frames, time_info, status):
+        if self._flush_requested:
+            self._flush_requested = False
+            self._buffer.discard()
+            self._playing = False
+        out = outdata[:, 0]
+        n = self._buffer.read_into(out)
+        if n and not self._playing:
+            self._playback_starts.append(time.perf_counter())
+        starved = n < frames
+        if starved:
+            out[n:] = 0.0
+            # Underrun: el audio se corta mientras aún queda texto por sintetizar
+            if self._playing and self._jobs_enqueued > self._jobs_done:
+                self.underruns += 1
+        self._playing = not starved
@@ -0,0 +1,158 @@
+"""Respuesta especulativa durante el silencio final de la frase.
+
+En cuanto el detector ve una pausa corta (antes de dar la frase por
+terminada) se transcribe lo que hay y se lanza a Gemma con esa hipótesis;
+los chunks se guardan en un `Draft` y, si hay caché de TTS, se sintetiza ya
+la primera frase. Al confirmarse el fin de frase:
+
+- si la transcripción final coincide con la hipótesis, la respuesta sale
+  del borrador sin esperar al primer token;
+- si el usuario siguió hablando o el texto cambió, se cancela y lo
+  generado se cuenta como tokens desperdiciados.
+"""
+import asyncio
+import logging
+
+from utils.text_tools import SentenceSplitter
+from common.response_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class Draft:
+    """Chunks de Ollama de una respuesta aún no confirmada."""
+
+    def __init__(self, text, messages, chunks, stats, on_sentence=None):
+        self.text = text
+        self.messages = [dict(m) for m in messages]
+        self.tokens = 0
+        self._chunks = []
+        self._done = False
+        self._closed = False
+        self._changed = asyncio.Event()
+        self._stats = stats
+        self._on_sentence = on_sentence
+        self._task = asyncio.create_task(self._fill(chunks))
+
+    async def _fill(self, chunks):
+        splitter = SentenceSplitter() if self._on_sentence is not None else None
+        try:
+            async for chunk in chunks:
+                self._chunks.append(chunk)
+                content = chunk['message']['content']
+                if content:
+                    self.tokens += 1
+                    if splitter is not None:
+                        sentences = splitter.push(content)
+                        if sentences:
+                            # Solo la primera: lo demás da tiempo a sintetizarlo al reproducir
+                            self._on_sentence(sentences[0])
+                            splitter = None
+                self._changed.set()
+        finally:
+            self._done = True
+            self._changed.set()
+
+    def matches(self, history):
+        """True si el borrador partió de este historial (sin el mensaje del usuario)."""
+        return self.messages[:-1] == list(history)
+
+    async def replay(self):
+        """Los chunks ya recibidos de golpe y después los que vayan llegando."""
+        i = 0
+        while True:
+            while i < len(self._chunks):
+                yield self._chunks[i]
+                i += 1
+            if self._done:
+                break
+            self._changed.clear()
+            if i == len(self._chunks) and not self._done:
+                await self._changed.wait()
+        if self._task.done() and not self._task.cancelled() and self._task.exception():
+            raise self._task.exception()
+
+    def cancel(self):
+        """Descarta el borrador; lo generado cuenta como desperdicio."""
+        if self._closed:
+            return
+        self._stats["wasted_tokens"] += self.tokens
+        self.close()
+
+    def close(self):
+        self._closed = True
+        self._task.cancel()
+
+
+class Speculator:
+    """Conecta las pausas de Listener con borradores de Brain.
+
+    Uso: Listener(on_pause=spec.on_pause, on_resume=spec.on_resume) y, con
+    el texto final, `draft = spec.claim(text)` -> brain.think_stream(text, draft=draft).
+    """
+
+    def __init__(self, listener, brain, speaker=None):
+        self.listener = listener
+        self.brain = brain
+        self.speaker = speaker
+        self._task = None
+        self._draft = None
+        self.stats = {"attempts": 0, "hits": 0, "misses": 0, "cancelled": 0, "wasted_tokens": 0}
+
+    def on_pause(self, audio):
+        self.cancel()
+        self.stats["attempts"] += 1
+        self._task = asyncio.create_task(self._speculate(audio))
+
+    def on_resume(self):
+        if self._task is not None:
+            self.stats["cancelled"] += 1
+        self.cancel()
+
+    async def _speculate(self, audio):
+        text = await self.listener.transcribe(audio, background=True)
+        if not text:
+            return None
+        on_sentence = None
+        if self.speaker is not None and self.speaker.cache is not None:
+            on_sentence = self._prefetch
+        self._draft = self.brain.draft(text, self.stats, on_sentence=on_sentence)
+        return text
+
+    def _prefetch(self, sentence):
+        # play=False: se sintetiza y queda en la caché; si se confirma, sale de ahí
+        self.speaker.enqueue(sentence, play=False)
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._draft is not None:
+            self._draft.cancel()
+            self._draft = None
+
+    def claim(self, text):
+        """Borrador válido para la transcripción final `text`, o None."""
+        task, draft = self._task, self._draft
+        self._task = self._draft = None
+        if task is None:
+            return None
+        # El historial también cuenta: un barge-in añade la respuesta cortada
+        if draft is not None and normalize_query(draft.text) == normalize_query(text) \
+                and draft.matches(self.brain.context.get_messages()):
+            self.stats["hits"] += 1
+            return draft
+        # La hipótesis aún no estaba lista, no coincide con lo que dijo el
+        # usuario o el contexto cambió desde entonces
+        self.stats["misses"] += 1
+        task.cancel()
+        if draft is not None:
+            logger.debug(f"Especulación descartada: {draft.text!r} != {text!r}")
+            draft.cancel()
+        return None
+
+    def summary(self):
+        stats = dict(self.stats)
+        decided = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / decided, 3) if decided else None
+        return stats
@@ -1,32 +1,28 @@
-from huggingface_hub import list_repo_files, hf_hub_download
 import os
+import sys
 
-def smart_download():
-    repo = "hexgrad/Kokoro-82M"
-    print(f"--- Explorando contenido de {repo} ---")
-    
-    try:
-        all_files = list_repo_files(repo)
-        # Buscamos el modelo ONNX y el archivo de voces sin importar el nombre exacto
-        onnx_file = next((f for f in all_files if f.endswith(".onnx")), None)
-        voices_file = next((f for f in all_files if f.endswith("voices.bin")), None)
-        
-        if not onnx_file or not voices_file:
-            print("No se encontraron los archivos esperados. Archivos disponibles:")
-            print(all_files)
-            return
+# Raíz del repo en el path: el almacén de modelos está en common/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-        for f in [onnx_file, voices_file]:
-            print(f"Descargando: {f}...")
-            hf_hub_download(repo_id=repo, filename=f, local_dir=".")
-        
-        # Renombramos para que el código principal no sufra
-        if onnx_file != "kokoro-v1.0.onnx":
-            os.rename(onnx_file, "kokoro-v1.0.onnx")
-            print(f"Reasignado {onnx_file} -> kokoro-v1.0.onnx")
+from common.model_store import ChecksumError, ModelStore
 
-    except Exception as e:
-        print(f"Error crítico en la exploración: {e}")
+def smart_download(names=("kokoro",)):
+    """Descarga (o reanuda) los artefactos y los deja verificados en el almacén.
+
+    Sustituye a la descarga fichero a fichero desde Hugging Face: ahora los
+    trozos van en paralelo, un corte se reanuda y nada queda a medias con su
+    nombre final.
+    """
+    store = ModelStore()
+    for name in names:
+        print(f"--- {name} ---")
+        try:
+            path = store.ensure(name)
+        except (OSError, ChecksumError) as e:
+            print(f"Error crítico descargando {name}: {e}")
+            continue
+        for filename in sorted(os.listdir(path)):
+            print(f"  {os.path.join(path, filename)}")
 
 if __name__ == "__main__":
-    smart_download()
\ No newline at end of file
+    smart_download(sys.argv[1:] or ("kokoro",))
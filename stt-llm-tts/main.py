@@ -1,36 +1,113 @@
 import asyncio
+import os
+import sys
 import sounddevice as sd
-from core.listener import Listener
+
+# Raíz del repo en el path: módulos compartidos con pipecat-local-agent (common/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.listener import STT_SR, Listener, input_rate_plan
 from core.brain import Brain
-from core.speaker import Speaker
-from utils.audio_tools import resample_audio
+from core.speaker import Speaker, output_rate_plan
+from core.metrics import TurnRecorder
+from core.speculation import Speculator
+from utils.text_tools import echo_sentences
+from common.tts_cache import TTSCache
+from common.tts_backends import create_backend
+from common.startup import Startup, load_whisper
+from common.response_cache import ResponseCache
+from common.vad import create_vad
+from common.turn_metrics import TurnMetrics
+from common.audio_devices import configure
+from config import FAREWELL, PREWARM_PHRASES, TTS_CACHE_DIR, TTS_BACKEND, VAD, SPECULATE, OLLAMA_MODEL, OLLAMA_KEEP_ALIVE, METRICS_DIR
+
+async def report_startup(startup):
+    await startup.wait()
+    print(startup.report())
 
 async def main():
-    # Selección de hardware (ID 9 recomendado para Pipewire)
-    sd.default.device = [9, 9]
+    # Dispositivos por nombre (common/audio_devices.py): la primera vez se eligen
+    # y se calibra el bloque; después el arranque no pregunta
+    audio = configure()
+    sd.default.device = [audio.input_index, audio.output_index]
+    sd.default.latency = audio.latency
+    # Frecuencias negociadas con los dispositivos: como mucho un re-muestreo por sentido
+    output_plan = output_rate_plan()
+    out_sr = output_plan.rate("altavoz")
+    for plan in (input_rate_plan(), output_plan):
+        print(plan.describe())
     
-    # Inicialización de componentes
-    listener = Listener()
-    brain = Brain()
-    speaker = Speaker()
+    # Inicialización de componentes: Whisper y Kokoro cargan a la vez en hilos
+    # y el micrófono se abre sin esperarlos (el primer turno espera lo que falte)
+    startup = Startup()
+    whisper = startup.submit("whisper", load_whisper, "medium")
+    tts_backend = startup.submit("kokoro", create_backend, TTS_BACKEND)
+    # Whisper transcribe mientras hablas; al terminar solo queda la cola
+    listener = Listener(incremental=True, on_interim=lambda t: print(f"  ... {t}"), model=whisper,
+                        vad=create_vad(VAD), blocksize=audio.blocksize(STT_SR))
+    brain = Brain(OLLAMA_MODEL, keep_alive=OLLAMA_KEEP_ALIVE, cache=ResponseCache())
+    speaker = Speaker(output_sr=out_sr, blocksize=audio.blocksize(out_sr),
+                      cache=TTSCache(disk_dir=TTS_CACHE_DIR), backend=tts_backend)
+    listener.playback_active = lambda: speaker.is_playing
+    # Gemma arranca en la pausa, mientras el detector aún espera el fin de frase
+    speculator = None
+    if SPECULATE:
+        speculator = Speculator(listener, brain, speaker)
+        listener.on_pause, listener.on_resume = speculator.on_pause, speculator.on_resume
+    recorder = TurnRecorder(listener, brain, speaker, TurnMetrics(
+        jsonl_path=os.path.join(METRICS_DIR, "turns.jsonl"),
+        prom_path=os.path.join(METRICS_DIR, "voice_agent.prom"),
+    ))
+    # El micrófono queda abierto toda la sesión (sin reabrir en cada turno)
+    startup.run("micrófono", listener.start)
+    # Modelo LLM y frases fijas del TTS se cargan en paralelo con el resto
+    startup.track("ollama", brain.preload())
+    startup.track("tts prewarm", speaker.prewarm(PREWARM_PHRASES))
+    loading = asyncio.create_task(report_startup(startup))
 
     print("\n>>> SISTEMA INICIADO. Habla con la IA...")
 
+    listening = asyncio.create_task(listener.listen())
     try:
         while True:
-            audio = await listener.listen()
-            text = await listener.transcribe(audio)
+            audio = await listening
+            recorder.begin()
+            text = await recorder.transcribe(audio)
+            # Borrador generado durante la pausa, si la hipótesis era la buena
+            draft = speculator.claim(text) if speculator is not None else None
+            recorder.turn.set("speculative", draft is not None)
+            # El micrófono sigue armado mientras la IA habla (barge-in)
+            listening = asyncio.create_task(listener.listen())
             
             if text:
                 print(f"Tú: {text}")
-                if "adiós" in text.lower(): break
+                if "adiós" in text.lower():
+                    if draft is not None:
+                        draft.cancel()
+                    await speaker.speak(FAREWELL)
+                    break
                 
-                response = await brain.think(text)
-                print(f"IA: {response}")
-                await speaker.speak(response)
+                # La frase N suena mientras Gemma genera la N+1; si el usuario
+                # habla encima se cancela todo y su frase ya se está grabando
+                completed = await speaker.speak_stream(
+                    echo_sentences(brain.think_stream(text, draft=draft)),
+                    interrupt_on=listener.speech_started
+                )
+                if not completed:
+                    print("[barge-in] Respuesta interrumpida")
+                recorder.finish(completed)
                 
     except KeyboardInterrupt:
         print("\nCerrando agente...")
+    finally:
+        if speculator is not None:
+            speculator.cancel()
+            print(f"Especulación: {speculator.summary()}")
+        print(f"Filtro STT: {listener.gate.stats()}")
+        loading.cancel()
+        listening.cancel()
+        listener.close()
+        speaker.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
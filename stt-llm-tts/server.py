@@ -0,0 +1,135 @@
+"""Modo servidor: muchas sesiones de voz por WebSocket con un solo juego de modelos.
+
+Whisper, Kokoro y el pool de conexiones de Ollama se cargan una vez; cada
+conexión es una `Session` con su propio detector de voz y su contexto.
+Control de admisión: por encima de `--max-sessions`, o con demasiado
+trabajo en cola en los motores, las conexiones nuevas se rechazan con el
+código 1013 (Try Again Later) en lugar de degradar a todas las demás.
+
+    python stt-llm-tts/server.py --port 8765 --max-sessions 8
+    python stt-llm-tts/server.py --device cpu --model tiny --ollama-host http://127.0.0.1:11435
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+
+import websockets
+
+# Raíz del repo en el path: módulos compartidos con pipecat-local-agent (common/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.brain import Brain
+from core.engines import SharedSTT, SharedTTS
+from core.session import Session
+from common.llm_client import OllamaLLM
+from common.startup import Startup
+from common.tts_backends import create_backend
+from common.turn_metrics import TurnMetrics
+from common.vad import create_vad
+from config import OLLAMA_MODEL, OLLAMA_KEEP_ALIVE, METRICS_DIR
+
+TRY_AGAIN_LATER = 1013
+
+
+class VoiceServer:
+    def __init__(self, stt, tts, model=OLLAMA_MODEL, ollama_host=None, max_sessions=8,
+                 max_backlog=32, metrics=None, vad="energy"):
+        self.stt = stt
+        self.tts = tts
+        self.model = model
+        self.ollama_host = ollama_host
+        self.max_sessions = max_sessions
+        self.max_backlog = max_backlog
+        self.metrics = metrics
+        self.vad = vad
+        self.sessions = {}
+        self.rejected = 0
+        self._ids = itertools.count(1)
+
+    def admit(self):
+        """None si se admite la sesión; si no, el motivo del rechazo."""
+        if len(self.sessions) >= self.max_sessions:
+            return f"máximo de sesiones ({self.max_sessions})"
+        backlog = self.stt.backlog + self.tts.scheduler.backlog
+        if backlog > self.max_backlog:
+            return f"motores saturados ({backlog} trabajos en cola)"
+        return None
+
+    async def handle(self, websocket, path=None):
+        reason = self.admit()
+        if reason is not None:
+            self.rejected += 1
+            print(f"[admisión] Conexión rechazada: {reason}")
+            await websocket.close(code=TRY_AGAIN_LATER, reason=reason)
+            return
+
+        session_id = next(self._ids)
+        # Un Brain por sesión (contexto propio); todos comparten el cliente HTTP de Ollama
+        brain = Brain(self.model, host=self.ollama_host, keep_alive=OLLAMA_KEEP_ALIVE)
+        # El detector guarda estado (suelo de ruido, contexto de Silero): uno por sesión
+        session = Session(session_id, websocket, self.stt, self.tts, brain, self.metrics,
+                          vad=create_vad(self.vad))
+        self.sessions[session_id] = session
+        print(f"[+] Sesión {session_id} ({len(self.sessions)}/{self.max_sessions})")
+        try:
+            await session.run()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            del self.sessions[session_id]
+            print(f"[-] Sesión {session_id}: {session.turns} turnos")
+
+
+async def serve(args):
+    print("Cargando modelos compartidos...")
+    # Whisper, Kokoro y la precarga de Ollama en paralelo
+    startup = Startup()
+    tts_options = {"quantized": args.tts_int8} if args.tts_backend == "onnx" else {}
+    stt = startup.submit("whisper", SharedSTT, args.model, device=args.device,
+                         compute_type=args.compute_type, max_batch_size=args.stt_batch)
+    backend = startup.submit("kokoro", create_backend, args.tts_backend, **tts_options)
+    metrics = TurnMetrics(
+        jsonl_path=os.path.join(METRICS_DIR, "server_turns.jsonl"),
+        prom_path=os.path.join(METRICS_DIR, "voice_server.prom"),
+        prefix="voice_server",
+    )
+    startup.track("ollama", OllamaLLM(OLLAMA_MODEL, host=args.ollama_host,
+                                      keep_alive=OLLAMA_KEEP_ALIVE).preload())
+    errors = await startup.wait()
+    print(startup.report())
+    if errors:
+        raise errors[0]
+    tts = SharedTTS(voice=args.voice, backend=backend.result())
+    server = VoiceServer(stt.result(), tts, ollama_host=args.ollama_host, max_sessions=args.max_sessions,
+                         max_backlog=args.max_backlog, metrics=metrics, vad=args.vad)
+
+    async with websockets.serve(server.handle, args.host, args.port, max_size=2**20):
+        print(f"\n>>> SERVIDOR DE VOZ en ws://{args.host}:{args.port} (máx. {args.max_sessions} sesiones)")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-sessions", type=int, default=8)
+    parser.add_argument("--max-backlog", type=int, default=32,
+                        help="Trabajos en cola (STT + TTS) a partir de los que no se admiten sesiones")
+    parser.add_argument("--model", default="medium", help="Modelo de Whisper")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--compute-type", default="float16")
+    parser.add_argument("--stt-batch", type=int, default=1,
+                        help="Frases de distintas sesiones que Whisper procesa en un mismo lote")
+    parser.add_argument("--voice", default="em_alex")
+    parser.add_argument("--tts-backend", choices=["torch", "onnx"], default="torch",
+                        help="onnx: kokoro-v1.0.onnx + voices.bin con ONNX Runtime (sin PyTorch)")
+    parser.add_argument("--tts-int8", action="store_true", help="Modelo ONNX cuantizado a int8")
+    parser.add_argument("--vad", choices=["energy", "silero"], default="energy",
+                        help="Detector de voz de cada sesión (silero: silero_vad.onnx con ONNX Runtime)")
+    parser.add_argument("--ollama-host", default=None)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        print("\nCerrando servidor...")
@@ -0,0 +1,97 @@
+import numpy as np
+
+class RingBuffer:
+    """Buffer circular float32 preasignado para un productor y un consumidor.
+
+    Sin locks: el productor solo avanza `total_written` y el consumidor solo
+    `total_read`, así que puede leerse desde el callback de PortAudio sin
+    bloquear ni reservar memoria.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self.total_written = 0
+        self.total_read = 0
+
+    @property
+    def available(self):
+        return self.total_written - self.total_read
+
+    @property
+    def free(self):
+        return self.capacity - self.available
+
+    def write(self, samples):
+        """Copia todas las muestras que quepan y devuelve cuántas se escribieron."""
+        n = min(len(samples), self.free)
+        if n <= 0:
+            return 0
+        start = self.total_written % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        if n > first:
+            self._data[:n - first] = samples[first:n]
+        self.total_written += n
+        return n
+
+    def discard(self):
+        """Descarta todo lo pendiente. Solo desde el lado consumidor."""
+        self.total_read = self.total_written
+
+    def read_into(self, out):
+        """Rellena `out` con las muestras disponibles y devuelve cuántas leyó."""
+        n = min(len(out), self.available)
+        if n <= 0:
+            return 0
+        start = self.total_read % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self._data[start:start + first]
+        if n > first:
+            out[first:n] = self._data[:n - first]
+        self.total_read += n
+        return n
+
+
+class CaptureRing:
+    """Buffer circular de captura que entrega ventanas como vistas sin copia.
+
+    Cada muestra se escribe dos veces (posición p y p + capacity), así que
+    cualquier ventana de hasta `capacity` muestras es contigua en memoria.
+    Las vistas son válidas hasta que el micrófono da otra vuelta al buffer.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=np.float32)
+        self.total_written = 0
+
+    @property
+    def oldest(self):
+        """Índice absoluto de la muestra más antigua que sigue en el buffer."""
+        return max(0, self.total_written - self.capacity)
+
+    def write(self, samples):
+        n = len(samples)
+        if n > self.capacity:
+            self.total_written += n - self.capacity
+            samples = samples[n - self.capacity:]
+            n = self.capacity
+        pos = self.total_written % self.capacity
+        first = min(n, self.capacity - pos)
+        self._data[pos:pos + first] = samples[:first]
+        self._data[pos + self.capacity:pos + self.capacity + first] = samples[:first]
+        if n > first:
+            rest = n - first
+            self._data[:rest] = samples[first:]
+            self._data[self.capacity:self.capacity + rest] = samples[first:]
+        self.total_written += n
+
+    def view(self, start, end):
+        """Vista de las muestras absolutas [start, end) sin copiar."""
+        start = max(start, self.oldest)
+        end = min(end, self.total_written)
+        if end <= start:
+            return self._data[:0]
+        pos = start % self.capacity
+        return self._data[pos:pos + (end - start)]
@@ -0,0 +1,64 @@
+import re
+
+# Fin de frase: puntuación fuerte seguida de espacio (así "3.5" no corta)
+_SENTENCE_END = re.compile(r'[.!?…;:]+["»”)\]]*\s+')
+# Fin de cláusula: coma o raya, solo se usa si el buffer ya es largo
+_CLAUSE_END = re.compile(r'[,—]\s+')
+
+
+class SentenceSplitter:
+    """Acumula tokens del LLM y entrega frases completas en cuanto se cierran.
+
+    La primera frase puede cortarse en una coma para que el TTS arranque
+    antes; las siguientes solo se cortan en comas si superan `clause_chars`.
+    """
+
+    def __init__(self, min_chars=12, first_clause_chars=24, clause_chars=80):
+        self.min_chars = min_chars
+        self.first_clause_chars = first_clause_chars
+        self.clause_chars = clause_chars
+        self._buffer = ""
+        self._emitted = 0
+
+    def push(self, token):
+        """Añade un token y devuelve la lista de frases ya cerradas."""
+        self._buffer += token
+        sentences = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            sentence = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:]
+            if sentence:
+                sentences.append(sentence)
+                self._emitted += 1
+        return sentences
+
+    def flush(self):
+        """Devuelve el texto pendiente al terminar el stream (o None)."""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        if rest:
+            self._emitted += 1
+            return rest
+        return None
+
+    def _find_cut(self):
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if match.start() + 1 >= self.min_chars:
+                return match.end()
+
+        limit = self.first_clause_chars if self._emitted == 0 else self.clause_chars
+        if len(self._buffer) >= limit:
+            for match in _CLAUSE_END.finditer(self._buffer):
+                if match.start() + 1 >= self.min_chars:
+                    return match.end()
+        return None
+
+
+async def echo_sentences(sentences, prefix="IA: "):
+    """Muestra cada frase de la IA por consola a medida que llega."""
+    async for sentence in sentences:
+        print(f"{prefix}{sentence}")
+        yield sentence